@@ -0,0 +1 @@
+"""Performance benchmarks of Chain Sight, run against a local mock Cosmos REST server."""
@@ -0,0 +1,132 @@
+"""
+Decoding microbenchmark.
+
+Measures the cost per record of turning response bodies into database rows: decoding the body into
+typed records, then building the rows written by the database layer. REST bodies are decoded with
+msgspec when it is installed and with the json module; the same pages encoded as gRPC responses are
+decoded with the protobuf runtime when it is installed. Bodies are generated with the
+mock Cosmos server payloads, so no server or database is needed.
+
+Usage:
+    python -m benchmarks.bench_decoding --records 1000 --repeat 20 --output decoding.json
+"""
+import argparse
+import json
+import platform
+import time
+
+from benchmarks import mock_cosmos
+from chain_sight.common.config import ChainContext
+from chain_sight.services import database, decoding, grpc_backend
+from chain_sight.services.decoding import DELEGATION_PAGE, PROPOSAL_PAGES, VALIDATOR_PAGE, PageDecoder
+
+
+def generate_pages(records):
+    """
+    Responses of one page of each dataset, with `records` items per page.
+
+    Returns:
+        dict: Dataset -> (REST decoder, REST body, gRPC method, gRPC response schema, gRPC response).
+    """
+    validators = [mock_cosmos._validator(index) for index in range(records)]
+    delegations = [mock_cosmos._delegation(0, index, validators[0]['operator_address']) for index in range(records)]
+    proposals = [mock_cosmos._proposal(proposal_id) for proposal_id in range(1, records + 1)]
+    pages = {
+        'validators': (VALIDATOR_PAGE, '/cosmos/staking/v1beta1/validators', {'validators': validators}),
+        'delegations': (DELEGATION_PAGE, f"/cosmos/staking/v1beta1/validators/{validators[0]['operator_address']}"
+                                         f"/delegations", {'delegation_responses': delegations}),
+    }
+    for version, decoder in PROPOSAL_PAGES.items():
+        pages[f'proposals_{version}'] = (
+            decoder, f'/cosmos/gov/{version}/proposals',
+            {'proposals': [mock_cosmos._render_proposal(proposal, version) for proposal in proposals]})
+    generated = {}
+    for name, (decoder, path, data) in pages.items():
+        method, _, response_schema, _ = grpc_backend.find_route(path)
+        generated[name] = (decoder, json.dumps(data).encode(), method, response_schema,
+                           grpc_backend.encode_message(data, response_schema))
+    return generated
+
+
+def row_builder(dataset):
+    """The function turning a record of `dataset` into its database row."""
+    chain = ChainContext(1, 'Bench', mock_cosmos.CHAIN_ID, 'mock', 'http://rpc', 'http://api', None)
+    if dataset == 'validators':
+        return lambda record: database._prepare_validator_row(record, chain.id)
+    if dataset == 'delegations':
+        return lambda record: database._prepare_delegator_row(record, record.validator_address, chain.id)
+    return lambda record: database._prepare_governance_proposal_row(record, chain)
+
+
+def best_of(repeat, function):
+    """Shortest wall time of `repeat` calls of `function`, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def measure(dataset, name, decode, body, records, repeat):
+    """Decode and normalize cost per record of one dataset, in microseconds."""
+    page = decode(body)
+    build_row = row_builder(dataset)
+    decode_seconds = best_of(repeat, lambda: decode(body))
+    normalize_seconds = best_of(repeat, lambda: [build_row(record) for record in page.items])
+    return {
+        'dataset': dataset,
+        'decoder': name,
+        'records': records,
+        'body_bytes': len(body),
+        'decode_us': decode_seconds / records * 1e6,
+        'normalize_us': normalize_seconds / records * 1e6,
+        'total_us': (decode_seconds + normalize_seconds) / records * 1e6,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chain Sight microbenchmark of response decoding and normalization")
+    parser.add_argument('--records', type=int, default=500, help="Number of records per page")
+    parser.add_argument('--repeat', type=int, default=20, help="Runs per measurement, the fastest is reported")
+    parser.add_argument('--output', help="File the JSON results are written to")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    results = []
+    for dataset, (decoder, body, method, response_schema, response) in generate_pages(args.records).items():
+        # The json module path is what runs without msgspec installed
+        json_decoder = PageDecoder(decoder.field, decoder._from_json)
+        if decoding.msgspec is not None:
+            results.append(measure(dataset, 'msgspec', decoder.decode, body, args.records, args.repeat))
+        results.append(measure(dataset, 'json', json_decoder.decode, body, args.records, args.repeat))
+        if grpc_backend.message_factory is not None:
+            results.append(measure(dataset, 'protobuf',
+                                   lambda data: grpc_backend.decode_page(data, method, response_schema),
+                                   response, args.records, args.repeat))
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'msgspec': getattr(decoding.msgspec, '__version__', None),
+                        'protobuf': grpc_backend.message_factory is not None},
+        'parameters': vars(args),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    for measurement in results:
+        print(f"{measurement['dataset']:<18} {measurement['decoder']:<8} decode {measurement['decode_us']:>7.2f} us "
+              f"normalize {measurement['normalize_us']:>7.2f} us total {measurement['total_us']:>7.2f} us per record")
+    if args.output:
+        print(f"Results written to {args.output}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Database engine profile benchmark.
+
+Writes generated validators and delegations straight through the database layer, without any HTTP,
+once per engine profile, and reports the write throughput of each profile. Every writer syncs its own
+chain in a worker process, as `--workers` does, while a reader builds stake reports in the main
+process, so the results also show the lock contention of a profile: with the rollback journal of the
+'legacy' profile, SQLite writers and readers wait on each other and may fail with "database is
+locked", while WAL lets the reader run next to the writers.
+
+Usage:
+    python -m benchmarks.bench_engine --validators 20 --delegators 2000 --writers 4 --output engine.json
+    python -m benchmarks.bench_engine --profiles legacy balanced --postgres-url postgresql://localhost/bench
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import tempfile
+import threading
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks import mock_cosmos
+from chain_sight.common.config import invalidate_chain_contexts
+from chain_sight.models.models import ChainConfig
+from chain_sight.services import database
+from chain_sight.services.database import DEFAULT_BATCH_SIZE
+from chain_sight.services.database_config import ENGINE_PROFILES, Base, Session, create_database_engine
+from chain_sight.services.summaries import build_report
+
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_database(url, profile, writers):
+    """Creates an empty schema with one chain per writer and binds the application Session to it."""
+    engine = create_database_engine(url, profile)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    Session.configure(bind=engine)
+    invalidate_chain_contexts()
+
+    session = Session()
+    for writer in range(writers):
+        session.add(ChainConfig(name=f'Bench{writer}', chain_id=f'bench-{writer}', prefix='mock',
+                                rpc_endpoint='http://rpc', api_endpoint='http://api'))
+    session.commit()
+    session.close()
+    return engine
+
+
+def _init_writer(url, profile):
+    """Gives each writer process its own engine."""
+    Session.configure(bind=create_database_engine(url, profile))
+    invalidate_chain_contexts()
+
+
+def sync_chain(chain_id, validators, delegators, batch_size, amount_offset):
+    """Writes the validators and delegations of one chain like a validator sync. Returns the rows written."""
+    records = [mock_cosmos._validator(index) for index in range(validators)]
+    database.upsert_validators(records, chain_id)
+    with database.DelegatorSync(chain_id, batch_size=batch_size) as sync:
+        for index, validator in enumerate(records):
+            page = [mock_cosmos._delegation(index, delegator, validator['operator_address'])
+                    for delegator in range(delegators)]
+            for delegation in page:
+                delegation['balance']['amount'] = str(int(delegation['balance']['amount']) + amount_offset)
+            sync.write_page(validator['operator_address'], page)
+            sync.finish_validator(validator['operator_address'])
+    return sync.written
+
+
+def read_reports(stop, latencies, errors):
+    """Builds the report of the first chain until `stop` is set, recording the latency of every report."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            build_report('bench-0')
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+def run_scenario(name, database_name, url, profile, args, amount_offset):
+    """Runs one sync per writer in parallel processes next to a reader, and measures the throughput."""
+    stop = threading.Event()
+    latencies, read_errors = [], []
+    reader = threading.Thread(target=read_reports, args=(stop, latencies, read_errors))
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.writers, initializer=_init_writer, initargs=(url, profile)) as pool:
+        futures = [pool.submit(sync_chain, f'bench-{writer}', args.validators, args.delegators, args.batch_size,
+                               amount_offset)
+                   for writer in range(args.writers)]
+        reader.start()
+        written = [future.result() for future in futures]
+    wall_time = time.perf_counter() - started
+    stop.set()
+    reader.join()
+
+    expected = args.writers * args.validators * args.delegators
+    rows = sum(written)
+    measurement = {
+        'scenario': name,
+        'database': database_name,
+        'profile': profile,
+        'wall_time': round(wall_time, 4),
+        'rows': rows,
+        'rows_failed': expected - rows,
+        'rows_per_second': round(rows / wall_time, 1) if wall_time else None,
+        'reads': len(latencies),
+        'read_errors': len(read_errors),
+        'read_max_ms': round(max(latencies, default=0) * 1000, 1),
+    }
+    logger.info(f"{database_name} {profile} {name}: {rows} rows in {wall_time:.2f}s, {expected - rows} failed, "
+                f"{len(latencies)} reports read, {len(read_errors)} failed.")
+    return measurement
+
+
+def run_profile(database_name, url, profile, args):
+    """Runs the initial and update scenarios against one database with one engine profile."""
+    engine = prepare_database(url, profile, args.writers)
+    try:
+        return [
+            run_scenario('initial', database_name, url, profile, args, 0),
+            run_scenario('update', database_name, url, profile, args, 1),
+        ]
+    finally:
+        engine.dispose()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chain Sight write throughput per database engine profile")
+    parser.add_argument('--profiles', nargs='+', choices=sorted(ENGINE_PROFILES), default=sorted(ENGINE_PROFILES),
+                        help="Engine profiles to compare")
+    parser.add_argument('--validators', type=int, default=20, help="Number of validators per chain")
+    parser.add_argument('--delegators', type=int, default=2000, help="Number of delegators per validator")
+    parser.add_argument('--writers', type=int, default=2, help="Chains written in parallel worker processes")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--postgres-url', default=os.getenv('BENCH_POSTGRES_URL'),
+                        help="PostgreSQL URL to benchmark as well. Defaults to BENCH_POSTGRES_URL. "
+                             "The database schema is dropped and recreated.")
+    parser.add_argument('--output', default='bench_engine.json', help="File the JSON results are written to")
+    parser.add_argument('--log-level', default='WARNING')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format='[%(asctime)s] [%(levelname)-8s] %(name)s: %(message)s')
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for profile in args.profiles:
+            # A fresh file per profile, since WAL mode persists in the database file
+            databases = [('sqlite', f"sqlite:///{os.path.join(tmp_dir, f'{profile}.db')}")]
+            if args.postgres_url:
+                databases.append(('postgresql', args.postgres_url))
+            for database_name, url in databases:
+                results.extend(run_profile(database_name, url, profile, args))
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('postgres_url', 'output')},
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    for measurement in results:
+        print(f"{measurement['database']:<11} {measurement['profile']:<9} {measurement['scenario']:<8} "
+              f"{measurement['rows']:>9} rows {measurement['wall_time']:>8.2f}s "
+              f"{measurement['rows_per_second'] or 0:>10.1f} rows/s {measurement['rows_failed']:>7} failed "
+              f"{measurement['reads']:>6} reads {measurement['read_errors']:>5} failed {measurement['read_max_ms']:>8.1f} ms max")
+    print(f"Results written to {args.output}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
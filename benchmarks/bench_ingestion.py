@@ -0,0 +1,194 @@
+"""
+End-to-end ingestion benchmark.
+
+Starts a mock Cosmos REST server, then runs the validator and governance ingestion of Chain Sight
+against SQLite and, when a URL is given, PostgreSQL. Every scenario reports wall time, rows
+written, rows per second, SQL statements executed, HTTP requests served and peak RSS, and the
+results are written to a JSON file that can be compared between commits.
+
+Usage:
+    python -m benchmarks.bench_ingestion --validators 100 --delegators 500 --output bench.json
+    python -m benchmarks.bench_ingestion --postgres-url postgresql://localhost/chain_sight_bench
+    python -m benchmarks.bench_ingestion --backend grpc
+    python -m benchmarks.bench_ingestion --delegators 20000 --latency 0.02 --pagination offset
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+from contextlib import nullcontext
+
+from sqlalchemy import event
+
+from benchmarks.mock_cosmos import CHAIN_ID, MockCosmosServer
+from chain_sight.common.config import invalidate_chain_contexts
+from chain_sight.models.models import ChainConfig
+from chain_sight.services import commands
+from chain_sight.services.blockchain import DEFAULT_CONCURRENCY, DEFAULT_QUEUE_DEPTH, configure_backend, \
+    configure_pagination
+from chain_sight.services.database import DEFAULT_BATCH_SIZE
+from chain_sight.services.database_config import Base, Session, create_database_engine
+from chain_sight.services.transport import reset_session
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """Counts the SQL statements executed on an engine."""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux KiB
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def prepare_database(url, api_endpoint, grpc_endpoint=None):
+    """Creates an empty schema with one chain pointing at the mock servers and binds the application Session to it."""
+    engine = create_database_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    Session.configure(bind=engine)
+    invalidate_chain_contexts()
+
+    session = Session()
+    session.add(ChainConfig(name='MockChain', chain_id=CHAIN_ID, prefix='mock', rpc_endpoint=api_endpoint,
+                            api_endpoint=api_endpoint, grpc_endpoint=grpc_endpoint))
+    session.commit()
+    session.close()
+    return engine
+
+
+def run_scenario(name, database, server, counter, run):
+    """Runs one ingestion and measures it."""
+    requests_before, errors_before, queries_before = server.requests, server.errors, counter.count
+    started = time.perf_counter()
+    result = run() or {}
+    wall_time = time.perf_counter() - started
+    rows = result.get('rows', 0)
+    measurement = {
+        'scenario': name,
+        'database': database,
+        'wall_time': round(wall_time, 4),
+        'rows': rows,
+        'rows_per_second': round(rows / wall_time, 1) if wall_time else None,
+        'queries': counter.count - queries_before,
+        'http_requests': server.requests - requests_before,
+        'http_errors_injected': server.errors - errors_before,
+        'peak_rss_kb': peak_rss_kb(),
+        'result': result,
+    }
+    logger.info(f"{database} {name}: {rows} rows in {wall_time:.2f}s, {measurement['queries']} queries, "
+                f"{measurement['http_requests']} HTTP requests.")
+    return measurement
+
+
+def run_database(database, url, server, args, grpc_endpoint=None):
+    """Runs every scenario against one database."""
+    engine = prepare_database(url, server.url, grpc_endpoint)
+    counter = QueryCounter(engine)
+    reset_session()
+
+    def validators():
+        return commands.fetch_and_store_validators(CHAIN_ID, args.concurrency, args.batch_size, args.queue_depth)
+
+    def governance(full_sync):
+        return lambda: commands.fetch_and_store_governance_proposals(CHAIN_ID, full_sync, args.queue_depth)
+
+    try:
+        return [
+            run_scenario('validators_initial', database, server, counter, validators),
+            run_scenario('validators_unchanged', database, server, counter, validators),
+            run_scenario('governance_full', database, server, counter, governance(True)),
+            run_scenario('governance_incremental', database, server, counter, governance(False)),
+        ]
+    finally:
+        engine.dispose()
+
+
+def _grpc_server(server, backend):
+    """Returns a context starting a mock gRPC server for the gRPC backend, a no-op context otherwise."""
+    if backend != 'grpc':
+        return nullcontext()
+    from benchmarks.mock_cosmos_grpc import MockCosmosGrpcServer
+    return MockCosmosGrpcServer(server)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chain Sight ingestion benchmark against a mock Cosmos REST server")
+    parser.add_argument('--validators', type=int, default=50, help="Number of validators served")
+    parser.add_argument('--delegators', type=int, default=200, help="Number of delegators per validator")
+    parser.add_argument('--proposals', type=int, default=100, help="Number of governance proposals")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every mock response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of mock responses failing with 502")
+    parser.add_argument('--backend', choices=('rest', 'grpc'), default='rest',
+                        help="Fetch backend; 'grpc' also starts a mock gRPC server and requires grpcio")
+    parser.add_argument('--pagination', choices=('key', 'offset'), default='key',
+                        help="Pagination strategy of the list queries")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--queue-depth', type=int, default=DEFAULT_QUEUE_DEPTH)
+    parser.add_argument('--sqlite-path', help="SQLite database file, a temporary file by default")
+    parser.add_argument('--postgres-url', default=os.getenv('BENCH_POSTGRES_URL'),
+                        help="PostgreSQL URL to benchmark as well, e.g. postgresql://localhost/chain_sight_bench. "
+                             "Defaults to BENCH_POSTGRES_URL. The database schema is dropped and recreated.")
+    parser.add_argument('--output', default='bench_results.json', help="File the JSON results are written to")
+    parser.add_argument('--log-level', default='WARNING')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format='[%(asctime)s] [%(levelname)-8s] %(name)s: %(message)s')
+    # Injected errors should be retried quickly rather than measure backoff sleeps
+    os.environ.setdefault('CHAIN_SIGHT_HTTP_BACKOFF', '0.01')
+    os.environ.setdefault('CHAIN_SIGHT_HTTP_BACKOFF_JITTER', '0')
+
+    results = []
+    configure_backend(args.backend)
+    configure_pagination(args.pagination)
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            MockCosmosServer(args.validators, args.delegators, args.proposals, args.latency, args.error_rate) as server, \
+            _grpc_server(server, args.backend) as grpc_server:
+        sqlite_path = args.sqlite_path or os.path.join(tmp_dir, 'bench.db')
+        databases = [('sqlite', f'sqlite:///{sqlite_path}')]
+        if args.postgres_url:
+            databases.append(('postgresql', args.postgres_url))
+
+        for database, url in databases:
+            results.extend(run_database(database, url, server, args, grpc_server and grpc_server.endpoint))
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('postgres_url', 'output')},
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    for measurement in results:
+        print(f"{measurement['database']:<11} {measurement['scenario']:<24} {measurement['rows']:>9} rows "
+              f"{measurement['wall_time']:>8.2f}s {measurement['rows_per_second'] or 0:>10.1f} rows/s "
+              f"{measurement['queries']:>7} queries {measurement['peak_rss_kb']:>9} KiB")
+    print(f"Results written to {args.output}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+CLI startup benchmark.
+
+Runs short Chain Sight commands, such as `--config display`, as fresh processes against a SQLite
+database holding one chain, the way cron jobs and scripts invoke them, and reports the wall time
+of each command and the modules it imported (from `python -X importtime`). Run it on two commits
+to compare their cold-start cost.
+
+Usage:
+    python -m benchmarks.bench_startup --repeat 20 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# Commands measured, as CLI arguments
+COMMANDS = {
+    'help': ['--help'],
+    'config_display': ['--config', 'display'],
+    'report': ['--report', '--chain', 'bench-1'],
+}
+
+CHAINS = {'chains': [{'name': 'Bench', 'chain_id': 'bench-1', 'prefix': 'bench', 'rpc_endpoint': 'http://rpc',
+                      'api_endpoint': 'http://api'}]}
+
+
+def run_command(arguments, environment, cwd, importtime=False):
+    """Runs the CLI in a new interpreter and returns its wall time in seconds and its stderr."""
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-m', 'chain_sight'] + arguments
+    started = time.perf_counter()
+    completed = subprocess.run(command, env=environment, cwd=cwd, capture_output=True, text=True)
+    wall_time = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"{' '.join(arguments)} failed: {completed.stderr[-2000:]}")
+    return wall_time, completed.stderr
+
+
+def import_profile(stderr):
+    """Number of modules imported and their summed own import time in milliseconds, from -X importtime output."""
+    modules = 0
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        modules += 1
+        total_us += int(line.split(':', 1)[1].split('|')[0])
+    return modules, total_us / 1000
+
+
+def measure(name, arguments, environment, cwd, repeat):
+    """Wall time statistics and import profile of one command."""
+    timings = [run_command(arguments, environment, cwd)[0] for _ in range(repeat)]
+    modules, import_ms = import_profile(run_command(arguments, environment, cwd, importtime=True)[1])
+    return {
+        'command': name,
+        'arguments': arguments,
+        'runs': repeat,
+        'min_ms': round(min(timings) * 1000, 1),
+        'median_ms': round(statistics.median(timings) * 1000, 1),
+        'modules_imported': modules,
+        'import_ms': round(import_ms, 1),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chain Sight CLI cold-start benchmark")
+    parser.add_argument('--repeat', type=int, default=10, help="Runs per command")
+    parser.add_argument('--commands', nargs='+', choices=sorted(COMMANDS), default=list(COMMANDS),
+                        help="Commands to measure")
+    parser.add_argument('--output', default='bench_startup.json', help="File the JSON results are written to")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        environment = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'startup.db')}",
+                           PYTHONPATH=os.pathsep.join(sys.path))
+        config_path = os.path.join(tmp_dir, 'chains.json')
+        with open(config_path, 'w') as file:
+            json.dump(CHAINS, file)
+        # Creates the schema and the chain, so the measured runs start against an existing database
+        run_command(['--config', 'import', '--config-path', config_path], environment, tmp_dir)
+
+        for name in args.commands:
+            results.append(measure(name, COMMANDS[name], environment, tmp_dir, args.repeat))
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'parameters': {key: value for key, value in vars(args).items() if key != 'output'},
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    for measurement in results:
+        print(f"{measurement['command']:<15} {measurement['median_ms']:>8.1f} ms median {measurement['min_ms']:>8.1f} ms min "
+              f"{measurement['modules_imported']:>5} modules {measurement['import_ms']:>8.1f} ms importing")
+    print(f"Results written to {args.output}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""
+Local stand-in for the Cosmos SDK REST API, used by the benchmarks and ingestion tests.
+
+The server generates a deterministic chain of `validators` validators, each with
+`delegators_per_validator` delegations, and `proposals` governance proposals, and serves them
+with the same pagination semantics as a real node (`pagination.key`, `pagination.offset`,
+`pagination.limit`, `pagination.count_total` and `pagination.reverse`). Requests pinned to a block
+height with the `x-cosmos-block-height` header are recorded, and heights above the current one are
+rejected like on a node. A fixed `latency` can be added to every request and `error_rate` of the
+requests fail with HTTP 502.
+"""
+import base64
+import json
+import random
+import re
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+VALIDATORS_PATH = '/cosmos/staking/v1beta1/validators'
+DELEGATIONS_PATH = re.compile(r'^/cosmos/staking/v1beta1/validators/(?P<validator>[^/]+)/delegations$')
+PROPOSALS_PATH = re.compile(r'^/cosmos/gov/(?P<version>v1|v1beta1)/proposals(?:/(?P<proposal_id>\d+))?$')
+LATEST_BLOCK_PATH = '/cosmos/base/tendermint/v1beta1/blocks/latest'
+
+CHAIN_ID = 'mock-1'
+DENOM = 'umock'
+GOV_AUTHORITY = 'mock10d07y265gmmuvt4z0w9aw880jnsr700jmockgov'
+
+
+class MockCosmosServer:
+    """
+    Threaded HTTP server serving a generated Cosmos chain.
+
+    Args:
+        validators (int): Number of validators.
+        delegators_per_validator (int): Number of delegations of every validator.
+        proposals (int): Number of governance proposals.
+        latency (float): Seconds added to every response.
+        error_rate (float): Fraction of requests answered with HTTP 502.
+        max_page_limit (int): Largest `pagination.limit` honoured, like a node's max page size.
+        gov_versions (tuple): Governance API versions served, 'v1' and/or 'v1beta1'.
+        height (int): Block height reported by the latest block endpoint.
+        offsets (bool): Whether `pagination.offset` and `pagination.count_total` are honoured, like on most nodes.
+        seed (int): Seed of the error injection.
+    """
+
+    def __init__(self, validators=10, delegators_per_validator=100, proposals=20, latency=0.0, error_rate=0.0,
+                 max_page_limit=1000, gov_versions=('v1', 'v1beta1'), height=1000, offsets=True, seed=0):
+        self.validators = [_validator(index) for index in range(validators)]
+        self.delegators_per_validator = delegators_per_validator
+        self.proposals = [_proposal(proposal_id) for proposal_id in range(1, proposals + 1)]
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_page_limit = max_page_limit
+        self.gov_versions = tuple(gov_versions)
+        self.height = height
+        self.offsets = offsets
+        self.pinned_heights = set()
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        server = self
+
+        class Handler(_Handler):
+            mock = server
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='mock-cosmos', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
+
+    def delegations(self, validator_address):
+        """Returns the generated delegation entries of a validator."""
+        index = next((i for i, validator in enumerate(self.validators)
+                      if validator['operator_address'] == validator_address), None)
+        if index is None:
+            return None
+        return [_delegation(index, delegator, validator_address) for delegator in range(self.delegators_per_validator)]
+
+    def _inject_error(self):
+        with self._lock:
+            self.requests += 1
+            failed = self.error_rate and self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+    def route(self, path, query, headers=None):
+        """Returns (status, payload) for a request."""
+        pinned = (headers or {}).get('x-cosmos-block-height')
+        if pinned is not None:
+            self.pinned_heights.add(int(pinned))
+            if int(pinned) > self.height:
+                return 400, {'code': 3, 'message': f'height {pinned} must be less than or equal to the current '
+                                                   f'blockchain height {self.height}'}
+        if path == VALIDATORS_PATH:
+            return 200, self._paginate(self.validators, query, 'validators')
+
+        match = DELEGATIONS_PATH.match(path)
+        if match:
+            delegations = self.delegations(match.group('validator'))
+            if delegations is None:
+                return 404, {'code': 5, 'message': 'validator not found'}
+            return 200, self._paginate(delegations, query, 'delegation_responses')
+
+        match = PROPOSALS_PATH.match(path)
+        if match and match.group('version') in self.gov_versions:
+            version = match.group('version')
+            proposals = [_render_proposal(proposal, version) for proposal in self.proposals]
+            if match.group('proposal_id'):
+                proposal_id = int(match.group('proposal_id'))
+                if not 1 <= proposal_id <= len(proposals):
+                    return 404, {'code': 5, 'message': 'proposal not found'}
+                return 200, {'proposal': proposals[proposal_id - 1]}
+            return 200, self._paginate(proposals, query, 'proposals')
+
+        if path == LATEST_BLOCK_PATH:
+            return 200, {'block': {'header': {'chain_id': CHAIN_ID, 'height': str(self.height)}}}
+
+        return 501, {'code': 12, 'message': 'Not Implemented'}
+
+    def _paginate(self, items, query, field):
+        limit = min(int(query.get('pagination.limit', 100)), self.max_page_limit)
+        reverse = query.get('pagination.reverse') == 'true'
+        ordered = list(reversed(items)) if reverse else items
+
+        if 'pagination.key' in query:
+            start = int(base64.b64decode(query['pagination.key']))
+        else:
+            start = int(query.get('pagination.offset', 0)) if self.offsets else 0
+
+        page = ordered[start:start + limit]
+        end = start + len(page)
+        next_key = base64.b64encode(str(end).encode()).decode() if end < len(ordered) else None
+        total = str(len(items)) if self.offsets and query.get('pagination.count_total') == 'true' else '0'
+        return {field: page, 'pagination': {'next_key': next_key, 'total': total}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    mock = None
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+
+        if self.mock.latency:
+            time.sleep(self.mock.latency)
+        if self.mock._inject_error():
+            status, payload = 502, {'message': 'injected error'}
+        else:
+            status, payload = self.mock.route(parsed.path, query,
+                                              {key.lower(): value for key, value in self.headers.items()})
+
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def validator_address(index):
+    return f'mockvaloper1{index:038d}'
+
+
+def delegator_address(validator_index, delegator_index):
+    return f'mock1{validator_index:06d}{delegator_index:032d}'
+
+
+def _validator(index):
+    tokens = str(1_000_000_000 * (index + 1))
+    return {
+        'operator_address': validator_address(index),
+        'consensus_pubkey': {'@type': '/cosmos.crypto.ed25519.PubKey',
+                             'key': base64.b64encode(index.to_bytes(32, 'big')).decode()},
+        'jailed': index % 17 == 16,
+        'status': 'BOND_STATUS_BONDED',
+        'tokens': tokens,
+        'delegator_shares': f'{tokens}.000000000000000000',
+        'description': {'moniker': f'validator-{index}', 'identity': '', 'website': f'https://v{index}.example',
+                        'security_contact': '', 'details': ''},
+        'unbonding_height': '0',
+        'unbonding_time': '1970-01-01T00:00:00Z',
+        'commission': {'commission_rates': {'rate': '0.050000000000000000', 'max_rate': '0.200000000000000000',
+                                            'max_change_rate': '0.010000000000000000'},
+                       'update_time': '2024-01-01T00:00:00Z'},
+        'min_self_delegation': '1',
+    }
+
+
+def _delegation(validator_index, delegator_index, operator_address):
+    amount = str(1_000 + validator_index * 7 + delegator_index * 13)
+    return {
+        'delegation': {'delegator_address': delegator_address(validator_index, delegator_index),
+                       'validator_address': operator_address,
+                       'shares': f'{amount}.000000000000000000'},
+        'balance': {'denom': DENOM, 'amount': amount},
+    }
+
+
+def _proposal(proposal_id):
+    status = 'PROPOSAL_STATUS_VOTING_PERIOD' if proposal_id % 10 == 0 else 'PROPOSAL_STATUS_PASSED'
+    return {
+        'id': proposal_id,
+        'status': status,
+        'title': f'Proposal {proposal_id}',
+        'summary': f'Summary of proposal {proposal_id}',
+        'type': '/cosmos.gov.v1beta1.TextProposal',
+        'tally': {'yes': str(proposal_id * 1000), 'abstain': '10', 'no': '20', 'no_with_veto': '0'},
+        'submit_time': '2024-01-01T00:00:00.123456789Z',
+        'deposit_end_time': '2024-01-03T00:00:00Z',
+        'voting_start_time': '2024-01-02T00:00:00Z',
+        'voting_end_time': '2024-01-09T00:00:00Z',
+        'total_deposit': [{'denom': DENOM, 'amount': '10000000'}],
+        'proposer': f'mock1proposer{proposal_id:028d}',
+    }
+
+
+def _render_proposal(proposal, version):
+    tally = proposal['tally']
+    if version == 'v1':
+        return {
+            'id': str(proposal['id']),
+            'messages': [{'@type': '/cosmos.gov.v1.MsgExecLegacyContent',
+                          'content': {'@type': proposal['type'], 'title': proposal['title'],
+                                      'description': proposal['summary']},
+                          'authority': GOV_AUTHORITY}],
+            'status': proposal['status'],
+            'final_tally_result': {'yes_count': tally['yes'], 'abstain_count': tally['abstain'],
+                                   'no_count': tally['no'], 'no_with_veto_count': tally['no_with_veto']},
+            'submit_time': proposal['submit_time'],
+            'deposit_end_time': proposal['deposit_end_time'],
+            'total_deposit': proposal['total_deposit'],
+            'voting_start_time': proposal['voting_start_time'],
+            'voting_end_time': proposal['voting_end_time'],
+            'metadata': '',
+            'title': proposal['title'],
+            'summary': proposal['summary'],
+            'proposer': proposal['proposer'],
+        }
+    return {
+        'proposal_id': str(proposal['id']),
+        'content': {'@type': proposal['type'], 'title': proposal['title'], 'description': proposal['summary']},
+        'status': proposal['status'],
+        'final_tally_result': dict(tally),
+        'submit_time': proposal['submit_time'],
+        'deposit_end_time': proposal['deposit_end_time'],
+        'total_deposit': proposal['total_deposit'],
+        'voting_start_time': proposal['voting_start_time'],
+        'voting_end_time': proposal['voting_end_time'],
+    }
@@ -0,0 +1,109 @@
+"""
+Local stand-in for the Cosmos SDK gRPC query services, serving the chain of a `MockCosmosServer`.
+
+Every supported query is answered by the REST routes of the wrapped mock, encoded into protobuf
+with the schemas of the gRPC backend, so both servers return the same data. Latency and error
+injection of the mock apply too; injected errors are returned as UNAVAILABLE. Requires grpcio.
+"""
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+
+from chain_sight.services.grpc_backend import decode_message, encode_message, find_route
+
+
+# REST path answering each gRPC method, formatted with the request fields
+METHOD_PATHS = {
+    '/cosmos.staking.v1beta1.Query/Validators': '/cosmos/staking/v1beta1/validators',
+    '/cosmos.staking.v1beta1.Query/ValidatorDelegations':
+        '/cosmos/staking/v1beta1/validators/{validator_addr}/delegations',
+    '/cosmos.gov.v1.Query/Proposals': '/cosmos/gov/v1/proposals',
+    '/cosmos.gov.v1.Query/Proposal': '/cosmos/gov/v1/proposals/{proposal_id}',
+    '/cosmos.gov.v1beta1.Query/Proposals': '/cosmos/gov/v1beta1/proposals',
+    '/cosmos.gov.v1beta1.Query/Proposal': '/cosmos/gov/v1beta1/proposals/{proposal_id}',
+    '/cosmos.base.tendermint.v1beta1.Service/GetLatestBlock': '/cosmos/base/tendermint/v1beta1/blocks/latest',
+}
+
+_STATUS_CODES = {400: grpc.StatusCode.INVALID_ARGUMENT, 404: grpc.StatusCode.NOT_FOUND,
+                 501: grpc.StatusCode.UNIMPLEMENTED}
+
+
+class MockCosmosGrpcServer:
+    """
+    gRPC server answering the staking, gov and latest block queries of a mock chain.
+
+    Args:
+        mock (MockCosmosServer): Mock chain to serve. It does not need to be started.
+        workers (int): Number of server threads.
+    """
+
+    def __init__(self, mock, workers=16):
+        self.mock = mock
+        self.workers = workers
+        self._server = None
+        self._port = None
+
+    @property
+    def endpoint(self):
+        return f'127.0.0.1:{self._port}'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        handlers = {}
+        for method in METHOD_PATHS:
+            service, name = method[1:].split('/')
+            handlers.setdefault(service, {})[name] = grpc.unary_unary_rpc_method_handler(self._handler(method))
+        self._server = grpc.server(ThreadPoolExecutor(max_workers=self.workers))
+        self._server.add_generic_rpc_handlers(
+            [grpc.method_handlers_generic_handler(service, methods) for service, methods in handlers.items()])
+        self._port = self._server.add_insecure_port('127.0.0.1:0')
+        self._server.start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.stop(grace=None)
+            self._server = None
+
+    def _handler(self, method):
+        template = METHOD_PATHS[method]
+        _, request_schema, response_schema, _ = find_route(template.format(validator_addr='x', proposal_id='1'))
+
+        def handle(request, context):
+            request = decode_message(request, request_schema)
+            if self.mock.latency:
+                time.sleep(self.mock.latency)
+            if self.mock._inject_error():
+                context.abort(grpc.StatusCode.UNAVAILABLE, 'injected error')
+
+            status, payload = self.mock.route(template.format(**request), _rest_query(request.get('pagination')),
+                                              dict(context.invocation_metadata()))
+            if status != 200:
+                context.abort(_STATUS_CODES.get(status, grpc.StatusCode.INTERNAL), payload.get('message', ''))
+            return encode_message(payload, response_schema)
+
+        return handle
+
+
+def _rest_query(pagination):
+    """Translates a decoded PageRequest into the REST pagination parameters understood by the mock."""
+    if not pagination:
+        return {}
+    query = {}
+    if pagination['key']:
+        query['pagination.key'] = pagination['key']
+    if pagination['offset'] != '0':
+        query['pagination.offset'] = pagination['offset']
+    if pagination['limit'] != '0':
+        query['pagination.limit'] = pagination['limit']
+    for name in ('count_total', 'reverse'):
+        if pagination[name]:
+            query[f'pagination.{name}'] = 'true'
+    return query
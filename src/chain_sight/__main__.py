@@ -1,17 +1,30 @@
 import logging
 import sys
 
-import chain_sight.services.commands
-
 from chain_sight.common.cli import parse_args
 from chain_sight.common.logger import get_log_level, setup_logging
-from chain_sight.services.database_config import initialize_database
-from chain_sight.services.commands import config_display, config_import
+
+# Modules are imported by the commands that use them: --config and --report start without loading
+# the HTTP, gRPC and fetch pipeline modules, and --help without loading SQLAlchemy
+
+
+def _configure_fetch(args):
+    """Applies the fetch options shared by --fetch and --daemon."""
+    from chain_sight.services.blockchain import configure_backend, configure_pagination, configure_snapshot_mode
+    from chain_sight.services.changefeed import configure_change_feed
+    from chain_sight.services.snapshots import configure_snapshot_store
+
+    configure_backend(args.backend)
+    configure_pagination(args.pagination)
+    configure_snapshot_mode(args.snapshot)
+    configure_snapshot_store(args.history_dir)
+    configure_change_feed(args.change_feed)
 
 
 def main():
     args = parse_args()
 
+    from chain_sight.services.database_config import initialize_database
     initialize_database()
 
     log_level = get_log_level(args.log_level)
@@ -20,31 +33,87 @@ def main():
     logger = logging.getLogger(__name__)
     logger.debug("Application started with arguments: %s", args)
 
-    if args.config:
-        logger.debug(f'Configuration mode selected: {args.config}')
-        if args.config == 'import':
-            logger.debug(f'Configuration file path provided: {args.config_path}')
-            config_import(args.config_path)
-        elif args.config == 'display':
-            config_display()
-    elif args.fetch:
-        logger.debug(f'Fetch mode selected: {args.fetch}')
-        logger.debug(f'Chain specified: {args.chain}')
-        if args.fetch == 'governance':
+    # Profile everything after startup, so the reports show the run itself
+    if args.profile:
+        from chain_sight.common.profiling import start_profiling
+        start_profiling(args.profile)
+    try:
+        if args.config:
+            from chain_sight.common.config import config_display, config_import
+
+            logger.debug(f'Configuration mode selected: {args.config}')
+            if args.config == 'import':
+                logger.debug(f'Configuration file path provided: {args.config_path}')
+                config_import(args.config_path)
+            elif args.config == 'display':
+                config_display()
+        elif args.fetch:
+            from chain_sight.common.metrics import write_metrics_file
+            from chain_sight.services import commands
+            from chain_sight.services.changefeed import configure_change_feed
+            from chain_sight.services.transport import close_archive, configure_archive
+
+            logger.debug(f'Fetch mode selected: {args.fetch}')
+            logger.debug(f'Chain specified: {args.chain}')
+            chain_names = commands.resolve_chain_names(args.chain)
+            if not chain_names:
+                logger.error(f"No chains found for: {args.chain}")
+                sys.exit(1)
+            configure_archive(args.record, args.replay)
+            _configure_fetch(args)
             try:
-                chain_sight.services.commands.fetch_and_store_governance_proposals(args.chain)
-                logger.info("Governance proposals fetched and stored successfully.")
-            except Exception as e:
-                logger.error(f"Failed to fetch and store governance proposals: {e}")
-        elif args.fetch == 'validators':
+                summaries = commands.run_chains(
+                    chain_names, args.fetch, args.workers, args.concurrency, args.batch_size, args.full_sync,
+                    args.queue_depth)
+            finally:
+                close_archive()
+                configure_change_feed(None)
+            commands.print_chain_summaries(summaries)
+            if args.metrics_file:
+                write_metrics_file(args.metrics_file)
+        elif args.daemon:
+            from chain_sight.common.config import resolve_chain_names
+            from chain_sight.common.metrics import start_metrics_server, write_metrics_file
+            from chain_sight.services.changefeed import configure_change_feed
+            from chain_sight.services.scheduler import run_daemon
+
+            chain_names = resolve_chain_names(args.chain)
+            if not chain_names:
+                logger.error(f"No chains found for: {args.chain}")
+                sys.exit(1)
+            logger.info(f"Daemon mode selected for chains: {', '.join(chain_names)}")
+            _configure_fetch(args)
+            metrics_server = start_metrics_server(args.metrics_port) if args.metrics_port is not None else None
             try:
-                chain_sight.services.commands.fetch_and_store_validators(args.chain)
-                logger.info("Validators fetched and stored successfully.")
-            except Exception as e:
-                logger.error(f"Failed to fetch and store validators: {e}")
-    else:
-        logger.error("No valid operation specified. Use --help for usage information.")
-        sys.exit(1)
+                run_daemon(chain_names, args.interval, args.jitter, args.workers, args.concurrency, args.batch_size,
+                           args.queue_depth)
+            finally:
+                if metrics_server is not None:
+                    metrics_server.shutdown()
+                configure_change_feed(None)
+                if args.metrics_file:
+                    write_metrics_file(args.metrics_file)
+        elif args.report:
+            from chain_sight.common.config import resolve_chain_names
+            from chain_sight.services.summaries import build_report, print_report
+
+            chain_names = resolve_chain_names(args.chain)
+            if not chain_names:
+                logger.error(f"No chains found for: {args.chain}")
+                sys.exit(1)
+            for chain_name in chain_names:
+                report = build_report(chain_name, args.top)
+                if report is not None:
+                    print_report(report)
+                    print()
+        else:
+            logger.error("No valid operation specified. Use --help for usage information.")
+            sys.exit(1)
+    finally:
+        if args.profile:
+            from chain_sight.common.profiling import stop_profiling
+            stop_profiling()
+
 
 if __name__ == '__main__':
     main()
@@ -30,6 +30,21 @@ def parse_args():
         help='Use fetch mode: "validators" to fetch validator data, "governance" to fetch governance proposals.'
     )
 
+    # --daemon option, keeps running and syncs every chain on a schedule
+    group.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Run as a long-running scheduler syncing validators and governance proposals of the chains periodically.'
+    )
+
+    # --report option, prints stake distribution reports from the summary tables
+    group.add_argument(
+        '--report',
+        action='store_true',
+        help='Print the stake distribution of the chains: voting power share and delegator count per validator, '
+             'Nakamoto coefficient and top delegators, read from the summaries kept by validator syncs.'
+    )
+
     # --config-path argument, required only when --config is 'import'
     parser.add_argument(
         '--config-path',
@@ -40,7 +55,141 @@ def parse_args():
     parser.add_argument(
         '--chain',
         type=str,
-        help='Specify the chain (required if --fetch is used).'
+        help='Specify the chain, a comma-separated list of chains, or "all" (required if --fetch is used).'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='Number of chains fetched in parallel worker processes when several chains are given. Defaults to 4.'
+    )
+
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=4,
+        help='Number of validators whose delegators are fetched in parallel (used with --fetch validators). Defaults to 4.'
+    )
+
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=1000,
+        help='Number of delegators written to the database per statement and commit. Defaults to 1000.'
+    )
+
+    parser.add_argument(
+        '--queue-depth',
+        type=int,
+        default=32,
+        help='Maximum number of fetched pages buffered ahead of the database writer. Defaults to 32.'
+    )
+
+    parser.add_argument(
+        '--full-sync',
+        action='store_true',
+        help='Re-fetch the whole governance proposal history instead of only new and open proposals.'
+    )
+
+    parser.add_argument(
+        '--record',
+        type=str,
+        metavar='ARCHIVE',
+        help='Record every HTTP request and response of the fetch to a compressed archive file.'
+    )
+
+    parser.add_argument(
+        '--replay',
+        type=str,
+        metavar='ARCHIVE',
+        help='Serve HTTP responses from an archive recorded with --record, without network access.'
+    )
+
+    parser.add_argument(
+        '--backend',
+        type=str,
+        choices=['rest', 'grpc'],
+        help='Fetch every chain through its REST API or its gRPC endpoint. Defaults to the fetch_backend configured '
+             'per chain, REST unless set.'
+    )
+
+    parser.add_argument(
+        '--pagination',
+        type=str,
+        choices=['key', 'offset'],
+        default='key',
+        help='Follow the next_key of every page ("key"), or count each list and fetch its pages in parallel by '
+             'offset ("offset"), falling back to next_key when a node does not support it. Defaults to "key".'
+    )
+
+    parser.add_argument(
+        '--snapshot',
+        action='store_true',
+        help='Pin every request of a validator sync to the latest block height, read once per chain and sync, '
+             'and store that height on the written validators and delegators.'
+    )
+
+    parser.add_argument(
+        '--history-dir',
+        type=str,
+        metavar='DIR',
+        help='Append a columnar snapshot of the delegations of a chain to this directory after every validator sync.'
+    )
+
+    parser.add_argument(
+        '--change-feed',
+        type=str,
+        metavar='PATH',
+        help='Append every new, changed and removed validator and delegation of validator syncs to this JSON lines '
+             'file.'
+    )
+
+    parser.add_argument(
+        '--interval',
+        type=parse_interval,
+        action='append',
+        default=[],
+        metavar='[CHAIN:]DATASET=SECONDS',
+        help='Sync interval of a dataset in daemon mode, for all chains or one chain, e.g. "governance=600" or '
+             '"mantle-1:validators=1800". 0 disables the sync. Can be repeated. '
+             'Defaults to 3600 seconds for validators and 900 for governance.'
+    )
+
+    parser.add_argument(
+        '--jitter',
+        type=float,
+        default=0.1,
+        help='Maximum random shift of each scheduled sync in daemon mode, as a fraction of its interval. Defaults to 0.1.'
+    )
+
+    parser.add_argument(
+        '--metrics-file',
+        type=str,
+        metavar='PATH',
+        help='Write ingestion metrics to this file when the run ends: Prometheus text format if the name ends '
+             'in ".prom", JSON otherwise.'
+    )
+
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        metavar='PORT',
+        help='Serve ingestion metrics in the Prometheus text format on http://0.0.0.0:PORT/metrics (daemon mode).'
+    )
+
+    parser.add_argument(
+        '--profile',
+        type=str,
+        metavar='DIR',
+        help='Profile the run with cProfile and tracemalloc and write per-stage CPU and allocation reports to DIR.'
+    )
+
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=10,
+        help='Number of largest delegators listed per chain by --report. Defaults to 10.'
     )
 
     parser.add_argument(
@@ -64,6 +213,39 @@ def parse_args():
     if args.fetch and not args.chain:
         parser.error("argument --chain is required when --fetch is specified")
 
+    if args.workers < 1:
+        parser.error("argument --workers must be at least 1")
+
+    if args.concurrency < 1:
+        parser.error("argument --concurrency must be at least 1")
+
+    if args.batch_size < 1:
+        parser.error("argument --batch-size must be at least 1")
+
+    if args.record and args.replay:
+        parser.error("arguments --record and --replay cannot be used together")
+
+    if (args.daemon or args.report) and not args.chain:
+        args.chain = 'all'
+
+    if args.top < 1:
+        parser.error("argument --top must be at least 1")
+
+    if args.backend == 'grpc' and (args.record or args.replay):
+        parser.error("arguments --record and --replay cannot be used with --backend grpc")
+
+    if args.daemon and (args.record or args.replay):
+        parser.error("arguments --record and --replay cannot be used with --daemon")
+
+    if args.metrics_port is not None and not args.daemon:
+        parser.error("argument --metrics-port can only be used with --daemon")
+
+    if not 0 <= args.jitter < 1:
+        parser.error("argument --jitter must be at least 0 and less than 1")
+
+    if args.queue_depth < 1:
+        parser.error("argument --queue-depth must be at least 1")
+
     if args.config:
         if args.config == 'import' and not args.config_path:
             parser.error("argument --config-path is required when --config is 'import'")
@@ -73,6 +255,26 @@ def parse_args():
     return args
 
 
+def parse_interval(value):
+    """
+    Parses an --interval value of the form [CHAIN:]DATASET=SECONDS.
+
+    Returns:
+        tuple: (chain ID or None, dataset, seconds).
+    """
+    job, separator, seconds = value.partition('=')
+    chain, _, dataset = job.rpartition(':')
+    if not separator or dataset not in ('validators', 'governance'):
+        raise argparse.ArgumentTypeError(f"invalid interval '{value}', expected [CHAIN:]validators|governance=SECONDS")
+    try:
+        seconds = float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number of seconds in interval '{value}'")
+    if seconds < 0:
+        raise argparse.ArgumentTypeError(f"interval '{value}' must not be negative")
+    return chain or None, dataset, seconds
+
+
 def setup_logging(log_file, log_level):
     numeric_level = getattr(logging, log_level.upper(), None)
     if not isinstance(numeric_level, int):
@@ -1,5 +1,9 @@
 import json
 import logging
+import os
+import threading
+
+from collections import namedtuple
 
 from chain_sight.services.database_config import Session
 from chain_sight.models.models import ChainConfig
@@ -7,6 +11,17 @@ from chain_sight.models.models import ChainConfig
 
 logger = logging.getLogger(__name__)
 
+# Backends data is fetched with: the REST API of the chain, or the gRPC queries of its grpc_endpoint
+BACKENDS = ('rest', 'grpc')
+
+# Immutable snapshot of a ChainConfig row, safe to share between threads and worker processes
+ChainContext = namedtuple('ChainContext', ['id', 'name', 'chain_id', 'prefix', 'rpc_endpoint', 'api_endpoint',
+                                           'grpc_endpoint', 'api_endpoints', 'fetch_backend', 'block_height'],
+                          defaults=((), None, None))
+
+_chain_contexts = {}
+_chain_contexts_lock = threading.Lock()
+
 
 def load_config(chain_name=None):
     """Load chain configuration from the database. Optionally, filter by chain name."""
@@ -24,3 +39,223 @@ def load_config(chain_name=None):
             return chain_configs
     finally:
         session.close()
+
+
+def get_chain_context(chain_id):
+    """
+    Returns the chain context for a chain ID, loading it from the database only on first use.
+
+    Args:
+        chain_id (str): The chain ID of the blockchain.
+
+    Returns:
+        ChainContext: The cached chain context, or None if the chain is not configured.
+    """
+    chain_context = _chain_contexts.get(chain_id)
+    if chain_context is not None:
+        return chain_context
+
+    with _chain_contexts_lock:
+        chain_context = _chain_contexts.get(chain_id)
+        if chain_context is None:
+            chain_config = load_config(chain_id)
+            if not chain_config:
+                return None
+            chain_context = ChainContext(
+                id=chain_config.id,
+                name=chain_config.name,
+                chain_id=chain_config.chain_id,
+                prefix=chain_config.prefix,
+                rpc_endpoint=chain_config.rpc_endpoint,
+                api_endpoint=chain_config.api_endpoint,
+                grpc_endpoint=chain_config.grpc_endpoint,
+                api_endpoints=tuple(chain_config.api_endpoints or ()),
+                fetch_backend=chain_config.fetch_backend,
+            )
+            _chain_contexts[chain_id] = chain_context
+            logger.debug(f'Cached chain context for {chain_id}: {chain_context}')
+    return chain_context
+
+
+def resolve_chain(chain):
+    """Returns the chain context of a chain given either as a chain ID or as a ChainContext."""
+    return get_chain_context(chain) if isinstance(chain, str) else chain
+
+
+def invalidate_chain_contexts(chain_id=None):
+    """
+    Drops cached chain contexts so that they are reloaded from the database.
+
+    Args:
+        chain_id (str): Chain ID to invalidate. Invalidates every chain when omitted.
+    """
+    with _chain_contexts_lock:
+        if chain_id is None:
+            _chain_contexts.clear()
+        else:
+            _chain_contexts.pop(chain_id, None)
+    logger.debug(f'Invalidated chain contexts: {chain_id or "all"}')
+
+
+def resolve_chain_names(chain_arg):
+    """
+    Expands the --chain argument into a list of chain IDs.
+
+    Args:
+        chain_arg (str): A chain ID, a comma-separated list of chain IDs, or 'all'.
+
+    Returns:
+        list: Chain IDs to synchronize.
+    """
+    if chain_arg.strip().lower() == 'all':
+        return [chain_config.chain_id for chain_config in load_config()]
+    return [name.strip() for name in chain_arg.split(',') if name.strip()]
+
+
+def _normalize_api_endpoints(chain):
+    """
+    Splits the REST endpoints of a chain entry into the primary `api_endpoint` and the additional
+    `api_endpoints`. Either field may be given; without `api_endpoint` the first listed endpoint is
+    the primary one.
+
+    Returns:
+        dict: The chain entry with `api_endpoints` holding the endpoints other than `api_endpoint`
+        (None when there are none), or None if `api_endpoints` is not a list of URLs.
+    """
+    endpoints = chain.get('api_endpoints') or []
+    if not isinstance(endpoints, list) or not all(isinstance(url, str) and url for url in endpoints):
+        return None
+    chain = dict(chain)
+    primary = chain.get('api_endpoint') or (endpoints[0] if endpoints else None)
+    if primary is not None:
+        chain['api_endpoint'] = primary
+    chain['api_endpoints'] = [url for url in dict.fromkeys(endpoints) if url != primary] or None
+    return chain
+
+
+def config_import(config_path):
+    """
+    Imports chain configurations from a JSON file into the database.
+    If a chain exists but has different parameters, updates the database record.
+
+    Args:
+        config_path (str): The file path to the configuration JSON file.
+    """
+    if not os.path.isfile(config_path):
+        logger.error(f"The configuration file does not exist at the specified path: {config_path}")
+        return
+
+    try:
+        with open(config_path, 'r') as file:
+            config_data = json.load(file)
+    except json.JSONDecodeError as jde:
+        logger.error(f"JSON decode error while reading the configuration file: {jde}")
+        return
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while reading the configuration file: {e}")
+        return
+
+    session = Session()
+
+    try:
+        for chain in config_data.get('chains', []):
+            normalized = _normalize_api_endpoints(chain)
+            if normalized is None:
+                logger.warning(f"Skipping chain due to an invalid api_endpoints list: {chain}")
+                continue
+            chain = normalized
+
+            # Validate required fields
+            required_fields = ['name', 'chain_id', 'prefix', 'rpc_endpoint', 'api_endpoint']
+            if not all(field in chain for field in required_fields):
+                logger.warning(f"Skipping chain due to missing required fields: {chain}")
+                continue
+            if chain.get('fetch_backend') not in (None, *BACKENDS):
+                logger.warning(f"Skipping chain due to an invalid fetch_backend, expected one of {BACKENDS}: {chain}")
+                continue
+
+            # Check if the chain configuration already exists based on 'chain_id'
+            existing_chain = session.query(ChainConfig).filter(
+                ChainConfig.chain_id == chain['chain_id']
+            ).first()
+
+            if not existing_chain:
+                # If it doesn't exist, create a new ChainConfig object and add it to the session
+                new_chain = ChainConfig(
+                    name=chain['name'],
+                    chain_id=chain['chain_id'],
+                    prefix=chain['prefix'],
+                    rpc_endpoint=chain['rpc_endpoint'],
+                    api_endpoint=chain['api_endpoint'],
+                    api_endpoints=chain.get('api_endpoints'),
+                    grpc_endpoint=chain.get('grpc_endpoint'),  # Use .get() to handle optional fields
+                    fetch_backend=chain.get('fetch_backend')
+                )
+                session.add(new_chain)
+                logger.info(f"Added new chain configuration: {chain['name']}")
+            else:
+                # Compare each field to detect changes
+                updated = False
+                fields_to_compare = ['name', 'prefix', 'rpc_endpoint', 'api_endpoint', 'api_endpoints', 'grpc_endpoint',
+                                     'fetch_backend']
+
+                for field in fields_to_compare:
+                    config_value = chain.get(field)
+                    db_value = getattr(existing_chain, field)
+
+                    # Handle None values for optional fields like 'grpc_endpoint'
+                    if config_value != db_value:
+                        setattr(existing_chain, field, config_value)
+                        updated = True
+                        logger.debug(f"Updated '{field}' for chain '{existing_chain.name}' from '{db_value}' to '{config_value}'")
+
+                if updated:
+                    logger.info(f"Updated chain configuration: {existing_chain.name}")
+                else:
+                    logger.info(f"No changes detected for chain: {existing_chain.name}")
+
+        # Commit the session to save changes to the database
+        session.commit()
+        # Chain rows may have changed, so cached chain contexts must be reloaded
+        invalidate_chain_contexts()
+        logger.info("Configurations imported successfully.")
+    except Exception as e:
+        session.rollback()
+        logger.error(f"An error occurred during configuration import: {e}")
+    finally:
+        session.close()
+
+
+def config_display():
+    """
+    Retrieves chain configurations from the database and displays them in JSON format.
+    The output mirrors the structure of the original configuration JSON file.
+    """
+    session = Session()
+    try:
+        chains = session.query(ChainConfig).all()
+        if not chains:
+            logger.info("No chain configurations found in the database.")
+            print(json.dumps({"chains": []}, indent=4))
+            return
+
+        config = {"chains": []}
+        for chain in chains:
+            chain_dict = {
+                "name": chain.name,
+                "chain_id": chain.chain_id,
+                "prefix": chain.prefix,
+                "rpc_endpoint": chain.rpc_endpoint,
+                "api_endpoint": chain.api_endpoint,
+                "api_endpoints": chain.api_endpoints or [],
+                "grpc_endpoint": chain.grpc_endpoint,
+                "fetch_backend": chain.fetch_backend or 'rest',
+            }
+            config["chains"].append(chain_dict)
+
+        # Output the configuration in JSON format
+        print(json.dumps(config, indent=4))
+    except Exception as e:
+        logger.error(f"An error occurred while displaying configurations: {e}")
+    finally:
+        session.close()
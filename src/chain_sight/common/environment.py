@@ -0,0 +1,24 @@
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+def env_number(name, default, cast=float):
+    """
+    Reads a numeric setting from the environment.
+
+    Args:
+        name (str): Name of the environment variable.
+        default: Value returned when the variable is not set or is not a valid number.
+        cast (type): Type the value is converted to, `float` or `int`.
+    """
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        logger.warning(f"Invalid value '{value}' for {name}, using default {default}.")
+        return default
@@ -0,0 +1,251 @@
+import cProfile
+import contextlib
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+
+logger = logging.getLogger(__name__)
+
+# Stages of a run timed separately in profile reports
+STAGES = ('http_fetch', 'json_decode', 'normalization', 'db_write', 'cleanup')
+
+# Number of frames kept per allocation, and entries listed in the reports
+TRACEBACK_LIMIT = 10
+TOP_ENTRIES = 25
+
+# Seconds between checks of the traced memory, to keep a snapshot of the allocations at the peak
+SNAPSHOT_INTERVAL = 1.0
+
+_NO_STAGE = contextlib.nullcontext()
+
+# From Python 3.12 cProfile runs on sys.monitoring, which allows a single active profiler that sees
+# every thread; older versions profile one thread per cProfile.Profile
+_PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+# Profiler of the current run, see start_profiling()
+_profiler = None
+
+
+def stage(name):
+    """
+    Times a stage of the run when profiling is enabled.
+
+    Returns a context manager; without an active profiler it does nothing, so call sites can
+    stay in place at no measurable cost.
+
+    Args:
+        name (str): One of `STAGES`.
+    """
+    profiler = _profiler
+    if profiler is None:
+        return _NO_STAGE
+    return _StageTimer(profiler, name)
+
+
+def is_profiling():
+    return _profiler is not None
+
+
+class _StageTimer:
+    __slots__ = ('profiler', 'name', 'wall', 'cpu')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.record(self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu)
+
+
+class Profiler:
+    """
+    CPU and allocation profiler of one run.
+
+    Every thread is profiled with cProfile (one profile per thread before Python 3.12),
+    allocations are traced with tracemalloc, and code wrapped in `stage()` is timed per stage,
+    in wall and CPU time of the executing thread. Stages run concurrently in fetcher threads, so
+    stage times are thread-seconds and can add up to more than the run's wall time. A stage
+    whose CPU time is far below its wall time spent it waiting, on the network for `http_fetch`
+    or on the database for `db_write` and `cleanup`.
+
+    Args:
+        directory (str): Directory the reports are written to.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.stages = {name: {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0} for name in STAGES}
+        self._lock = threading.Lock()
+        self._profiles = []
+        self._main_profile = None
+        self._stop = threading.Event()
+        self._sampler = None
+        self._peak_snapshot = None
+        self._peak_memory = 0
+        self._started = None
+        self._started_cpu = None
+
+    def record(self, name, wall, cpu):
+        with self._lock:
+            stats = self.stages.setdefault(name, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+            stats['calls'] += 1
+            stats['wall_seconds'] += wall
+            stats['cpu_seconds'] += cpu
+
+    def _new_profile(self):
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        return profile
+
+    def _profile_thread(self, frame, event, arg):
+        # Called on the first event of every new thread: replace this hook with a cProfile of the thread
+        sys.setprofile(None)
+        self._new_profile().enable()
+
+    def _sample_peak(self):
+        while not self._stop.wait(SNAPSHOT_INTERVAL):
+            self._check_peak()
+
+    def _check_peak(self):
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self._peak_memory:
+            self._peak_memory = current
+            self._peak_snapshot = tracemalloc.take_snapshot()
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tracemalloc.start(TRACEBACK_LIMIT)
+        try:
+            # The main profile is enabled before any other thread starts, so that on Python 3.12+
+            # it is the one profiler of the process
+            self._main_profile = self._new_profile()
+            self._main_profile.enable()
+            if _PER_THREAD_PROFILES:
+                threading.setprofile(self._profile_thread)
+            self._sampler = threading.Thread(target=self._sample_peak, name='profile-sampler', daemon=True)
+            self._sampler.start()
+        except Exception:
+            threading.setprofile(None)
+            if self._main_profile is not None:
+                self._main_profile.disable()
+            self._stop.set()
+            tracemalloc.stop()
+            raise
+        self._started = time.perf_counter()
+        self._started_cpu = time.process_time()
+        logger.info(f"Profiling enabled, reports will be written to {self.directory}.")
+
+    def stop(self):
+        """Stops profiling and writes the reports. Returns the paths of the report files."""
+        self._main_profile.disable()
+        wall = time.perf_counter() - self._started
+        cpu = time.process_time() - self._started_cpu
+        threading.setprofile(None)
+        self._stop.set()
+        self._sampler.join()
+        self._check_peak()
+        _, peak = tracemalloc.get_traced_memory()
+        final_snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        paths = [
+            self._write_stages(wall, cpu),
+            *self._write_cpu_profile(),
+            self._write_allocations(peak, final_snapshot),
+        ]
+        logger.info(f"Profile reports written to {self.directory}.")
+        return paths
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _write_stages(self, wall, cpu):
+        stage_total = sum(stats['wall_seconds'] for stats in self.stages.values())
+        report = {'run_wall_seconds': wall, 'run_cpu_seconds': cpu, 'stages': {}}
+        lines = [f"Run: {wall:.3f}s wall, {cpu:.3f}s CPU (all threads)",
+                 "Stage times are summed over threads (thread-seconds).", "",
+                 f"{'stage':<15} {'calls':>9} {'wall s':>10} {'cpu s':>10} {'cpu/wall':>9} {'share':>7}"]
+        for name, stats in self.stages.items():
+            share = stats['wall_seconds'] / stage_total if stage_total else 0.0
+            cpu_ratio = stats['cpu_seconds'] / stats['wall_seconds'] if stats['wall_seconds'] else 0.0
+            report['stages'][name] = dict(stats, share=share, cpu_ratio=cpu_ratio)
+            lines.append(f"{name:<15} {stats['calls']:>9} {stats['wall_seconds']:>10.3f} {stats['cpu_seconds']:>10.3f} "
+                         f"{cpu_ratio:>9.2f} {share:>6.1%}")
+        if stage_total:
+            dominant = max(self.stages, key=lambda name: self.stages[name]['wall_seconds'])
+            report['dominant_stage'] = dominant
+            lines += ["", f"Most time was spent in {dominant}."]
+
+        with open(self._path('stages.json'), 'w') as file:
+            json.dump(report, file, indent=2)
+        with open(self._path('stages.txt'), 'w') as file:
+            file.write('\n'.join(lines) + '\n')
+        return self._path('stages.txt')
+
+    def _write_cpu_profile(self):
+        stats = None
+        for profile in self._profiles:
+            try:
+                stats = pstats.Stats(profile) if stats is None else stats.add(profile)
+            except TypeError:
+                # A thread that never ran a profiled event has no stats
+                continue
+        if stats is None:
+            return []
+        stats.dump_stats(self._path('cpu.pstats'))
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats('cumulative').print_stats(TOP_ENTRIES * 2)
+        stats.sort_stats('tottime').print_stats(TOP_ENTRIES * 2)
+        with open(self._path('cpu.txt'), 'w') as file:
+            file.write(text.getvalue())
+        return [self._path('cpu.pstats'), self._path('cpu.txt')]
+
+    def _write_allocations(self, peak, final_snapshot):
+        lines = [f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB", ""]
+        for title, snapshot in (("at the peak", self._peak_snapshot), ("still allocated at the end", final_snapshot)):
+            if snapshot is None:
+                continue
+            snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+            lines.append(f"Top allocation sites {title}:")
+            for statistic in snapshot.statistics('lineno')[:TOP_ENTRIES]:
+                frame = statistic.traceback[0]
+                lines.append(f"  {statistic.size / 1024:>10.1f} KiB {statistic.count:>9} blocks  "
+                             f"{frame.filename}:{frame.lineno}")
+            lines.append("")
+        with open(self._path('allocations.txt'), 'w') as file:
+            file.write('\n'.join(lines))
+        return self._path('allocations.txt')
+
+
+def start_profiling(directory):
+    """Starts profiling the process; reports are written to `directory` by `stop_profiling`."""
+    global _profiler
+    if _profiler is not None:
+        raise RuntimeError("Profiling is already active.")
+    profiler = Profiler(directory)
+    profiler.start()
+    _profiler = profiler
+    return profiler
+
+
+def stop_profiling():
+    """Stops profiling and writes the reports. Returns the report paths, or an empty list when not profiling."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is None:
+        return []
+    return profiler.stop()
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Boolean, Numeric, UniqueConstraint, \
-    ForeignKeyConstraint, PrimaryKeyConstraint
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, DateTime, JSON, Boolean, Numeric, \
+    UniqueConstraint, ForeignKeyConstraint, PrimaryKeyConstraint, Index
 from sqlalchemy.orm import relationship
 from chain_sight.services.database_config import Base
 
@@ -12,7 +12,9 @@ class ChainConfig(Base):
     prefix = Column(String, nullable=False)
     rpc_endpoint = Column(String, nullable=False)
     api_endpoint = Column(String, nullable=False)
+    api_endpoints = Column(JSON)  # Additional REST endpoints, requests are spread over all of them
     grpc_endpoint = Column(String)
+    fetch_backend = Column(String)  # 'rest' (default) or 'grpc'
 
     # Relationships
     validators = relationship("Validator", back_populates="chain_config", cascade="all, delete")
@@ -21,7 +23,8 @@ class ChainConfig(Base):
     def __repr__(self):
         return (f"<ChainConfig(id={self.id}, name='{self.name}', chain_id='{self.chain_id}', "
                 f"prefix='{self.prefix}', rpc_endpoint='{self.rpc_endpoint}', "
-                f"api_endpoint='{self.api_endpoint}', grpc_endpoint='{self.grpc_endpoint}')>")
+                f"api_endpoint='{self.api_endpoint}', api_endpoints={self.api_endpoints}, grpc_endpoint='{self.grpc_endpoint}', "
+                f"fetch_backend='{self.fetch_backend}')>")
 
 
 class Validator(Base):
@@ -42,6 +45,8 @@ class Validator(Base):
     commission_max_rate = Column(Numeric(precision=20, scale=18))
     commission_max_change_rate = Column(Numeric(precision=20, scale=18))
     min_self_delegation = Column(Numeric(precision=50, scale=0))
+    content_hash = Column(String(64))  # SHA-256 of the normalized fields, used to skip unchanged validators
+    snapshot_height = Column(BigInteger)  # Block height the values were read at, set by snapshot syncs
 
     # Define a composite primary key for operator_address and chain_config_id
     __table_args__ = (
@@ -67,13 +72,19 @@ class Delegator(Base):
     shares = Column(Numeric(precision=60, scale=30))
     balance_amount = Column(Numeric(precision=60, scale=30))
     balance_denom = Column(String)
+    snapshot_height = Column(BigInteger)  # Block height the values were read at, set by snapshot syncs
 
     # Foreign key to reference both validator_address and validator_chain_config_id in the validators table
+    # and a unique key per delegation, used as the conflict target of bulk upserts
     __table_args__ = (
         ForeignKeyConstraint(
             ['validator_address', 'validator_chain_config_id'],
             ['validators.operator_address', 'validators.chain_config_id']
         ),
+        UniqueConstraint('validator_chain_config_id', 'validator_address', 'delegator_address',
+                         name='uq_delegator_validator_chain'),
+        # Delegations of one delegator on a chain, aggregated by the delegator summaries
+        Index('ix_delegators_chain_delegator', 'validator_chain_config_id', 'delegator_address'),
     )
 
     # Relationships
@@ -106,9 +117,56 @@ class GovernanceProposal(Base):
     proposal_metadata = Column(String)
     proposer = Column(String)
 
+    # One row per proposal and chain, used as the conflict target of upserts
+    __table_args__ = (
+        UniqueConstraint('chain_config_id', 'proposal_id', name='uq_governance_proposal_chain'),
+    )
+
     # Relationships
     chain_config = relationship("ChainConfig", back_populates="governance_proposals")
 
     def __repr__(self):
         return (f"<GovernanceProposal(id={self.id}, proposal_id='{self.proposal_id}', "
                 f"title='{self.title}', chain='{self.chain_config.name}', status='{self.status}')>")
+
+
+class ValidatorSummary(Base):
+    """Stake totals of a validator, refreshed by syncs for the validators they change."""
+    __tablename__ = 'validator_summaries'
+    chain_config_id = Column(Integer, ForeignKey('chain_config.id'), nullable=False)
+    operator_address = Column(String, nullable=False)
+    moniker = Column(String)
+    status = Column(String)
+    jailed = Column(Boolean)
+    tokens = Column(Numeric(precision=60, scale=18))
+    delegator_count = Column(Integer, nullable=False)
+    delegated_amount = Column(Numeric(precision=60, scale=30), nullable=False)
+    refreshed_at = Column(DateTime)
+
+    __table_args__ = (
+        PrimaryKeyConstraint('chain_config_id', 'operator_address', name='pk_validator_summary'),
+    )
+
+    def __repr__(self):
+        return (f"<ValidatorSummary(operator_address='{self.operator_address}', tokens={self.tokens}, "
+                f"delegator_count={self.delegator_count})>")
+
+
+class DelegatorSummary(Base):
+    """Stake of a delegator over all validators of a chain, refreshed by syncs for the delegators they change."""
+    __tablename__ = 'delegator_summaries'
+    chain_config_id = Column(Integer, ForeignKey('chain_config.id'), nullable=False)
+    delegator_address = Column(String, nullable=False)
+    validator_count = Column(Integer, nullable=False)
+    total_amount = Column(Numeric(precision=60, scale=30), nullable=False)
+    refreshed_at = Column(DateTime)
+
+    # The amount index serves the top delegators of a chain without sorting the table
+    __table_args__ = (
+        PrimaryKeyConstraint('chain_config_id', 'delegator_address', name='pk_delegator_summary'),
+        Index('ix_delegator_summaries_chain_amount', 'chain_config_id', 'total_amount'),
+    )
+
+    def __repr__(self):
+        return (f"<DelegatorSummary(delegator_address='{self.delegator_address}', total_amount={self.total_amount}, "
+                f"validator_count={self.validator_count})>")
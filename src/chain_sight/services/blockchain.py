@@ -1,242 +1,658 @@
-import requests
 import logging
+import queue
+import threading
 
-from chain_sight.models.models import Delegator
-from chain_sight.services.database_config import Session
-from chain_sight.services.database import insert_delegator
+from concurrent.futures import ThreadPoolExecutor
+
+from chain_sight.common import metrics, profiling
+from chain_sight.common.config import BACKENDS
+from chain_sight.common.environment import env_number
+from chain_sight.services.database import DEFAULT_BATCH_SIZE, DelegatorSync
+from chain_sight.services.decoding import DELEGATION_PAGE, PROPOSAL_PAGES, VALIDATOR_PAGE, proposal_from_json
+from chain_sight.services import grpc_backend
+from chain_sight.services.endpoints import LATEST_BLOCK_PATH, get_endpoint_pool
+from chain_sight.services.transport import FetchError, get_archive, get_json
 
 
 # Assuming you've already called setup_logging() in your main.py or somewhere before this
 logger = logging.getLogger(__name__)
 
-def fetch_validators(chain_config):
-    validators_endpoint = f"{chain_config.api_endpoint}/cosmos/staking/v1beta1/validators"
-    all_validators = []  # Initialize a list to collect all validators
+# Number of validators whose delegations are downloaded at the same time
+DEFAULT_CONCURRENCY = 4
 
-    logger.debug(f'Fetching validators data from {validators_endpoint}.')
+# Number of fetched pages buffered between the fetchers and the database writer
+DEFAULT_QUEUE_DEPTH = 32
 
-    next_key = None  # Initialize the pagination key
-    while True:
-        params = {
-            'pagination.limit': 100  # Set a reasonable limit per page
-        }
-        if next_key:
-            params['pagination.key'] = next_key  # Include the next_key in subsequent requests
+# Proposal statuses that can still change and are re-queried on incremental syncs
+OPEN_PROPOSAL_STATUSES = ('PROPOSAL_STATUS_DEPOSIT_PERIOD', 'PROPOSAL_STATUS_VOTING_PERIOD')
+
+# How paginated lists are walked: following `next_key` one page after another, or counting the
+# list first and fetching page ranges in parallel by `pagination.offset`
+PAGINATION_STRATEGIES = ('key', 'offset')
+
+# Request header pinning a query to the state of the chain at a block height
+BLOCK_HEIGHT_HEADER = 'x-cosmos-block-height'
+
+# Items requested per page by key pagination, and for the first, counting page of offset pagination
+DEFAULT_PAGE_LIMIT = 100
+
+# Marks the end of a prefetched page stream
+_END_OF_PAGES = object()
+
+# Backend used for every chain regardless of its configuration, see configure_backend()
+_backend_override = None
 
-        response = requests.get(validators_endpoint, params=params)
+# Pagination strategy of list queries, see configure_pagination()
+_pagination = 'key'
 
-        if response.status_code == 200:
-            data = response.json()
-            validators = data.get('validators', [])
-            all_validators.extend(validators)
-            logger.info(f"Fetched {len(validators)} validators.")
+# Whether validator syncs pin every request to one block height, see configure_snapshot_mode()
+_snapshot_mode = False
 
-            # Check for pagination
-            pagination = data.get('pagination', {})
-            next_key = pagination.get('next_key')
-            if not next_key:
-                break  # No more pages to fetch
-        else:
-            logger.error(f"Failed to fetch validators. Status code: {response.status_code}")
-            break  # Exit the loop if the request fails
+# Largest page size each chain's nodes returned, learned from pages cut short by the node
+_node_page_limits = {}
 
-    return all_validators
+_PAGES_FETCHED = metrics.counter('chain_sight_pages_fetched_total', 'Pages fetched from the REST API, by dataset.',
+                                 ('chain', 'dataset'))
+_ITEMS_FETCHED = metrics.counter('chain_sight_items_fetched_total', 'Items fetched from the REST API, by dataset.',
+                                 ('chain', 'dataset'))
+_PAGINATION_FALLBACKS = metrics.counter('chain_sight_pagination_fallbacks_total',
+                                        'Offset-paginated lists finished with key pagination, by dataset and reason.',
+                                        ('chain', 'dataset', 'reason'))
+_QUEUE_DEPTH = metrics.gauge('chain_sight_queue_depth', 'Fetched pages waiting for the database writer, by queue.',
+                             ('queue',))
 
 
-def fetch_and_store_delegators(validator_addr, chain_config):
-    delegations_endpoint = f"{chain_config.api_endpoint}/cosmos/staking/v1beta1/validators/{validator_addr}/delegations"
-    logger.debug(f'Fetching delegators data from {delegations_endpoint}.')
-    active_delegator_addresses = []  # Initialize an empty list to collect active delegator addresses
+def _count_page(chain_id, dataset, items):
+    _PAGES_FETCHED.inc(chain=chain_id, dataset=dataset)
+    _ITEMS_FETCHED.inc(len(items), chain=chain_id, dataset=dataset)
 
-    next_key = None  # Initialize the pagination key
+
+def configure_backend(backend=None):
+    """
+    Selects the fetch backend of every chain.
+
+    Args:
+        backend (str): 'rest' or 'grpc'. None uses the `fetch_backend` configured per chain.
+    """
+    global _backend_override
+    if backend is not None and backend not in BACKENDS:
+        raise ValueError(f"Invalid fetch backend: {backend}")
+    _backend_override = backend
+
+
+def configure_pagination(strategy=None):
+    """
+    Selects how paginated lists of validators, delegations and proposals are fetched.
+
+    Args:
+        strategy (str): 'key' (default) or 'offset'. None restores the default.
+    """
+    global _pagination
+    if strategy is not None and strategy not in PAGINATION_STRATEGIES:
+        raise ValueError(f"Invalid pagination strategy: {strategy}")
+    _pagination = strategy or 'key'
+
+
+def configure_snapshot_mode(enabled=False):
+    """
+    Enables or disables pinning validator and delegation syncs to one block height.
+
+    Args:
+        enabled (bool): Whether validator syncs read the whole chain state at the height of the latest block.
+    """
+    global _snapshot_mode
+    _snapshot_mode = bool(enabled)
+
+
+def is_snapshot_mode():
+    """Returns whether validator syncs are pinned to one block height."""
+    return _snapshot_mode
+
+
+def get_latest_block_height(chain_config):
+    """
+    Returns the height of the latest block of a chain.
+
+    Raises:
+        FetchError: If the latest block cannot be fetched.
+    """
+    data = _get_json(chain_config, LATEST_BLOCK_PATH)
+    try:
+        return int(data['block']['header']['height'])
+    except (KeyError, TypeError, ValueError) as e:
+        raise FetchError(f"Invalid latest block returned for chain {chain_config.chain_id}: {e}") from e
+
+
+def pin_block_height(chain_config):
+    """
+    Pins a chain context to the latest block height.
+
+    Every request made with the returned context carries the `x-cosmos-block-height` header, so
+    all pages reflect the same chain state, whichever order and endpoint they are fetched from.
+
+    Args:
+        chain_config (ChainContext): Chain configuration object.
+
+    Returns:
+        ChainContext: The chain context with `block_height` set.
+
+    Raises:
+        FetchError: If the latest block cannot be fetched.
+    """
+    height = get_latest_block_height(chain_config)
+    logger.info(f"Pinned chain {chain_config.chain_id} to block height {height}.")
+    return chain_config._replace(block_height=height)
+
+
+def get_max_page_limit():
+    """Largest page size requested by offset pagination, from CHAIN_SIGHT_MAX_PAGE_LIMIT."""
+    return max(DEFAULT_PAGE_LIMIT, env_number('CHAIN_SIGHT_MAX_PAGE_LIMIT', 1000, int))
+
+
+def get_page_fanout():
+    """Number of pages of one list fetched in parallel by offset pagination, from CHAIN_SIGHT_PAGE_FANOUT."""
+    return max(1, env_number('CHAIN_SIGHT_PAGE_FANOUT', 4, int))
+
+
+def chain_backend(chain_config):
+    """Returns the backend a chain is fetched with, 'rest' unless gRPC is selected for it."""
+    backend = _backend_override or getattr(chain_config, 'fetch_backend', None) or 'rest'
+    # HTTP archives only hold REST responses, so recording and replaying always use REST
+    if backend == 'grpc' and get_archive() is not None:
+        return 'rest'
+    return backend
+
+
+def _get_json(chain_config, path, params=None, timeout=None, decoder=None):
+    """
+    Requests a REST path from the chain with its backend: from the best REST endpoint, failing over
+    to the other endpoints, or as the equivalent gRPC query, decoded into the same JSON structure.
+
+    With a `decoding.PageDecoder`, the response is returned as a page of typed records instead.
+    Chain contexts pinned to a block height query the state at that height.
+    """
+    height = getattr(chain_config, 'block_height', None)
+    headers = {BLOCK_HEIGHT_HEADER: str(height)} if height is not None else None
+    if chain_backend(chain_config) == 'grpc':
+        if decoder is None:
+            return grpc_backend.get_json(chain_config.grpc_endpoint, path, params=params, headers=headers,
+                                         timeout=timeout)
+        return grpc_backend.get_page(chain_config.grpc_endpoint, path, decoder, params=params, headers=headers,
+                                     timeout=timeout)
+    body_decoder = decoder.decode if decoder is not None else None
+    return get_endpoint_pool(chain_config).request(
+        path, lambda url: get_json(url, params=params, headers=headers, timeout=timeout, decoder=body_decoder))
+
+
+def iter_validator_pages(chain_config):
+    """
+    Fetches validators page by page, following pagination.
+
+    Args:
+        chain_config (ChainContext): Chain configuration object.
+
+    Yields:
+        list: ValidatorRecord of each validator of one page.
+
+    Raises:
+        FetchError: If a page cannot be fetched after all retries.
+    """
+    validators_path = "/cosmos/staking/v1beta1/validators"
+
+    logger.debug(f'Fetching validators data from {validators_path}.')
+
+    # Failures raise FetchError instead of returning a truncated list
+    for validators in _iter_pages(chain_config, validators_path, VALIDATOR_PAGE, 'validators',
+                                  lambda validator: validator.operator_address):
+        _count_page(chain_config.chain_id, 'validators', validators)
+        logger.info(f"Fetched {len(validators)} validators.")
+        yield validators
+
+
+def _iter_pages(chain_config, path, decoder, dataset, key):
+    """
+    Fetches every page of a paginated list with the configured pagination strategy.
+
+    Args:
+        chain_config (ChainContext): Chain configuration object.
+        path (str): REST path of the list.
+        decoder (PageDecoder): Decoder of the list pages.
+        dataset (str): Name of the list in metrics and logs.
+        key (callable): Returns the unique key of a record, used to check offset pages.
+
+    Yields:
+        list: Records of one page.
+    """
+    if _pagination == 'offset':
+        return _iter_offset_pages(chain_config, path, decoder, dataset, key)
+    return _iter_key_pages(chain_config, path, decoder)
+
+
+def _iter_key_pages(chain_config, path, decoder, next_key=None, key=None, skip=None):
+    """
+    Follows `next_key` from page to page, starting at `next_key` or the first page.
+
+    Records whose `key` is in `skip` were already returned by offset pagination and are left out.
+    """
     while True:
         params = {
-            'pagination.limit': 100  # Set a reasonable limit per page
+            'pagination.limit': DEFAULT_PAGE_LIMIT  # Set a reasonable limit per page
         }
         if next_key:
             params['pagination.key'] = next_key  # Include the next_key in subsequent requests
 
-        response = requests.get(delegations_endpoint, params=params)
+        page = _get_json(chain_config, path, params=params, decoder=decoder)
+        yield [item for item in page.items if key(item) not in skip] if skip else page.items
+
+        # Check for pagination
+        next_key = page.next_key
+        if not next_key:
+            break  # No more pages to fetch
 
-        if response.status_code == 200:
-            data = response.json()
-            delegator_entries = data.get('delegation_responses', [])
-            for entry in delegator_entries:
-                insert_delegator(entry, validator_addr, chain_config.chain_id)
-                # Collect the delegator_address from each entry for later cleanup
-                active_delegator_addresses.append(entry['delegation']['delegator_address'])
-            logger.info(f"Fetched {len(delegator_entries)} delegators for validator {validator_addr}.")
 
-            # Check for pagination
-            pagination = data.get('pagination', {})
-            next_key = pagination.get('next_key')
-            if not next_key:
-                break  # No more pages to fetch
-        else:
-            logger.error(f"Failed to fetch delegators for validator {validator_addr}. Status code: {response.status_code}")
-            break  # Exit the loop if the request fails
+def _iter_offset_pages(chain_config, path, decoder, dataset, key):
+    """
+    Counts a list with its first page, then fetches the remaining page ranges in parallel by offset.
+
+    Pages after the first request the largest page size the chain's nodes are known to return,
+    up to CHAIN_SIGHT_MAX_PAGE_LIMIT; a page cut short by the node lowers that limit and its
+    missing range is requested again. Pages are yielded in list order, at most
+    CHAIN_SIGHT_PAGE_FANOUT being fetched at a time.
+
+    Nodes not counting the list, or returning pages that overlap or leave a gap, make the
+    fetch continue with key pagination, skipping the records already yielded.
+    """
+    chain_id = chain_config.chain_id
+    first = _get_json(chain_config, path, decoder=decoder,
+                      params={'pagination.limit': DEFAULT_PAGE_LIMIT, 'pagination.count_total': 'true'})
+    seen = {key(item) for item in first.items}
+    yield first.items
+    if not first.next_key:
+        return
+
+    if first.total <= len(seen):
+        _PAGINATION_FALLBACKS.inc(chain=chain_id, dataset=dataset, reason='no_count')
+        logger.warning(f"{path} on chain {chain_id} does not count its items, continuing with key pagination.")
+        yield from _iter_key_pages(chain_config, path, decoder, first.next_key)
+        return
+
+    if len(first.items) < DEFAULT_PAGE_LIMIT:
+        _node_page_limits[chain_id] = len(first.items)
+    total = first.total
+    logger.debug(f"Fetching {total} items of {path} by offset.")
+
+    def fetch(offset, limit):
+        params = {'pagination.offset': offset, 'pagination.limit': limit}
+        return offset, limit, _get_json(chain_config, path, params=params, decoder=decoder)
+
+    def split(ranges):
+        limit = min(get_max_page_limit(), _node_page_limits.get(chain_id, get_max_page_limit()))
+        return [(offset, min(limit, start + length - offset))
+                for start, length in ranges for offset in range(start, start + length, limit)]
+
+    pending = split([(len(first.items), total - len(first.items))])
+    reason = None
+    with ThreadPoolExecutor(max_workers=get_page_fanout(), thread_name_prefix='offset-pages') as executor:
+        in_flight = []
+        while (pending or in_flight) and reason is None:
+            while pending and len(in_flight) < get_page_fanout():
+                in_flight.append(executor.submit(fetch, *pending.pop(0)))
+            try:
+                offset, limit, page = in_flight.pop(0).result()
+            except FetchError as e:
+                logger.warning(f"Offset page of {path} on chain {chain_id} failed: {e}")
+                reason = 'error'
+                break
+            keys = [key(item) for item in page.items]
+            # An empty or overlapping page, or a short last page, means the list changed or offsets are ignored
+            if not keys or not seen.isdisjoint(keys) or len(set(keys)) != len(keys) or \
+                    (len(keys) < limit and not page.next_key):
+                reason = 'inconsistent'
+                break
+            seen.update(keys)
+            yield page.items
 
-    logger.info(f"Delegators for validator {validator_addr} fetched and stored successfully.")
-    cleanup_delegators(active_delegator_addresses, validator_addr)
+            if len(keys) < limit:
+                # The node caps the page size: use its limit from now on and request the rest of the range
+                _node_page_limits[chain_id] = len(keys)
+                logger.debug(f"Nodes of chain {chain_id} return at most {len(keys)} items per page.")
+                pending = split([(offset + len(keys), limit - len(keys))] + pending)
+        for future in in_flight:
+            future.cancel()
 
+    if reason is None and len(seen) == total:
+        return
+    _PAGINATION_FALLBACKS.inc(chain=chain_id, dataset=dataset, reason=reason or 'inconsistent')
+    logger.warning(f"Offset pages of {path} on chain {chain_id} are {reason or 'inconsistent'}, "
+                   f"fetching the list again with key pagination.")
+    yield from _iter_key_pages(chain_config, path, decoder, key=key, skip=seen)
 
-def fetch_governance_proposals(chain_config):
+
+def fetch_validators(chain_config):
+    return [validator for page in iter_validator_pages(chain_config) for validator in page]
+
+
+def iter_delegation_pages(validator_addr, chain_config):
+    """
+    Fetches delegation entries of a validator page by page, following pagination.
+
+    Args:
+        validator_addr (str): Operator address of the validator.
+        chain_config (ChainContext): Chain configuration object.
+
+    Yields:
+        list: DelegationRecord of each `delegation_responses` entry of one page.
+
+    Raises:
+        FetchError: If a page cannot be fetched after all retries.
+    """
+    delegations_path = f"/cosmos/staking/v1beta1/validators/{validator_addr}/delegations"
+    logger.debug(f'Fetching delegators data from {delegations_path}.')
+
+    # Failures raise FetchError, so an incomplete validator never reaches the cleanup step
+    for delegator_entries in _iter_pages(chain_config, delegations_path, DELEGATION_PAGE, 'delegations',
+                                         lambda entry: entry.delegator_address):
+        _count_page(chain_config.chain_id, 'delegations', delegator_entries)
+        logger.info(f"Fetched {len(delegator_entries)} delegators for validator {validator_addr}.")
+        yield delegator_entries
+
+
+def fetch_delegators(validator_addr, chain_config):
+    """
+    Fetches all delegation entries of a validator, following pagination.
+
+    Args:
+        validator_addr (str): Operator address of the validator.
+        chain_config (ChainContext): Chain configuration object.
+
+    Returns:
+        list: DelegationRecord of each `delegation_responses` entry returned by the API.
+
+    Raises:
+        FetchError: If a page cannot be fetched after all retries.
+    """
+    return [entry for page in iter_delegation_pages(validator_addr, chain_config) for entry in page]
+
+
+def prefetch_pages(pages, queue_depth=DEFAULT_QUEUE_DEPTH, name='pages'):
+    """
+    Runs a page generator in a background thread, buffering at most `queue_depth` pages.
+
+    The producer blocks when the buffer is full, so a slow consumer applies backpressure to
+    the fetcher instead of letting pages pile up in memory. Exceptions raised by the producer
+    are re-raised in the consumer.
+
+    Args:
+        pages (iterable): Page generator, such as `iter_validator_pages(...)`.
+        queue_depth (int): Maximum number of pages buffered ahead of the consumer.
+        name (str): Queue name reported in the queue depth metric.
+
+    Yields:
+        Pages in the order produced.
+    """
+    buffer = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for page in pages:
+                if not _put(buffer, page, stop):
+                    return
+                _QUEUE_DEPTH.set(buffer.qsize(), queue=name)
+            _put(buffer, _END_OF_PAGES, stop)
+        except Exception as e:
+            _put(buffer, e, stop)
+
+    producer = threading.Thread(target=produce, name='page-prefetch', daemon=True)
+    producer.start()
+    try:
+        while True:
+            page = buffer.get()
+            _QUEUE_DEPTH.set(buffer.qsize(), queue=name)
+            if page is _END_OF_PAGES:
+                break
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        stop.set()
+        producer.join()
+
+
+def _put(buffer, item, stop):
+    """Puts an item in a bounded queue, giving up when the consumer has stopped."""
+    while not stop.is_set():
+        try:
+            buffer.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+class DelegationPipeline:
+    """
+    Downloads delegation pages of many validators concurrently into a bounded queue.
+
+    Up to `concurrency` validators are paged at the same time. Every fetched page is handed to
+    the single consumer as soon as it arrives, and fetchers block while `queue_depth` pages are
+    waiting, so memory use depends on the queue depth rather than the size of the chain.
+
+    Events are tuples of (kind, validator_addr, payload):
+
+    - ('page', validator_addr, entries): one page of delegation entries.
+    - ('done', validator_addr, None): every page of the validator was delivered.
+    - ('failed', validator_addr, error): the download failed after some or no pages.
+    """
+
+    def __init__(self, chain_config, concurrency=DEFAULT_CONCURRENCY, queue_depth=DEFAULT_QUEUE_DEPTH):
+        self.chain_config = chain_config
+        self._queue = queue.Queue(maxsize=queue_depth)
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='delegations')
+        self._pending = 0
+        logger.debug(f'Delegation pipeline started with concurrency {concurrency} and queue depth {queue_depth}.')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, validator_addresses):
+        """Schedules the download of the delegations of the given validators."""
+        for validator_addr in validator_addresses:
+            self._pending += 1
+            self._executor.submit(self._produce, validator_addr)
+
+    def poll(self):
+        """Yields the events that are already waiting, without blocking."""
+        while self._pending:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            yield self._track(event)
+
+    def events(self):
+        """Yields events until every submitted validator is done or failed."""
+        while self._pending:
+            yield self._track(self._queue.get())
+
+    def close(self):
+        """Stops the fetchers and waits for them to exit."""
+        self._stop.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _track(self, event):
+        _QUEUE_DEPTH.set(self._queue.qsize(), queue='delegations')
+        if event[0] != 'page':
+            self._pending -= 1
+        return event
+
+    def _produce(self, validator_addr):
+        try:
+            for entries in iter_delegation_pages(validator_addr, self.chain_config):
+                if not _put(self._queue, ('page', validator_addr, entries), self._stop):
+                    return
+                _QUEUE_DEPTH.set(self._queue.qsize(), queue='delegations')
+            _put(self._queue, ('done', validator_addr, None), self._stop)
+        except Exception as e:
+            _put(self._queue, ('failed', validator_addr, e), self._stop)
+
+
+def fetch_and_store_delegators(validator_addr, chain_config, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Streams the delegators of one validator into the database and removes stale delegators.
+
+    Args:
+        validator_addr (str): Operator address of the validator.
+        chain_config (ChainContext): Chain configuration object.
+        batch_size (int): Number of delegators written per database statement.
+
+    Returns:
+        tuple: (number of delegators written, number of stale delegators removed).
+    """
+    with DelegatorSync(chain_config, batch_size) as sync:
+        try:
+            for delegator_entries in iter_delegation_pages(validator_addr, chain_config):
+                sync.write_page(validator_addr, delegator_entries)
+        except FetchError:
+            sync.discard_validator(validator_addr)
+            raise
+        removed = sync.finish_validator(validator_addr)
+        logger.info(f"Delegators for validator {validator_addr} fetched and stored successfully.")
+        return sync.written, removed
+
+
+def fetch_governance_proposals(chain_config, known_max_id=None, open_ids=()):
     """
     Fetches governance proposals from the blockchain network.
-    Tries '/v1/proposals' first, then falls back to '/v1beta1/proposals'.
 
     Args:
-        chain_config (ChainConfig): Chain configuration object.
+        chain_config (ChainContext): Chain configuration object.
+        known_max_id (int): Highest proposal ID already stored, or None for a full sync.
+        open_ids (iterable): IDs of stored proposals still in deposit or voting period.
 
     Returns:
         list: A list of normalized governance proposals.
     """
+    return [proposal for page in iter_governance_proposal_pages(chain_config, known_max_id, open_ids)
+            for proposal in page]
+
+
+def iter_governance_proposal_pages(chain_config, known_max_id=None, open_ids=()):
+    """
+    Fetches governance proposals from the blockchain network page by page.
+    Tries '/v1/proposals' first, then falls back to '/v1beta1/proposals'.
+
+    Without `known_max_id` the whole proposal history is fetched. Otherwise only proposals
+    newer than `known_max_id` are fetched, newest first, and the still open proposals in
+    `open_ids` are re-queried one by one.
+
+    Args:
+        chain_config (ChainContext): Chain configuration object.
+        known_max_id (int): Highest proposal ID already stored, or None for a full sync.
+        open_ids (iterable): IDs of stored proposals still in deposit or voting period.
+
+    Yields:
+        list: ProposalRecord of each proposal of one page.
+    """
     # Define both endpoints and try the preferred one first
     endpoints = [
-        f"{chain_config.api_endpoint}/cosmos/gov/v1/proposals",
-        f"{chain_config.api_endpoint}/cosmos/gov/v1beta1/proposals"
+        "/cosmos/gov/v1/proposals",
+        "/cosmos/gov/v1beta1/proposals"
     ]
 
-    proposals = []
     selected_endpoint = None
     version = None
 
     for endpoint in endpoints:
         try:
-            response = requests.get(endpoint, params={'pagination.limit': 1}, timeout=10)
-            if response.status_code == 200:
-                selected_endpoint = endpoint
-                version = 'v1' if 'v1/proposals' in endpoint else 'v1beta1'
-                logger.info(f"Using endpoint: {selected_endpoint} (API version: {version})")
-                break
-        except requests.RequestException as e:
+            _get_json(chain_config, endpoint, params={'pagination.limit': 1}, timeout=10)
+            selected_endpoint = endpoint
+            version = 'v1' if 'v1/proposals' in endpoint else 'v1beta1'
+            logger.info(f"Using endpoint: {selected_endpoint} (API version: {version})")
+            break
+        except FetchError as e:
             logger.warning(f"Failed to connect to {endpoint}: {e}")
 
     if not selected_endpoint:
         logger.error("No proposals endpoint available.")
-        return proposals
+        return
+
+    if known_max_id is None:
+        yield from _iter_all_proposal_pages(chain_config, selected_endpoint, version)
+        return
+
+    fetched_ids = set()
+    for page in _iter_new_proposal_pages(chain_config, selected_endpoint, version, known_max_id):
+        fetched_ids.update(int(proposal.proposal_id) for proposal in page)
+        yield page
+    open_proposals = _fetch_proposals_by_id(
+        chain_config, selected_endpoint, version,
+        [proposal_id for proposal_id in open_ids if int(proposal_id) not in fetched_ids])
+    logger.info(f"Incremental sync fetched {len(fetched_ids)} new and {len(open_proposals)} open proposals.")
+    if open_proposals:
+        yield open_proposals
 
-    return _fetch_all_proposals(selected_endpoint, version)
+
+def _iter_all_proposal_pages(chain_config, endpoint, version):
+    """
+    Fetches and decodes all governance proposals with pagination, one page at a time.
+    """
+    # Failures raise FetchError instead of returning a truncated list
+    for proposals in _iter_pages(chain_config, endpoint, PROPOSAL_PAGES[version], 'governance',
+                                 lambda proposal: proposal.proposal_id):
+        _count_page(chain_config.chain_id, 'governance', proposals)
+        yield proposals
 
 
-def _fetch_all_proposals(endpoint, version):
+def _iter_new_proposal_pages(chain_config, endpoint, version, known_max_id):
     """
-    Fetches and normalizes all governance proposals with pagination.
+    Fetches and decodes proposals newer than `known_max_id`, newest first, one page at a time.
+
+    Pagination stops at the first proposal that is already stored, since every following
+    page only contains older proposals.
     """
-    all_proposals = []
     next_key = None
-    page_number = 0
 
     while True:
-        params = {'pagination.limit': 100}
+        params = {'pagination.limit': DEFAULT_PAGE_LIMIT, 'pagination.reverse': 'true'}
         if next_key:
             params['pagination.key'] = next_key
 
-        try:
-            response = requests.get(endpoint, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                proposals = data.get('proposals', [])
-                for proposal in proposals:
-                    normalized = _normalize_proposal(proposal, version)
-                    if normalized:
-                        all_proposals.append(normalized)
-
-                next_key = data.get('pagination', {}).get('next_key')
-                if not next_key:
-                    break
-                page_number += 1
-            else:
-                logger.error(f"Failed to fetch proposals. Status code: {response.status_code}")
+        page = _get_json(chain_config, endpoint, params=params, decoder=PROPOSAL_PAGES[version])
+        _count_page(chain_config.chain_id, 'governance', page.items)
+        reached_known = False
+        new_proposals = []
+        for proposal in page.items:
+            if int(proposal.proposal_id) <= known_max_id:
+                reached_known = True
                 break
-        except requests.RequestException as e:
-            logger.error(f"Request error: {e}")
-            break
+            new_proposals.append(proposal)
+        if new_proposals:
+            yield new_proposals
 
-    return all_proposals
+        next_key = page.next_key
+        if reached_known or not next_key:
+            break
 
 
-def _normalize_proposal(proposal, version):
+def _fetch_proposals_by_id(chain_config, endpoint, version, proposal_ids):
     """
-    Normalize a governance proposal based on the API version.
-
-    Args:
-        proposal (dict): Raw proposal data from API.
-        version (str): API version ('v1' or 'v1beta1').
-
-    Returns:
-        dict: A normalized governance proposal.
-    """
-    if version == 'v1':
-        # Safely access 'messages' and ensure it has at least one element
-        messages = proposal.get("messages", [])
-        content = messages[0] if messages else {}
-
-        return {
-            "proposal_id": proposal.get("id"),
-            "content": content,
-            "status": proposal.get("status"),
-            "final_tally_result": {
-                "yes": proposal.get("final_tally_result", {}).get("yes_count"),
-                "abstain": proposal.get("final_tally_result", {}).get("abstain_count"),
-                "no": proposal.get("final_tally_result", {}).get("no_count"),
-                "no_with_veto": proposal.get("final_tally_result", {}).get("no_with_veto_count")
-            },
-            "submit_time": proposal.get("submit_time"),
-            "deposit_end_time": proposal.get("deposit_end_time"),
-            "total_deposit": proposal.get("total_deposit", []),  # Add total_deposit
-            "voting_start_time": proposal.get("voting_start_time"),
-            "voting_end_time": proposal.get("voting_end_time"),
-            "metadata": proposal.get("metadata"),
-            "title": proposal.get("title"),
-            "summary": proposal.get("summary"),
-            "proposer": proposal.get("proposer")
-        }
-    else:  # v1beta1
-        content = proposal.get("content", {})
-        return {
-            "proposal_id": proposal.get("proposal_id"),
-            "content": content,
-            "status": proposal.get("status"),
-            "final_tally_result": {
-                "yes": proposal.get("final_tally_result", {}).get("yes"),
-                "abstain": proposal.get("final_tally_result", {}).get("abstain"),
-                "no": proposal.get("final_tally_result", {}).get("no"),
-                "no_with_veto": proposal.get("final_tally_result", {}).get("no_with_veto")
-            },
-            "submit_time": proposal.get("submit_time"),
-            "deposit_end_time": proposal.get("deposit_end_time"),
-            "total_deposit": proposal.get("total_deposit", []),  # Add total_deposit
-            "voting_start_time": proposal.get("voting_start_time"),
-            "voting_end_time": proposal.get("voting_end_time"),
-            "metadata": content.get("metadata"),
-            "title": content.get("title"),
-            "summary": content.get("description"),
-            "proposer": proposal.get("proposer", "")
-        }
-
-
-def cleanup_delegators(active_delegators, validator_address):
-    session = Session()
-
-    logger.debug(f'Delegators cleanup process starting.')
-
-    try:
-        all_delegators = session.query(Delegator).filter_by(validator_address=validator_address).all()
-        inactive_delegators = [d for d in all_delegators if d.delegator_address not in active_delegators]
-
-        for delegator in inactive_delegators:
-            # Example for flagging as inactive
-            delegator.active = False
-            logger.debug(f"Flagging delegator {delegator.delegator_address} of validator {validator_address} as inactive.")
-            # If deleting, uncomment the next line
-            logger.info(f"Removing delegator {delegator.delegator_address} of validator {validator_address} from database.")
-            session.delete(delegator)
-
-        session.commit()
-    except Exception as e:
-        logger.error(f"An error occurred during cleanup: {e}")
-        session.rollback()
-    finally:
-        session.close()
+    Fetches and decodes individual proposals by ID.
+    """
+    proposals = []
+    for proposal_id in proposal_ids:
+        try:
+            data = _get_json(chain_config, f"{endpoint}/{proposal_id}")
+        except FetchError as e:
+            logger.warning(f"Failed to fetch proposal {proposal_id}: {e}")
+            continue
+        proposal = data.get('proposal')
+        if proposal:
+            with profiling.stage('normalization'):
+                proposals.append(proposal_from_json(proposal, version))
+    return proposals
 
@@ -0,0 +1,135 @@
+import datetime
+import json
+import logging
+import os
+import threading
+import uuid
+
+from decimal import Decimal
+
+
+logger = logging.getLogger(__name__)
+
+# Sink that validator syncs write their change events to, see configure_change_feed()
+_sink = None
+
+
+class JsonlSink:
+    """
+    Appends change events to a file as JSON lines.
+
+    Every batch of events is written with a single unbuffered append, so syncs running in
+    threads or in worker processes forked from the configuring process can share one file
+    without interleaving lines.
+
+    Args:
+        path (str): File the events are appended to. It is created if missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def write(self, events):
+        data = ''.join(json.dumps(event, separators=(',', ':')) + '\n' for event in events).encode()
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class ChangeFeed:
+    """
+    Change events of one validator sync of a chain.
+
+    The database writers compare incoming rows with the stored ones and hand the new, changed
+    and removed rows to the feed once they are committed, so the events describe exactly what
+    the sync changed. Every event carries the run ID of the sync, the chain, the block height
+    of a pinned sync, the validator and delegator, and the old and new values; `old` is null for
+    inserted rows and `new` is null for removed ones.
+
+    Args:
+        sink: Object with a `write(events)` method, e.g. a JsonlSink.
+        chain_config (ChainContext): The chain being synchronized.
+        run_id (str): ID shared by the events of the sync. A random one is generated by default.
+    """
+
+    def __init__(self, sink, chain_config, run_id=None):
+        self.sink = sink
+        self.chain_id = chain_config.chain_id
+        self.block_height = getattr(chain_config, 'block_height', None)
+        self.run_id = run_id or uuid.uuid4().hex
+        self.emitted = 0
+        self._lock = threading.Lock()
+
+    def event(self, dataset, change, validator_address, delegator_address=None, old=None, new=None):
+        """Builds one change event of `dataset`, 'validators' or 'delegations'."""
+        return {
+            'run_id': self.run_id,
+            'chain_id': self.chain_id,
+            'block_height': self.block_height,
+            'dataset': dataset,
+            'change': change,
+            'validator_address': validator_address,
+            'delegator_address': delegator_address,
+            'old': _values(old),
+            'new': _values(new),
+        }
+
+    def emit(self, events):
+        """Writes committed change events to the sink. Sink errors are logged, they never fail the sync."""
+        if not events:
+            return
+        committed_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        for event in events:
+            event['time'] = committed_at
+        try:
+            self.sink.write(events)
+        except Exception as e:
+            logger.error(f"Failed to write {len(events)} change events of run {self.run_id}: {e}")
+            return
+        with self._lock:
+            self.emitted += len(events)
+
+
+def _values(values):
+    """Renders amounts as exact decimal strings, the same whether they were read from the API or the database."""
+    if values is None:
+        return None
+    return {key: _amount(value) if isinstance(value, (int, Decimal)) and not isinstance(value, bool) else value
+            for key, value in values.items()}
+
+
+def _amount(value):
+    value = Decimal(value).normalize()
+    return format(value, 'f') if value else '0'
+
+
+def configure_change_feed(target=None):
+    """
+    Enables writing the change events of every validator sync.
+
+    Args:
+        target: Path of a JSON lines file, or any sink object with a `write(events)` method.
+            Without a target the change feed is disabled.
+
+    Returns:
+        The active sink, or None.
+    """
+    global _sink
+    if _sink is not None and _sink is not target and hasattr(_sink, 'close'):
+        _sink.close()
+    _sink = JsonlSink(target) if isinstance(target, (str, os.PathLike)) else target
+    return _sink
+
+
+def get_change_sink():
+    """Returns the active change feed sink, or None."""
+    return _sink
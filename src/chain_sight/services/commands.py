@@ -1,165 +1,313 @@
-import json
 import logging
-import os
+import time
 
-from chain_sight.common.config import load_config
-from chain_sight.models.models import ChainConfig
-from chain_sight.services.blockchain import fetch_validators, fetch_and_store_delegators, fetch_governance_proposals
-from chain_sight.services.database_config import Session
-from chain_sight.services.database import insert_validator, insert_or_update_governance_proposal
+from concurrent.futures import ProcessPoolExecutor
+
+from chain_sight.common import metrics, profiling
+# The chain configuration commands live with the chain configuration, so that they can run without
+# loading the fetch pipeline; they are re-exported here for existing callers
+from chain_sight.common.config import config_display, config_import, get_chain_context, invalidate_chain_contexts, \
+    resolve_chain_names
+from chain_sight.services.blockchain import DEFAULT_CONCURRENCY, DEFAULT_QUEUE_DEPTH, \
+    OPEN_PROPOSAL_STATUSES, DelegationPipeline, is_snapshot_mode, iter_governance_proposal_pages, \
+    iter_validator_pages, pin_block_height, prefetch_pages
+from chain_sight.services.changefeed import ChangeFeed, get_change_sink
+from chain_sight.services.database_config import engine
+from chain_sight.services.database import DEFAULT_BATCH_SIZE, DelegatorSync, get_governance_sync_state, upsert_validators, \
+    insert_or_update_governance_proposal
+from chain_sight.services.endpoints import reset_endpoint_pools
+from chain_sight.services.grpc_backend import reset_channels
+from chain_sight.services.snapshots import get_snapshot_store, snapshot_delegations
+from chain_sight.services.transport import HttpArchive, get_archive, reset_session
+
+
+# Number of chains synchronized in parallel when several chains are requested
+DEFAULT_WORKERS = 4
 
 
 logger = logging.getLogger(__name__)
 
+_SYNC_SECONDS = metrics.histogram('chain_sight_sync_duration_seconds', 'Duration of chain syncs, by chain and dataset.',
+                                  ('chain', 'dataset'))
+_SYNC_ERRORS = metrics.counter('chain_sight_sync_errors_total', 'Errors of chain syncs, by chain and dataset.',
+                               ('chain', 'dataset'))
+_SYNC_ROWS = metrics.gauge('chain_sight_sync_rows', 'Rows written by the last sync, by chain and dataset.',
+                           ('chain', 'dataset'))
+_LAST_SUCCESS = metrics.gauge('chain_sight_last_success_timestamp_seconds',
+                              'Unix time of the last sync without errors, by chain and dataset.', ('chain', 'dataset'))
 
-def config_import(config_path):
+
+def fetch_and_store_validators(chain_name, concurrency=DEFAULT_CONCURRENCY, batch_size=DEFAULT_BATCH_SIZE,
+                               queue_depth=DEFAULT_QUEUE_DEPTH):
     """
-    Imports chain configurations from a JSON file into the database.
-    If a chain exists but has different parameters, updates the database record.
+    Fetches validators of a chain and their delegators, and stores them in the database.
+
+    Fetching and writing form a streaming pipeline: every validator page is written as soon as
+    it arrives, and delegation pages of up to `concurrency` validators are downloaded in
+    parallel into a queue of at most `queue_depth` pages, which a single writer in the calling
+    thread drains. Memory use depends on the queue depth and batch size, not the chain size.
 
     Args:
-        config_path (str): The file path to the configuration JSON file.
+        chain_name (str): Chain ID as stored in the chain configuration.
+        concurrency (int): Maximum number of validators whose delegations are fetched at once.
+        batch_size (int): Number of delegators written per database statement.
+        queue_depth (int): Maximum number of fetched pages waiting for the writer.
+
+    When a snapshot store is configured, a snapshot of the chain's delegations is appended to it
+    once the sync has finished.
+
+    In snapshot mode (see `configure_snapshot_mode`) every request is pinned to the latest block
+    height, read once when the sync starts, and that height is stored on the written rows.
+
+    When a change feed is configured (see `configure_change_feed`), every new, changed and removed
+    validator and delegator is written to it under the run ID of the sync.
+
+    Returns:
+        dict: Row counts of the run, including the total `rows` written, or None if the chain is not configured.
     """
-    if not os.path.isfile(config_path):
-        logger.error(f"The configuration file does not exist at the specified path: {config_path}")
-        return
+    # Resolve the chain once; every writer reuses this context
+    chain_config = get_chain_context(chain_name)
+    if not chain_config:
+        logger.error(f"No configuration found for chain: {chain_name}")
+        return None
 
-    try:
-        with open(config_path, 'r') as file:
-            config_data = json.load(file)
-    except json.JSONDecodeError as jde:
-        logger.error(f"JSON decode error while reading the configuration file: {jde}")
-        return
-    except Exception as e:
-        logger.error(f"An unexpected error occurred while reading the configuration file: {e}")
-        return
+    if is_snapshot_mode():
+        chain_config = pin_block_height(chain_config)
 
-    session = Session()
+    result = {'rows': 0, 'validators': 0, 'validators_inserted': 0, 'validators_updated': 0,
+              'validators_unchanged': 0, 'delegators': 0, 'delegators_removed': 0, 'errors': 0,
+              'block_height': chain_config.block_height, 'run_id': None, 'changes': 0}
 
-    try:
-        for chain in config_data.get('chains', []):
-            # Validate required fields
-            required_fields = ['name', 'chain_id', 'prefix', 'rpc_endpoint', 'api_endpoint']
-            if not all(field in chain for field in required_fields):
-                logger.warning(f"Skipping chain due to missing required fields: {chain}")
-                continue
-
-            # Check if the chain configuration already exists based on 'chain_id'
-            existing_chain = session.query(ChainConfig).filter(
-                ChainConfig.chain_id == chain['chain_id']
-            ).first()
-
-            if not existing_chain:
-                # If it doesn't exist, create a new ChainConfig object and add it to the session
-                new_chain = ChainConfig(
-                    name=chain['name'],
-                    chain_id=chain['chain_id'],
-                    prefix=chain['prefix'],
-                    rpc_endpoint=chain['rpc_endpoint'],
-                    api_endpoint=chain['api_endpoint'],
-                    grpc_endpoint=chain.get('grpc_endpoint')  # Use .get() to handle optional fields
-                )
-                session.add(new_chain)
-                logger.info(f"Added new chain configuration: {chain['name']}")
+    sink = get_change_sink()
+    feed = ChangeFeed(sink, chain_config) if sink is not None else None
+    if feed is not None:
+        result['run_id'] = feed.run_id
+
+    def write(events):
+        for kind, validator_addr, payload in events:
+            if kind == 'page':
+                sync.write_page(validator_addr, payload)
+            elif kind == 'done':
+                sync.finish_validator(validator_addr)
+                logger.info(f"Delegators for validator {validator_addr} fetched and stored successfully.")
             else:
-                # Compare each field to detect changes
-                updated = False
-                fields_to_compare = ['name', 'prefix', 'rpc_endpoint', 'api_endpoint', 'grpc_endpoint']
-
-                for field in fields_to_compare:
-                    config_value = chain.get(field)
-                    db_value = getattr(existing_chain, field)
-
-                    # Handle None values for optional fields like 'grpc_endpoint'
-                    if config_value != db_value:
-                        setattr(existing_chain, field, config_value)
-                        updated = True
-                        logger.debug(f"Updated '{field}' for chain '{existing_chain.name}' from '{db_value}' to '{config_value}'")
-
-                if updated:
-                    logger.info(f"Updated chain configuration: {existing_chain.name}")
-                else:
-                    logger.info(f"No changes detected for chain: {existing_chain.name}")
-
-        # Commit the session to save changes to the database
-        session.commit()
-        logger.info("Configurations imported successfully.")
-    except Exception as e:
-        session.rollback()
-        logger.error(f"An error occurred during configuration import: {e}")
-    finally:
-        session.close()
+                logger.error(f"Failed to fetch delegators for validator {validator_addr}: {payload}")
+                sync.discard_validator(validator_addr)
+                result['errors'] += 1
 
+    with DelegationPipeline(chain_config, concurrency, queue_depth) as pipeline, \
+            DelegatorSync(chain_config, batch_size, feed) as sync:
+        for validators in prefetch_pages(iter_validator_pages(chain_config), queue_depth, 'validators'):
+            # Write only new and changed validators
+            counts = upsert_validators(validators, chain_config, feed, sync)
+            result['validators'] += len(validators)
+            for key, value in counts.items():
+                result[f'validators_{key}'] += value
 
-# def config_display():
-#     config = load_config()
-#     print(json.dumps(config, indent=4))
+            # Start downloading delegators of this page, and write the pages already waiting
+            pipeline.submit(validator.operator_address for validator in validators)
+            write(pipeline.poll())
 
-def config_display():
-    """
-    Retrieves chain configurations from the database and displays them in JSON format.
-    The output mirrors the structure of the original configuration JSON file.
-    """
-    session = Session()
-    try:
-        chains = session.query(ChainConfig).all()
-        if not chains:
-            logger.info("No chain configurations found in the database.")
-            print(json.dumps({"chains": []}, indent=4))
-            return
-
-        config = {"chains": []}
-        for chain in chains:
-            chain_dict = {
-                "name": chain.name,
-                "chain_id": chain.chain_id,
-                "prefix": chain.prefix,
-                "rpc_endpoint": chain.rpc_endpoint,
-                "api_endpoint": chain.api_endpoint,
-                "grpc_endpoint": chain.grpc_endpoint,
-            }
-            config["chains"].append(chain_dict)
-
-        # Output the configuration in JSON format
-        print(json.dumps(config, indent=4))
-    except Exception as e:
-        logger.error(f"An error occurred while displaying configurations: {e}")
-    finally:
-        session.close()
+        write(pipeline.events())
+        sync.flush()
+        result['delegators'] = sync.written
+        result['delegators_removed'] = sync.removed
+    if feed is not None:
+        result['changes'] = feed.emitted
+        logger.info(f"Wrote {feed.emitted} change events of {chain_name} for run {feed.run_id}.")
 
+    result['rows'] = (result['validators_inserted'] + result['validators_updated'] + result['delegators']
+                      + result['delegators_removed'])
 
-def fetch_and_store_validators(chain_name):
-    chain_config = load_config(chain_name)
-    if not chain_config:
-        logger.error(f"No configuration found for chain: {chain_name}")
-        return
-
-    validators = fetch_validators(chain_config)
-    if validators:
-        for validator in validators:
-            # Insert each validator into the database
-            insert_validator(validator, chain_config.chain_id)
-            # After inserting a validator, fetch and store its delegators
-            fetch_and_store_delegators(validator['operator_address'], chain_config)
+    # Keep the delegation history in the snapshot store, if one is configured
+    store = get_snapshot_store()
+    if store is not None:
+        try:
+            snapshot_delegations(chain_config, store, metadata={'errors': result['errors'],
+                                                                'block_height': chain_config.block_height,
+                                                                'run_id': result['run_id']})
+        except Exception as e:
+            logger.error(f"Failed to store delegation snapshot for {chain_name}: {e}")
+            result['errors'] += 1
+    if result['validators']:
         logger.info(f"Validators and their delegators for {chain_name} fetched and stored successfully.")
     else:
         logger.warning(f"No validators found for {chain_name}.")
 
+    return result
+
+
+def fetch_and_store_governance_proposals(chain_name, full_sync=False, queue_depth=DEFAULT_QUEUE_DEPTH):
+    """
+    Fetches governance proposals of a chain and stores them in the database.
+
+    By default only proposals newer than the highest stored proposal ID and stored proposals
+    still in deposit or voting period are fetched. The first run of a chain, or a run with
+    `full_sync`, fetches the whole proposal history.
+
+    Args:
+        chain_name (str): Chain ID as stored in the chain configuration.
+        full_sync (bool): Re-fetch and upsert every proposal of the chain.
+        queue_depth (int): Maximum number of fetched pages waiting for the writer.
 
-def fetch_and_store_governance_proposals(chain_name):
-    chain_config = load_config(chain_name)
+    Returns:
+        dict: Row counts of the run, including the total `rows` written, or None if the chain is not configured.
+    """
+    # Resolve the chain once; every writer reuses this context
+    chain_config = get_chain_context(chain_name)
     if not chain_config:
         logger.error(f"No configuration found for chain: {chain_name}")
-        return
+        return None
 
-    chain_id = chain_config.chain_id  # Access chain_id attribute
+    result = {'rows': 0, 'proposals': 0, 'errors': 0}
 
-    proposals = fetch_governance_proposals(chain_config)
-    if proposals:
+    known_max_id, open_ids = (None, []) if full_sync else get_governance_sync_state(chain_config, OPEN_PROPOSAL_STATUSES)
+    if known_max_id is None:
+        logger.info(f"Running full governance sync for {chain_name}.")
+    else:
+        logger.info(f"Running incremental governance sync for {chain_name} after proposal {known_max_id} "
+                    f"with {len(open_ids)} open proposals.")
+
+    for proposals in prefetch_pages(iter_governance_proposal_pages(chain_config, known_max_id, open_ids), queue_depth,
+                                    'governance'):
         for proposal in proposals:
-            title = proposal.get("title")
+            title = proposal.title
             logger.debug(f"Processing proposal with title: {title}")
-            insert_or_update_governance_proposal(proposal, chain_id)
+            if insert_or_update_governance_proposal(proposal, chain_config):
+                result['proposals'] += 1
+            else:
+                result['errors'] += 1
+    result['rows'] = result['proposals']
+
+    if result['proposals'] or result['errors']:
         logger.info(f"Governance proposals for {chain_name} fetched and stored successfully.")
     else:
-        logger.warning(f"No governance proposals found for {chain_name}.")
\ No newline at end of file
+        logger.warning(f"No governance proposals found for {chain_name}.")
+
+    return result
+
+
+def run_chain(chain_name, fetch, concurrency=DEFAULT_CONCURRENCY, batch_size=DEFAULT_BATCH_SIZE, full_sync=False,
+              queue_depth=DEFAULT_QUEUE_DEPTH):
+    """
+    Runs one fetch for a single chain and summarizes the outcome.
+
+    Args:
+        chain_name (str): Chain ID as stored in the chain configuration.
+        fetch (str): Dataset to fetch, 'validators' or 'governance'.
+        concurrency (int): Maximum number of validators whose delegations are fetched at once.
+        batch_size (int): Number of delegators written per database statement.
+        full_sync (bool): Re-fetch the whole governance history instead of an incremental sync.
+        queue_depth (int): Maximum number of fetched pages waiting for the writer.
+
+    Returns:
+        dict: Summary with chain, fetch, rows, errors, duration and error message.
+    """
+    summary = {'chain': chain_name, 'fetch': fetch, 'rows': 0, 'errors': 0, 'duration': 0.0, 'error': None}
+    started = time.monotonic()
+    try:
+        if fetch == 'validators':
+            result = fetch_and_store_validators(chain_name, concurrency, batch_size, queue_depth)
+        else:
+            result = fetch_and_store_governance_proposals(chain_name, full_sync, queue_depth)
+
+        if result is None:
+            summary['errors'] = 1
+            summary['error'] = 'No configuration found'
+        else:
+            summary.update(result)
+    except Exception as e:
+        logger.error(f"Failed to fetch {fetch} for chain {chain_name}: {e}")
+        summary['errors'] += 1
+        summary['error'] = str(e)
+    summary['duration'] = time.monotonic() - started
+
+    _SYNC_SECONDS.observe(summary['duration'], chain=chain_name, dataset=fetch)
+    _SYNC_ROWS.set(summary['rows'], chain=chain_name, dataset=fetch)
+    if summary['errors']:
+        _SYNC_ERRORS.inc(summary['errors'], chain=chain_name, dataset=fetch)
+    else:
+        _LAST_SUCCESS.set(time.time(), chain=chain_name, dataset=fetch)
+    return summary
+
+
+def _run_chain_in_worker(*args):
+    """Runs `run_chain` in a worker process and returns its summary with the metrics it recorded."""
+    metrics.REGISTRY.reset()
+    summary = run_chain(*args)
+    return summary, metrics.REGISTRY.dump()
+
+
+def _init_chain_worker(log_level):
+    """Gives each worker process its own database connections and HTTP connection pool."""
+    engine.dispose(close=False)
+    reset_session()
+    reset_endpoint_pools()
+    reset_channels()
+    archive = get_archive()
+    if archive is not None:
+        archive.reopen()
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=log_level, format='[%(asctime)s] [%(levelname)-8s] %(name)s: %(message)s')
+
+
+def run_chains(chain_names, fetch, workers=DEFAULT_WORKERS, concurrency=DEFAULT_CONCURRENCY,
+               batch_size=DEFAULT_BATCH_SIZE, full_sync=False, queue_depth=DEFAULT_QUEUE_DEPTH):
+    """
+    Runs a fetch for several chains, in parallel on a process pool when more than one worker is allowed.
+
+    Args:
+        chain_names (list): Chain IDs to synchronize.
+        fetch (str): Dataset to fetch, 'validators' or 'governance'.
+        workers (int): Maximum number of chains synchronized at the same time.
+        concurrency (int): Maximum number of validators whose delegations are fetched at once, per chain.
+        batch_size (int): Number of delegators written per database statement.
+        full_sync (bool): Re-fetch the whole governance history instead of an incremental sync.
+        queue_depth (int): Maximum number of fetched pages waiting for the writer.
+
+    Returns:
+        list: One summary per chain, in the order of `chain_names`.
+    """
+    archive = get_archive()
+    if workers > 1 and archive is not None and archive.mode == HttpArchive.RECORD:
+        logger.warning("Recording HTTP responses: chains are fetched one at a time in this process.")
+        workers = 1
+    if workers > 1 and profiling.is_profiling():
+        logger.warning("Profiling: chains are fetched one at a time in this process.")
+        workers = 1
+
+    if workers <= 1 or len(chain_names) <= 1:
+        return [run_chain(chain_name, fetch, concurrency, batch_size, full_sync, queue_depth)
+                for chain_name in chain_names]
+
+    workers = min(workers, len(chain_names))
+    logger.info(f"Fetching {fetch} for {len(chain_names)} chains with {workers} worker processes.")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_chain_worker,
+                             initargs=(logging.getLogger().getEffectiveLevel(),)) as executor:
+        futures = [executor.submit(_run_chain_in_worker, chain_name, fetch, concurrency, batch_size, full_sync,
+                                   queue_depth)
+                   for chain_name in chain_names]
+        summaries = []
+        for future in futures:
+            summary, worker_metrics = future.result()
+            # Metrics of worker processes are collected into the registry of this process
+            metrics.REGISTRY.merge(worker_metrics)
+            summaries.append(summary)
+        return summaries
+
+
+def print_chain_summaries(summaries):
+    """
+    Logs and prints a per-chain summary table of a run.
+
+    Args:
+        summaries (list): Summaries returned by `run_chains`.
+    """
+    header = f"{'chain':<24} {'fetch':<11} {'rows':>10} {'errors':>7} {'duration':>10}  error"
+    lines = [header, '-' * len(header)]
+    for summary in summaries:
+        lines.append(f"{summary['chain']:<24} {summary['fetch']:<11} {summary['rows']:>10} {summary['errors']:>7} "
+                     f"{summary['duration']:>9.1f}s  {summary['error'] or ''}")
+        logger.info(f"Chain {summary['chain']} ({summary['fetch']}): {summary['rows']} rows, "
+                    f"{summary['errors']} errors in {summary['duration']:.1f}s.")
+    print('\n'.join(lines))
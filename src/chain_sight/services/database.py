@@ -1,81 +1,189 @@
+import hashlib
 import json
 import logging
+import time
 
-from dateutil import parser
-from decimal import Decimal
+from itertools import islice
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, and_, bindparam, cast, event, exists, func, insert, \
+    or_, select, tuple_, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
-from chain_sight.models.models import Validator, ChainConfig, Delegator, GovernanceProposal
+from chain_sight.common import metrics, profiling
+from chain_sight.common.config import resolve_chain
+from chain_sight.models.models import Validator, Delegator, DelegatorSummary, GovernanceProposal
 from chain_sight.services.database_config import Session
+from chain_sight.services.decoding import delegation_from_json, validator_from_json
+from chain_sight.services.summaries import rebuild_summaries, refresh_delegator_summaries, \
+    refresh_validator_summaries
 
 logger = logging.getLogger(__name__)
 
+# Number of delegator rows written per INSERT statement and transaction
+DEFAULT_BATCH_SIZE = 1000
+
+# Dialects supporting INSERT ... ON CONFLICT DO UPDATE
+_UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+# Per-connection staging table holding the delegator addresses seen per validator during a sync
+_active_delegators = Table(
+    'active_delegators_staging', MetaData(),
+    Column('validator_address', String, primary_key=True),
+    Column('delegator_address', String, primary_key=True),
+    prefixes=['TEMPORARY'],
+)
+
+# Per-connection staging tables holding the validators and delegators whose summaries a sync has yet to refresh
+_changed_validators = Table(
+    'changed_validators_staging', MetaData(),
+    Column('operator_address', String, primary_key=True),
+    prefixes=['TEMPORARY'],
+)
+_changed_delegators = Table(
+    'changed_delegators_staging', MetaData(),
+    Column('delegator_address', String, primary_key=True),
+    prefixes=['TEMPORARY'],
+)
+
+_ROWS = metrics.counter('chain_sight_rows_total', 'Rows written to the database, by table and operation.',
+                        ('table', 'operation'))
+_STATEMENT_SECONDS = metrics.histogram('chain_sight_db_statement_duration_seconds',
+                                       'Execution time of SQL statements, by statement type.', ('operation',))
+_COMMIT_SECONDS = metrics.histogram('chain_sight_db_commit_duration_seconds', 'Duration of database commits, by writer.',
+                                    ('writer',))
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['statement_started'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _observe_statement(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('statement_started', None)
+    if started is not None:
+        operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else 'other'
+        _STATEMENT_SECONDS.observe(time.perf_counter() - started, operation=operation)
+
+
+# Governance proposal fields refreshed when a stored proposal is fetched again
+_PROPOSAL_UPDATE_FIELDS = (
+    'status', 'yes_votes', 'abstain_votes', 'no_votes', 'no_with_veto_votes', 'title', 'description',
+    'proposal_metadata',
+)
+
+# Validator fields whose old and new values are written to the change feed
+_VALIDATOR_FEED_FIELDS = ('tokens', 'delegator_shares', 'status', 'jailed', 'commission_rate', 'moniker')
+
 
 def insert_validator(validator_data, chain_id):
     """
-    Inserts a new validator into the database.
-
-    If the validator with the given `operator_address` already exists for the specified `chain_id`,
-    the insertion is skipped.
+    Inserts a new validator into the database, or updates it if its data changed.
 
     Args:
-        validator_data (dict): The raw validator data fetched from the API.
+        validator_data (ValidatorRecord or dict): The validator fetched from the API.
         chain_id (str): The chain ID of the blockchain to which the validator belongs.
 
     Returns:
         None
     """
-    session = Session()
-    try:
-        logger.debug(f"Received validator data: {validator_data}")
+    upsert_validators([validator_data], chain_id)
 
-        # Fetch chain configuration by chain_id
-        chain_config = session.query(ChainConfig).filter_by(chain_id=chain_id).first()
-        if not chain_config:
-            logger.error(f"No chain configuration found for chain_id {chain_id}")
-            return
 
-        # Check if validator already exists for this chain
-        existing_validator = session.query(Validator).filter_by(
-            operator_address=validator_data.get("operator_address"),
-            chain_config_id=chain_config.id  # Ensure the validator is linked to this chain
-        ).first()
+def upsert_validators(validators_data, chain, feed=None, sync=None):
+    """
+    Synchronizes validators of a chain, such as one fetched page, with the database.
 
-        if existing_validator:
-            logger.info(
-                f"Validator {validator_data.get('operator_address')} already exists for chain {chain_id}. Skipping insertion.")
-            return
+    Every incoming validator is converted to a row and hashed. The hash is compared with the
+    `content_hash` stored for the validator, so only new and changed validators are written,
+    each group with a single bulk statement, in one transaction. For a chain context pinned to a
+    block height, the `snapshot_height` of unchanged validators is moved to that height. The
+    summaries of the new and changed validators are refreshed in the same transaction, or with
+    the other summaries of `sync` when it is closed.
+
+    Args:
+        validators_data (list): ValidatorRecord of each validator, or the raw validator dicts returned by the API.
+        chain (ChainContext or str): The chain context, or chain ID, of the blockchain.
+        feed (ChangeFeed): Change feed receiving the new and changed validators once they are committed.
+        sync (DelegatorSync): Delegator sync of the chain that refreshes the summaries of the written validators.
 
-        # Prepare the validator data for insertion
-        prepared_data = {
-            "operator_address": validator_data.get("operator_address", ""),
-            "chain_config_id": chain_config.id,
-            "consensus_pubkey": json.dumps(validator_data.get("consensus_pubkey", {})),
-            "jailed": validator_data.get("jailed", False),
-            "status": validator_data.get("status", ""),
-            "tokens": int(validator_data.get("tokens", 0)),
-            "delegator_shares": float(validator_data.get("delegator_shares", 0.0)),
-            "moniker": validator_data.get("description", {}).get("moniker", ""),
-            "identity": validator_data.get("description", {}).get("identity", ""),
-            "website": validator_data.get("description", {}).get("website", ""),
-            "security_contact": validator_data.get("description", {}).get("security_contact", ""),
-            "details": validator_data.get("description", {}).get("details", ""),
-            "commission_rate": float(validator_data.get("commission", {}).get("commission_rates", {}).get("rate", 0.0)),
-            "commission_max_rate": float(
-                validator_data.get("commission", {}).get("commission_rates", {}).get("max_rate", 0.0)),
-            "commission_max_change_rate": float(
-                validator_data.get("commission", {}).get("commission_rates", {}).get("max_change_rate", 0.0)),
-            "min_self_delegation": int(validator_data.get("min_self_delegation", 1))
-        }
-
-        # Insert new validator into the database
-        validator = Validator(**prepared_data)
-        session.add(validator)
-        session.commit()
-        logger.debug(f"Validator {validator_data.get('operator_address')} for chain {chain_id} inserted successfully.")
+    Returns:
+        dict: Number of validators inserted, updated and unchanged.
+    """
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    session = Session()
+    try:
+        # Resolve the chain from the cached chain context, without a query per call
+        chain_config = resolve_chain(chain)
+        if not chain_config:
+            logger.error(f"No chain configuration found for chain_id {chain}")
+            return counts
+        chain_id = chain_config.chain_id
+
+        snapshot_height = getattr(chain_config, 'block_height', None)
+        with profiling.stage('normalization'):
+            rows = [_prepare_validator_row(validator_data, chain_config.id, snapshot_height)
+                    for validator_data in validators_data]
+
+        operator_addresses = [row["operator_address"] for row in rows]
+        columns = [Validator.operator_address, Validator.content_hash]
+        if feed is not None:
+            # The old values of the change feed come with the hashes, in the same query
+            columns += [getattr(Validator, field) for field in _VALIDATOR_FEED_FIELDS]
+        stored = {address: values for address, *values in session.execute(
+            select(*columns).where(
+                Validator.chain_config_id == chain_config.id,
+                Validator.operator_address.in_(operator_addresses))
+        )}
+
+        new_rows = []
+        changed_rows = []
+        unchanged_addresses = []
+        for row in rows:
+            logger.debug(f"Received validator data: {row}")
+            if row["operator_address"] not in stored:
+                new_rows.append(row)
+            elif stored[row["operator_address"]][0] != row["content_hash"]:
+                changed_rows.append(row)
+            else:
+                unchanged_addresses.append(row["operator_address"])
+        counts['unchanged'] = len(unchanged_addresses)
+
+        with profiling.stage('db_write'):
+            if new_rows:
+                session.execute(insert(Validator), new_rows)
+            if changed_rows:
+                session.execute(update(Validator), changed_rows)
+            if unchanged_addresses and snapshot_height is not None:
+                session.execute(update(Validator).where(
+                    Validator.chain_config_id == chain_config.id,
+                    Validator.operator_address.in_(unchanged_addresses)).values(snapshot_height=snapshot_height))
+        written_addresses = [row["operator_address"] for row in new_rows + changed_rows]
+        if sync is None:
+            with profiling.stage('summaries'):
+                refresh_validator_summaries(session.connection(), chain_config.id, written_addresses)
+        with profiling.stage('db_write'):
+            with _COMMIT_SECONDS.time(writer='validators'):
+                session.commit()
+        if sync is not None:
+            sync.stage_validators(written_addresses)
+        if feed is not None:
+            feed.emit(_validator_change_events(feed, new_rows, changed_rows, stored))
+
+        counts['inserted'] = len(new_rows)
+        counts['updated'] = len(changed_rows)
+        for operation, count in counts.items():
+            _ROWS.inc(count, table='validators', operation=operation)
+        logger.info(f"Validators for chain {chain_id}: {counts['inserted']} inserted, {counts['updated']} updated, "
+                    f"{counts['unchanged']} unchanged.")
 
     except IntegrityError as e:
-        logger.error(f"IntegrityError occurred while inserting validator: {e}")
+        logger.error(f"IntegrityError occurred while upserting validators: {e}")
         session.rollback()
     except SQLAlchemyError as e:
         logger.error(f"SQLAlchemyError occurred: {e}")
@@ -86,6 +194,31 @@ def insert_validator(validator_data, chain_id):
     finally:
         session.close()
 
+    return counts
+
+
+def _prepare_validator_row(validator_data, chain_config_id, snapshot_height=None):
+    """Turns a validator, a ValidatorRecord or raw dict, into a row including the hash of its content."""
+    if isinstance(validator_data, dict):
+        validator_data = validator_from_json(validator_data)
+    row = validator_data._asdict()
+    row["chain_config_id"] = chain_config_id
+    row["content_hash"] = hashlib.sha256(json.dumps(row, sort_keys=True, default=str).encode()).hexdigest()
+    # The height is left out of the hash, so validators read at another height are still unchanged
+    row["snapshot_height"] = snapshot_height
+    return row
+
+
+def _validator_change_events(feed, new_rows, changed_rows, stored):
+    """Change events of written validators; `stored` holds the hash and old feed fields per address."""
+    events = [feed.event('validators', 'insert', row["operator_address"],
+                         new={field: row[field] for field in _VALIDATOR_FEED_FIELDS})
+              for row in new_rows]
+    for row in changed_rows:
+        old = dict(zip(_VALIDATOR_FEED_FIELDS, stored[row["operator_address"]][1:]))
+        events.append(feed.event('validators', 'update', row["operator_address"], old=old,
+                                 new={field: row[field] for field in _VALIDATOR_FEED_FIELDS}))
+    return events
 
 
 def insert_delegator(delegator_data, validator_address, chain_id):
@@ -103,58 +236,66 @@ def insert_delegator(delegator_data, validator_address, chain_id):
     Returns:
         None
     """
+    insert_delegators([delegator_data], validator_address, chain_id)
+
+
+def insert_delegators(delegator_entries, validator_address, chain, batch_size=DEFAULT_BATCH_SIZE, feed=None):
+    """
+    Inserts or updates delegators of a validator in batches.
+
+    Each batch is written with a single multi-row `INSERT ... ON CONFLICT DO UPDATE` statement
+    on PostgreSQL and SQLite (falling back to executemany inserts and updates on other
+    databases) and committed once. The summaries of the delegators the committed batches changed
+    are refreshed once all batches are written, or the first one failed.
+
+    Args:
+        delegator_entries (list): DelegationRecord of each `delegation_responses` entry, or the raw entries.
+        validator_address (str): The address of the validator to whom the delegators are linked.
+        chain (ChainContext or str): The chain context, or chain ID, of the blockchain.
+        batch_size (int): Maximum number of rows written per statement and transaction.
+        feed (ChangeFeed): Change feed receiving the new and changed delegators of every committed batch.
+
+    Returns:
+        int: Number of delegator rows written.
+    """
+    if not delegator_entries:
+        return 0
+
     session = Session()
+    written = 0
+    # Delegators changed by the committed batches
+    changed_delegators = set()
     try:
-        # Fetch chain configuration by chain_id
-        chain_config = session.query(ChainConfig).filter_by(chain_id=chain_id).first()
+        # Resolve the chain from the cached chain context, without a query per call
+        chain_config = resolve_chain(chain)
         if not chain_config:
-            logger.error(f"No chain configuration found for chain_id {chain_id}")
-            return
-
-        delegation = delegator_data['delegation']
-        balance = delegator_data['balance']
-
-        # Check for existing delegator linked to this validator and chain
-        existing_delegator = session.query(Delegator).filter_by(
-            delegator_address=delegation["delegator_address"],
-            validator_address=validator_address,
-            validator_chain_config_id=chain_config.id
-        ).first()
-
-        if existing_delegator:
-            # Update balance if it has changed
-            is_amount_different = Decimal(existing_delegator.balance_amount) != Decimal(balance["amount"])
-            is_share_different = Decimal(existing_delegator.shares) != Decimal(delegation["shares"])
-
-            #if Decimal(existing_delegator.balance_amount) != Decimal(balance["amount"]):
-            if is_amount_different or is_share_different:
-                logger.debug(
-                    f'Existing delegator. Balances (old, new): {existing_delegator.balance_amount}, {balance["amount"]}. Balance different: {is_amount_different}')
-                logger.debug(
-                    f'Existing delegator. Shares (old, new): {existing_delegator.shares}, {delegation["shares"]}. Balance different: {is_share_different}')
-                existing_delegator.balance_amount = balance["amount"]
-                existing_delegator.shares = delegation["shares"]
-                session.commit()
-                logger.debug(
-                    f"Updated balance for delegator {delegation['delegator_address']} of validator {validator_address} on chain {chain_id}.")
-
-        else:
-            # Insert new delegator
-            new_delegator = Delegator(
-                delegator_address=delegation["delegator_address"],
-                validator_address=validator_address,
-                validator_chain_config_id=chain_config.id,
-                shares=delegation["shares"],
-                balance_amount=int(balance["amount"]),
-                balance_denom=balance["denom"],
-            )
-            session.add(new_delegator)
-            session.commit()
-            logger.debug(
-                f"Inserted new delegator {delegation['delegator_address']} for validator {validator_address} on chain {chain_id}.")
+            logger.error(f"No chain configuration found for chain_id {chain}")
+            return 0
+        chain_id = chain_config.chain_id
+
+        snapshot_height = getattr(chain_config, 'block_height', None)
+        with profiling.stage('normalization'):
+            rows = [_prepare_delegator_row(entry, validator_address, chain_config.id, snapshot_height)
+                    for entry in delegator_entries]
+
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            with profiling.stage('db_write'):
+                changed, events = _upsert_delegator_rows(session.connection(), batch, feed)
+                with _COMMIT_SECONDS.time(writer='delegators'):
+                    session.commit()
+            changed_delegators.update(delegator_address for _, delegator_address in changed)
+            if feed is not None:
+                feed.emit(events)
+            written += len(batch)
+            _ROWS.inc(len(batch), table='delegators', operation='upserted')
+            logger.debug(f"Committed batch of {len(batch)} delegators for validator {validator_address} on chain {chain_id}.")
+
+        logger.info(f"Stored {written} delegators for validator {validator_address} on chain {chain_id} "
+                    f"(batch size {batch_size}).")
 
     except IntegrityError as e:
-        logger.error(f"IntegrityError occurred while inserting delegator: {e}")
+        logger.error(f"IntegrityError occurred while inserting delegators: {e}")
         session.rollback()
     except SQLAlchemyError as e:
         logger.error(f"SQLAlchemyError occurred: {e}")
@@ -163,77 +304,509 @@ def insert_delegator(delegator_data, validator_address, chain_id):
         logger.error(f"An unexpected error occurred: {e}")
         session.rollback()
     finally:
+        if changed_delegators:
+            _refresh_summaries(session, chain_config.id, [validator_address], changed_delegators)
         session.close()
 
+    return written
+
+
+def _refresh_summaries(session, chain_config_id, operator_addresses, delegator_addresses):
+    """Refreshes the summaries of committed changes in a transaction of their own."""
+    try:
+        with profiling.stage('summaries'):
+            refresh_validator_summaries(session.connection(), chain_config_id, operator_addresses)
+            refresh_delegator_summaries(session.connection(), chain_config_id, delegator_addresses)
+            session.commit()
+    except SQLAlchemyError as e:
+        logger.error(f"Failed to refresh summaries of validators {sorted(operator_addresses)}: {e}")
+        session.rollback()
+
 
-def insert_or_update_governance_proposal(proposal_data, chain_id):
+def _prepare_delegator_row(delegator_data, validator_address, chain_config_id, snapshot_height=None):
+    if isinstance(delegator_data, dict):
+        delegator_data = delegation_from_json(delegator_data)
+    return {
+        "delegator_address": delegator_data.delegator_address,
+        "validator_address": validator_address,
+        "validator_chain_config_id": chain_config_id,
+        "shares": delegator_data.shares,
+        "balance_amount": delegator_data.amount,
+        "balance_denom": delegator_data.denom,
+        "snapshot_height": snapshot_height,
+    }
+
+
+def _delegator_key(row):
+    return row["validator_chain_config_id"], row["validator_address"], row["delegator_address"]
+
+
+def _stored_delegators(connection, rows):
+    """Looks up the stored rows of a batch: (id, shares, balance amount, balance denom) per delegator key."""
+    table = Delegator.__table__
+    return {
+        (chain_config_id, validator_address, delegator_address): values
+        for chain_config_id, validator_address, delegator_address, *values in connection.execute(
+            select(table.c.validator_chain_config_id, table.c.validator_address, table.c.delegator_address,
+                   table.c.id, table.c.shares, table.c.balance_amount, table.c.balance_denom)
+            .where(tuple_(table.c.validator_chain_config_id, table.c.validator_address, table.c.delegator_address)
+                   .in_([_delegator_key(row) for row in rows]))
+        )
+    }
+
+
+def _upsert_delegator_rows(connection, rows, feed=None, detect_changes=True):
     """
-    Inserts a new governance proposal or updates an existing one.
+    Writes a batch of delegator rows, updating rows whose balance or shares changed or read at a new height.
 
-    If a proposal with the same `proposal_id` already exists for the specified `chain_id`,
-    the proposal is updated with the latest data. Otherwise, it is inserted as a new proposal.
+    Args:
+        detect_changes (bool): Whether the changed rows are returned. Without it and without a change
+            feed, the rows are written without reading or returning anything.
+
+    Returns:
+        tuple: (validator address, delegator address) of the rows inserted or whose balance or shares changed,
+        and their change events when a change feed is given, to be emitted after commit.
+    """
+    dialect_insert = _UPSERT_DIALECTS.get(connection.dialect.name)
+    if not detect_changes and feed is None and dialect_insert is not None:
+        returning, stored = False, None
+    else:
+        # The upsert returns the rows it wrote, unless rows read at a new height are rewritten without a change,
+        # or the old values are needed; then the changes come from the stored rows, which the fallback reads anyway
+        returning = (dialect_insert is not None and feed is None and connection.dialect.insert_executemany_returning
+                     and all(row["snapshot_height"] is None for row in rows))
+        stored = None if returning else _stored_delegators(connection, rows)
+    if dialect_insert is None:
+        _upsert_delegator_rows_executemany(connection, rows, stored)
+        return _delegator_changes(feed, rows, stored)
+
+    table = Delegator.__table__
+    statement = dialect_insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.validator_chain_config_id, table.c.validator_address, table.c.delegator_address],
+        set_={
+            "shares": statement.excluded.shares,
+            "balance_amount": statement.excluded.balance_amount,
+            "balance_denom": statement.excluded.balance_denom,
+            "snapshot_height": statement.excluded.snapshot_height,
+        },
+        where=or_(
+            table.c.shares != statement.excluded.shares,
+            table.c.balance_amount != statement.excluded.balance_amount,
+            and_(statement.excluded.snapshot_height.is_not(None),
+                 table.c.snapshot_height.is_distinct_from(statement.excluded.snapshot_height)),
+        ),
+    )
+    if returning:
+        return connection.execute(statement.returning(table.c.validator_address, table.c.delegator_address),
+                                  rows).all(), []
+    connection.execute(statement, rows)
+    if stored is None:
+        return [], []
+    return _delegator_changes(feed, rows, stored)
+
+
+def _upsert_delegator_rows_executemany(connection, rows, stored):
+    """Fallback for databases without ON CONFLICT: executemany inserts and updates of looked up rows."""
+    table = Delegator.__table__
+    keys = [_delegator_key(row) for row in rows]
+    new_rows = [row for row, key in zip(rows, keys) if key not in stored]
+    updated_rows = [
+        {"delegator_id": stored[key][0], "new_shares": row["shares"], "new_balance_amount": row["balance_amount"],
+         "new_balance_denom": row["balance_denom"], "new_snapshot_height": row["snapshot_height"]}
+        for row, key in zip(rows, keys) if key in stored
+    ]
+    if new_rows:
+        connection.execute(table.insert(), new_rows)
+    if updated_rows:
+        connection.execute(
+            table.update().where(table.c.id == bindparam("delegator_id")).values(
+                shares=bindparam("new_shares"),
+                balance_amount=bindparam("new_balance_amount"),
+                balance_denom=bindparam("new_balance_denom"),
+                snapshot_height=bindparam("new_snapshot_height"),
+            ),
+            updated_rows,
+        )
+
+
+def _delegator_values(shares, amount, denom):
+    return {'shares': shares, 'amount': amount, 'denom': denom}
+
+
+def _delegator_changes(feed, rows, stored):
+    """The rows of a batch that are new, or whose balance or shares differ from the stored row, and their events."""
+    changed = []
+    events = []
+    for row in rows:
+        old = stored.get(_delegator_key(row))
+        if old is not None and old[1] == row["shares"] and old[2] == row["balance_amount"]:
+            continue
+        changed.append((row["validator_address"], row["delegator_address"]))
+        if feed is not None:
+            new = _delegator_values(row["shares"], row["balance_amount"], row["balance_denom"])
+            events.append(feed.event('delegations', 'insert' if old is None else 'update', row["validator_address"],
+                                     row["delegator_address"], old=old and _delegator_values(*old[1:]), new=new))
+    return changed, events
+
+
+def _stage_active_delegators(connection, validator_address, delegator_addresses, batch_size):
+    """Adds delegator addresses seen for a validator to the staging table, in batches."""
+    stage_statement = _stage_statement(connection)
+    addresses = iter(delegator_addresses)
+    while True:
+        batch = [{"validator_address": validator_address, "delegator_address": address}
+                 for address in islice(addresses, batch_size)]
+        if not batch:
+            break
+        connection.execute(stage_statement, batch)
+
+
+def _stage_statement(connection, table=_active_delegators):
+    """INSERT into a staging table that ignores addresses already staged."""
+    dialect_insert = _UPSERT_DIALECTS.get(connection.dialect.name)
+    if dialect_insert is None:
+        return table.insert()
+    return dialect_insert(table).on_conflict_do_nothing()
+
+
+def _delete_unstaged_delegators(connection, validator_address, chain_config_id, feed=None):
+    """
+    Deletes delegators of a validator missing from the staging table, then clears its staged rows.
+
+    Returns:
+        tuple: Addresses of the removed delegators, and their change events when a change feed is given.
+    """
+    delegators = Delegator.__table__
+    conditions = (
+        delegators.c.validator_chain_config_id == chain_config_id,
+        delegators.c.validator_address == validator_address,
+        ~exists().where(
+            _active_delegators.c.validator_address == delegators.c.validator_address,
+            _active_delegators.c.delegator_address == delegators.c.delegator_address,
+        ),
+    )
+    statement = delegators.delete().where(*conditions)
+    columns = (delegators.c.delegator_address, delegators.c.shares, delegators.c.balance_amount,
+               delegators.c.balance_denom)
+    # The removed rows come back from the DELETE itself where the database supports RETURNING
+    if connection.dialect.delete_returning:
+        stale = connection.execute(statement.returning(*columns)).all()
+    else:
+        stale = connection.execute(select(*columns).where(*conditions)).all()
+        connection.execute(statement)
+    events = []
+    if feed is not None:
+        events = [feed.event('delegations', 'delete', validator_address, delegator_address,
+                             old=_delegator_values(shares, amount, denom))
+                  for delegator_address, shares, amount, denom in stale]
+    _clear_staged_delegators(connection, validator_address)
+    return [row[0] for row in stale], events
+
+
+def _clear_staged_delegators(connection, validator_address):
+    connection.execute(_active_delegators.delete().where(_active_delegators.c.validator_address == validator_address))
+
+
+def cleanup_delegators(active_delegator_addresses, validator_address, chain, batch_size=DEFAULT_BATCH_SIZE,
+                       feed=None):
+    """
+    Removes delegators of a validator that are no longer returned by the API.
+
+    The active addresses are streamed into a temporary staging table in batches and stale rows
+    are removed with a single `DELETE ... WHERE NOT EXISTS` scoped to the validator and chain,
+    so memory use and statement count do not grow with the number of delegators.
 
     Args:
-        proposal_data (dict): The normalized proposal data.
-        chain_id (str): The chain ID of the blockchain.
+        active_delegator_addresses (iterable): Delegator addresses currently delegating to the validator.
+        validator_address (str): The address of the validator.
+        chain (ChainContext or str): The chain context, or chain ID, of the blockchain.
+        batch_size (int): Number of addresses staged per statement.
+        feed (ChangeFeed): Change feed receiving the removed delegators once they are committed.
 
     Returns:
-        None
+        int: Number of delegators removed.
     """
     session = Session()
-    try:
-        proposal_id = proposal_data['proposal_id']
-        logger.debug(f"Processing Proposal ID {proposal_id} for Chain ID {chain_id}.")
 
-        # Fetch chain configuration by chain_id
-        chain_config = session.query(ChainConfig).filter_by(chain_id=chain_id).first()
+    logger.debug(f'Delegators cleanup process starting.')
+
+    try:
+        # Resolve the chain from the cached chain context, without a query per call
+        chain_config = resolve_chain(chain)
         if not chain_config:
-            logger.error(f"No chain configuration found for chain_id {chain_id}")
+            logger.error(f"No chain configuration found for chain_id {chain}")
+            return 0
+        chain_id = chain_config.chain_id
+
+        with profiling.stage('cleanup'):
+            connection = session.connection()
+            _active_delegators.create(connection, checkfirst=True)
+            _clear_staged_delegators(connection, validator_address)
+            _stage_active_delegators(connection, validator_address, active_delegator_addresses, batch_size)
+            removed, events = _delete_unstaged_delegators(connection, validator_address, chain_config.id, feed)
+            _active_delegators.drop(connection)
+            if removed:
+                refresh_delegator_summaries(connection, chain_config.id, removed)
+                refresh_validator_summaries(connection, chain_config.id, [validator_address])
+
+            with _COMMIT_SECONDS.time(writer='delegators_cleanup'):
+                session.commit()
+        if feed is not None:
+            feed.emit(events)
+        _ROWS.inc(len(removed), table='delegators', operation='deleted')
+        logger.info(f"Removed {len(removed)} inactive delegators of validator {validator_address} on chain {chain_id}.")
+    except Exception as e:
+        logger.error(f"An error occurred during cleanup: {e}")
+        session.rollback()
+        return 0
+    finally:
+        session.close()
+
+    return len(removed)
+
+
+class DelegatorSync:
+    """
+    Streams delegation pages of a chain's validators into the database.
+
+    Rows are upserted in batches of `batch_size`, and the addresses seen for every validator
+    are staged in a temporary table on the writer's own connection. When a validator is
+    finished, its stale delegators are removed with a single DELETE. Memory use depends on
+    the batch size only, not on the number of delegators a validator has.
+
+    A validator whose download failed, or whose rows could not be written, is never cleaned
+    up, so an incomplete sync cannot remove live delegators.
+
+    Validators and delegators whose delegations changed are staged in two more temporary
+    tables, and their summaries are refreshed with one INSERT ... SELECT per table when the
+    sync is closed, so a validator or a delegator staking with many validators is aggregated
+    once per sync. The first sync of a chain, which has no summaries yet, skips the change
+    detection and rebuilds the summaries of the chain with one aggregate scan instead.
+
+    With a change feed, the new, changed and removed delegators are emitted after every commit.
+    """
+
+    def __init__(self, chain, batch_size=DEFAULT_BATCH_SIZE, feed=None):
+        self.chain_config = resolve_chain(chain)
+        if not self.chain_config:
+            raise ValueError(f"No chain configuration found for chain_id {chain}")
+        # Block height of a pinned chain context, recorded on every written row
+        self.snapshot_height = getattr(self.chain_config, 'block_height', None)
+        self.batch_size = batch_size
+        self.feed = feed
+        self.written = 0
+        self.removed = 0
+        self._rows = []
+        self._staged = []
+        self._failed_validators = set()
+
+        with Session() as session:
+            engine = session.get_bind()
+        # A dedicated connection keeps the temporary staging tables alive across commits
+        self._connection = engine.connect()
+        for table in (_active_delegators, _changed_validators, _changed_delegators):
+            table.create(self._connection, checkfirst=True)
+            self._connection.execute(table.delete())
+        # Without summaries of the chain, they are rebuilt when the sync is closed instead of tracking changes
+        self._rebuild = not self._connection.execute(
+            select(exists().where(DelegatorSummary.chain_config_id == self.chain_config.id))).scalar()
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_page(self, validator_address, delegator_entries):
+        """Queues one page of delegation entries, writing a batch once `batch_size` rows are pending."""
+        with profiling.stage('normalization'):
+            for entry in delegator_entries:
+                row = _prepare_delegator_row(entry, validator_address, self.chain_config.id, self.snapshot_height)
+                self._rows.append(row)
+                self._staged.append((validator_address, row["delegator_address"]))
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes pending rows and staged addresses in one transaction."""
+        if not self._rows:
+            return
+        rows, staged = self._rows, self._staged
+        self._rows, self._staged = [], []
+        try:
+            with profiling.stage('db_write'):
+                changed, events = _upsert_delegator_rows(self._connection, rows, self.feed,
+                                                         detect_changes=not self._rebuild)
+                self._connection.execute(_stage_statement(self._connection), [
+                    {"validator_address": validator_address, "delegator_address": delegator_address}
+                    for validator_address, delegator_address in staged
+                ])
+            with profiling.stage('summaries'):
+                self._stage_changes({validator_address for validator_address, _ in changed},
+                                    {delegator_address for _, delegator_address in changed})
+            with profiling.stage('db_write'):
+                with _COMMIT_SECONDS.time(writer='delegators'):
+                    self._connection.commit()
+            if self.feed is not None:
+                self.feed.emit(events)
+            self.written += len(rows)
+            _ROWS.inc(len(rows), table='delegators', operation='upserted')
+            logger.debug(f"Committed batch of {len(rows)} delegators on chain {self.chain_config.chain_id} "
+                         f"(batch size {self.batch_size}).")
+        except SQLAlchemyError as e:
+            self._connection.rollback()
+            failed = {validator_address for validator_address, _ in staged}
+            self._failed_validators.update(failed)
+            logger.error(f"Failed to write delegators of validators {sorted(failed)}: {e}")
+
+    def finish_validator(self, validator_address):
+        """
+        Completes a validator whose pages were all written and removes its stale delegators.
+
+        Returns:
+            int: Number of delegators removed.
+        """
+        self.flush()
+        if validator_address in self._failed_validators:
+            logger.warning(f"Skipping cleanup of validator {validator_address}: some delegators were not written.")
+            self.discard_validator(validator_address)
+            return 0
+
+        try:
+            with profiling.stage('cleanup'):
+                removed, events = _delete_unstaged_delegators(self._connection, validator_address,
+                                                              self.chain_config.id, self.feed)
+            if removed:
+                with profiling.stage('summaries'):
+                    self._stage_changes({validator_address}, set(removed))
+            with profiling.stage('cleanup'):
+                with _COMMIT_SECONDS.time(writer='delegators_cleanup'):
+                    self._connection.commit()
+        except SQLAlchemyError as e:
+            self._connection.rollback()
+            logger.error(f"An error occurred during cleanup of validator {validator_address}: {e}")
+            return 0
+        if self.feed is not None:
+            self.feed.emit(events)
+        self.removed += len(removed)
+        _ROWS.inc(len(removed), table='delegators', operation='deleted')
+        logger.info(f"Removed {len(removed)} inactive delegators of validator {validator_address} "
+                    f"on chain {self.chain_config.chain_id}.")
+        return len(removed)
+
+    def discard_validator(self, validator_address):
+        """
+        Forgets the staged addresses of a validator whose download did not complete, without cleanup.
+
+        The rows written before the failure stay, so the validator's summary is still refreshed.
+        """
+        self.flush()
+        try:
+            _clear_staged_delegators(self._connection, validator_address)
+            self._connection.commit()
+        except SQLAlchemyError as e:
+            self._connection.rollback()
+            logger.error(f"Failed to clear staged delegators of validator {validator_address}: {e}")
+        self._failed_validators.discard(validator_address)
+
+    def stage_validators(self, operator_addresses):
+        """Stages validators written outside the sync, such as by `upsert_validators`, for the summary refresh."""
+        try:
+            self._stage_changes(set(operator_addresses), set())
+            self._connection.commit()
+        except SQLAlchemyError as e:
+            self._connection.rollback()
+            logger.error(f"Failed to stage validators for the summary refresh: {e}")
+
+    def _stage_changes(self, operator_addresses, delegator_addresses):
+        """Adds validators and delegators to the staging tables, in the current transaction."""
+        if self._rebuild:
             return
+        for table, column, addresses in ((_changed_validators, 'operator_address', operator_addresses),
+                                         (_changed_delegators, 'delegator_address', delegator_addresses)):
+            if not addresses:
+                continue
+            if self._connection.dialect.name not in _UPSERT_DIALECTS:
+                # Without INSERT ... ON CONFLICT, addresses staged by an earlier batch are replaced
+                self._connection.execute(table.delete().where(table.c[column].in_(addresses)))
+            self._connection.execute(_stage_statement(self._connection, table),
+                                     [{column: address} for address in addresses])
+
+    def refresh_summaries(self):
+        """
+        Refreshes the summaries of the validators and delegators changed since the last refresh.
+
+        On the first sync of a chain the summaries of the chain are rebuilt instead; changes are
+        staged from then on.
+        """
+        try:
+            with profiling.stage('summaries'):
+                if self._rebuild:
+                    rebuild_summaries(self._connection, self.chain_config.id)
+                else:
+                    refresh_validator_summaries(self._connection, self.chain_config.id,
+                                                select(_changed_validators.c.operator_address))
+                    refresh_delegator_summaries(self._connection, self.chain_config.id,
+                                                select(_changed_delegators.c.delegator_address))
+                    self._connection.execute(_changed_validators.delete())
+                    self._connection.execute(_changed_delegators.delete())
+                self._connection.commit()
+            self._rebuild = False
+        except SQLAlchemyError as e:
+            self._connection.rollback()
+            logger.error(f"Failed to refresh summaries on chain {self.chain_config.chain_id}: {e}")
+
+    def close(self):
+        """Writes pending rows, refreshes the summaries, drops the staging tables and releases the connection."""
+        try:
+            self.flush()
+            self.refresh_summaries()
+            for table in (_active_delegators, _changed_validators, _changed_delegators):
+                table.drop(self._connection, checkfirst=True)
+            self._connection.commit()
+        finally:
+            self._connection.close()
+
+
+def insert_or_update_governance_proposal(proposal_data, chain):
+    """
+    Inserts a new governance proposal or updates an existing one.
 
-        # Check if the proposal already exists for this chain
-        existing_proposal = session.query(GovernanceProposal).filter_by(
-            proposal_id=proposal_id, chain_config_id=chain_config.id
-        ).first()
-
-        if not existing_proposal:
-            # Insert new proposal
-            new_proposal = GovernanceProposal(
-                proposal_id=proposal_id,
-                chain_id=chain_id,
-                chain_config_id=chain_config.id,  # Link the proposal to the chain configuration
-                title=proposal_data.get('title'),
-                description=proposal_data.get('summary'),
-                proposal_type=proposal_data.get('content', {}).get('@type'),
-                status=proposal_data.get('status'),
-                yes_votes=int(proposal_data['final_tally_result']['yes']),
-                abstain_votes=int(proposal_data['final_tally_result']['abstain']),
-                no_votes=int(proposal_data['final_tally_result']['no']),
-                no_with_veto_votes=int(proposal_data['final_tally_result']['no_with_veto']),
-                submit_time=parser.parse(proposal_data['submit_time']),
-                deposit_end_time=parser.parse(proposal_data['deposit_end_time']),
-                voting_start_time=parser.parse(proposal_data['voting_start_time']),
-                voting_end_time=parser.parse(proposal_data['voting_end_time']),
-                total_deposit=proposal_data['total_deposit'],
-                proposal_metadata=proposal_data.get('metadata'),
-                proposer=proposal_data.get('proposer')
-            )
-            session.add(new_proposal)
-            logger.info(f"Inserted new governance proposal: {proposal_id} on chain {chain_id}")
-        else:
-            # Update existing proposal
-            existing_proposal.status = proposal_data.get('status')
-            existing_proposal.yes_votes = int(proposal_data['final_tally_result']['yes'])
-            existing_proposal.abstain_votes = int(proposal_data['final_tally_result']['abstain'])
-            existing_proposal.no_votes = int(proposal_data['final_tally_result']['no'])
-            existing_proposal.no_with_veto_votes = int(proposal_data['final_tally_result']['no_with_veto'])
-            existing_proposal.title = proposal_data.get('title')
-            existing_proposal.description = proposal_data.get('summary')
-            existing_proposal.proposal_metadata = proposal_data.get('metadata')
-            session.commit()
-            logger.info(f"Updated governance proposal: {proposal_id} on chain {chain_id}")
+    If a proposal with the same `proposal_id` already exists for the specified chain,
+    the proposal is updated with the latest data. Otherwise, it is inserted as a new proposal.
+    On PostgreSQL and SQLite both cases are a single `INSERT ... ON CONFLICT DO UPDATE` on the
+    unique (chain_config_id, proposal_id) key.
+
+    Args:
+        proposal_data (ProposalRecord): The proposal fetched from the API.
+        chain (ChainContext or str): The chain context, or chain ID, of the blockchain.
+
+    Returns:
+        bool: True if the proposal was stored, False otherwise.
+    """
+    session = Session()
+    stored = False
+    try:
+        proposal_id = proposal_data.proposal_id
+        # Resolve the chain from the cached chain context, without a query per call
+        chain_config = resolve_chain(chain)
+        if not chain_config:
+            logger.error(f"No chain configuration found for chain_id {chain}")
+            return False
+        chain_id = chain_config.chain_id
+        logger.debug(f"Processing Proposal ID {proposal_id} for Chain ID {chain_id}.")
 
-        session.commit()
+        with profiling.stage('normalization'):
+            row = _prepare_governance_proposal_row(proposal_data, chain_config)
+        with profiling.stage('db_write'):
+            _upsert_governance_proposal_row(session.connection(), row)
+            with _COMMIT_SECONDS.time(writer='governance_proposals'):
+                session.commit()
+        _ROWS.inc(table='governance_proposals', operation='upserted')
+        logger.info(f"Stored governance proposal: {proposal_id} on chain {chain_id}")
+        stored = True
 
     except IntegrityError as e:
         logger.error(f"IntegrityError: {e}")
@@ -241,11 +814,89 @@ def insert_or_update_governance_proposal(proposal_data, chain_id):
     except SQLAlchemyError as e:
         logger.error(f"SQLAlchemyError: {e}")
         session.rollback()
-    except KeyError as e:
-        logger.error(f"KeyError: Missing {e} in proposal data for Proposal ID {proposal_data.get('proposal_id')}")
-        session.rollback()
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
         session.rollback()
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+    return stored
+
+
+def _prepare_governance_proposal_row(proposal_data, chain_config):
+    return {
+        "proposal_id": proposal_data.proposal_id,
+        "chain_id": chain_config.chain_id,
+        "chain_config_id": chain_config.id,  # Link the proposal to the chain configuration
+        "title": proposal_data.title,
+        "description": proposal_data.summary,
+        "proposal_type": proposal_data.proposal_type,
+        "status": proposal_data.status,
+        "yes_votes": proposal_data.yes,
+        "abstain_votes": proposal_data.abstain,
+        "no_votes": proposal_data.no,
+        "no_with_veto_votes": proposal_data.no_with_veto,
+        "submit_time": proposal_data.submit_time,
+        "deposit_end_time": proposal_data.deposit_end_time,
+        "voting_start_time": proposal_data.voting_start_time,
+        "voting_end_time": proposal_data.voting_end_time,
+        "total_deposit": proposal_data.total_deposit,
+        "proposal_metadata": proposal_data.metadata,
+        "proposer": proposal_data.proposer,
+    }
+
+
+def _upsert_governance_proposal_row(connection, row):
+    """Inserts a proposal row, or updates the mutable fields of the stored proposal."""
+    table = GovernanceProposal.__table__
+    dialect_insert = _UPSERT_DIALECTS.get(connection.dialect.name)
+    if dialect_insert is not None:
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.chain_config_id, table.c.proposal_id],
+            set_={field: statement.excluded[field] for field in _PROPOSAL_UPDATE_FIELDS},
+        )
+        connection.execute(statement, row)
+        return
+
+    # Fallback for databases without ON CONFLICT: a lookup on the unique key, then an insert or update
+    existing_id = connection.execute(
+        select(table.c.id).where(table.c.chain_config_id == row["chain_config_id"],
+                                 table.c.proposal_id == row["proposal_id"])
+    ).scalar()
+    if existing_id is None:
+        connection.execute(table.insert(), row)
+    else:
+        connection.execute(table.update().where(table.c.id == existing_id)
+                           .values({field: row[field] for field in _PROPOSAL_UPDATE_FIELDS}))
+
+
+def get_governance_sync_state(chain, open_statuses):
+    """
+    Returns what an incremental governance sync needs to know about stored proposals.
+
+    Args:
+        chain (ChainContext or str): The chain context, or chain ID, of the blockchain.
+        open_statuses (iterable): Proposal statuses that can still change.
+
+    Returns:
+        tuple: (highest stored proposal ID or None, list of IDs of stored open proposals).
+    """
+    session = Session()
+    try:
+        # Resolve the chain from the cached chain context, without a query per call
+        chain_config = resolve_chain(chain)
+        if not chain_config:
+            logger.error(f"No chain configuration found for chain_id {chain}")
+            return None, []
+
+        max_proposal_id = session.query(func.max(cast(GovernanceProposal.proposal_id, Integer))).filter(
+            GovernanceProposal.chain_config_id == chain_config.id
+        ).scalar()
+        open_ids = [int(proposal_id) for (proposal_id,) in session.query(GovernanceProposal.proposal_id).filter(
+            GovernanceProposal.chain_config_id == chain_config.id,
+            GovernanceProposal.status.in_(list(open_statuses)),
+        )]
+        return max_proposal_id, open_ids
+    finally:
+        session.close()
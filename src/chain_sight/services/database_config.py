@@ -1,10 +1,14 @@
 import logging
 import os
+import re
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from chain_sight.services.migrations import upgrade_schema
+
 
 logger = logging.getLogger(__name__)
 
@@ -12,11 +16,195 @@ load_dotenv()
 
 Base = declarative_base()
 
+# Engine profile used unless CHAIN_SIGHT_DB_PROFILE names another one
+DEFAULT_PROFILE = 'balanced'
+
+# Engine settings per profile. SQLite connections receive the PRAGMA settings, server databases
+# the pool settings; settings a database does not support are ignored for it.
+ENGINE_PROFILES = {
+    # SQLAlchemy and driver defaults: rollback journal, synchronous=FULL, default pool
+    'legacy': {},
+    # WAL lets readers and one writer work in parallel; synchronous=NORMAL only syncs at checkpoints,
+    # so a power loss can undo the last commits but never corrupts the database
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,
+        'mmap_size': 268435456,
+        'busy_timeout': 30000,
+        'temp_store': 'MEMORY',
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'executemany_mode': 'values_plus_batch',
+        'insertmanyvalues_page_size': 1000,
+    },
+    # WAL with every commit synced to disk
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -65536,
+        'busy_timeout': 30000,
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'executemany_mode': 'values_plus_batch',
+        'insertmanyvalues_page_size': 1000,
+    },
+    # Initial loads of large chains: nothing is synced to disk, a crash can corrupt a SQLite database
+    'bulk': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -262144,
+        'mmap_size': 1073741824,
+        'busy_timeout': 30000,
+        'temp_store': 'MEMORY',
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'executemany_mode': 'values_plus_batch',
+        'insertmanyvalues_page_size': 5000,
+        'query_cache_size': 1200,
+    },
+}
+
+# SQLite PRAGMAs set on every new connection
+_SQLITE_PRAGMAS = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'busy_timeout', 'temp_store')
+
+# Connection pool arguments of server databases; SQLite keeps the pool SQLAlchemy picks for the file
+_POOL_SETTINGS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping')
+
+# Settings and their types; each one can be overridden with CHAIN_SIGHT_DB_<SETTING>
+_SETTING_TYPES = {
+    'journal_mode': str,
+    'synchronous': str,
+    'cache_size': int,
+    'mmap_size': int,
+    'busy_timeout': int,
+    'temp_store': str,
+    'pool_size': int,
+    'max_overflow': int,
+    'pool_timeout': int,
+    'pool_recycle': int,
+    'pool_pre_ping': bool,
+    'executemany_mode': str,
+    'insertmanyvalues_page_size': int,
+    'query_cache_size': int,
+}
+
+_PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+
+def _parse_setting(name, value):
+    cast = _SETTING_TYPES[name]
+    if cast is bool:
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    value = cast(value)
+    if name in _SQLITE_PRAGMAS and not _PRAGMA_VALUE.match(str(value)):
+        raise ValueError(value)
+    return value
+
+
+def profile_settings(profile=None):
+    """
+    Returns the engine settings of a profile, with the CHAIN_SIGHT_DB_<SETTING> environment overrides applied.
+
+    Args:
+        profile (str): Name of an entry of ENGINE_PROFILES. Defaults to CHAIN_SIGHT_DB_PROFILE, or 'balanced'.
+    """
+    profile = profile or os.getenv('CHAIN_SIGHT_DB_PROFILE') or DEFAULT_PROFILE
+    if profile not in ENGINE_PROFILES:
+        logger.warning(f"Unknown database engine profile '{profile}', using '{DEFAULT_PROFILE}'.")
+        profile = DEFAULT_PROFILE
+    settings = dict(ENGINE_PROFILES[profile])
+    for name in _SETTING_TYPES:
+        value = os.getenv(f'CHAIN_SIGHT_DB_{name.upper()}')
+        if value is None:
+            continue
+        try:
+            settings[name] = _parse_setting(name, value)
+        except ValueError:
+            logger.warning(f"Invalid value '{value}' for CHAIN_SIGHT_DB_{name.upper()}, using the profile value.")
+    return settings
+
+
+def engine_options(url, profile=None):
+    """
+    Splits the settings of a profile into the arguments and PRAGMAs that apply to a database.
+
+    Args:
+        url (str or URL): The database URL.
+        profile (str): The engine profile, see `profile_settings`.
+
+    Returns:
+        tuple: Keyword arguments for `create_engine` and the PRAGMAs set on every SQLite connection.
+    """
+    url = make_url(url)
+    settings = profile_settings(profile)
+    options = {}
+    pragmas = {}
+    if url.get_backend_name() == 'sqlite':
+        pragmas = {name: settings[name] for name in _SQLITE_PRAGMAS if name in settings}
+    else:
+        options.update({name: settings[name] for name in _POOL_SETTINGS if name in settings})
+    # Batching of executemany() UPDATE and DELETE statements is specific to psycopg2
+    if url.get_driver_name() == 'psycopg2' and 'executemany_mode' in settings:
+        options['executemany_mode'] = settings['executemany_mode']
+    for name in ('insertmanyvalues_page_size', 'query_cache_size'):
+        if name in settings:
+            options[name] = settings[name]
+    return options, pragmas
+
+
+def create_database_engine(url, profile=None):
+    """
+    Creates the engine of a database configured with an engine profile.
+
+    Args:
+        url (str or URL): The database URL.
+        profile (str): The engine profile, see `profile_settings`.
+    """
+    options, pragmas = engine_options(url, profile)
+    database_engine = create_engine(url, **options)
+    if pragmas:
+        @event.listens_for(database_engine, 'connect')
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+            cursor.close()
+    logger.debug(f"Database engine created with options {options} and SQLite pragmas {pragmas}.")
+    return database_engine
+
+
 # Environment-based configuration for database
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///chainsight.db')
 
-engine = create_engine(DATABASE_URL)
+engine = create_database_engine(DATABASE_URL)
 Session = sessionmaker(bind=engine)
 
-def initialize_database():
-    Base.metadata.create_all(engine)
\ No newline at end of file
+# URLs of the databases whose schema this process has already checked
+_initialized = set()
+
+
+def initialize_database(database_engine=None):
+    """
+    Brings the schema of the database up to date with the models, once per process.
+
+    Args:
+        database_engine (Engine): The engine of the database. Defaults to the DATABASE_URL engine.
+    """
+    database_engine = database_engine or engine
+    url = str(database_engine.url)
+    if url in _initialized:
+        return
+    # Registers the models on Base, for the tables created by an upgrade
+    import chain_sight.models.models  # noqa: F401
+    upgrade_schema(database_engine, Base.metadata)
+    _initialized.add(url)
@@ -0,0 +1,375 @@
+import json
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, NamedTuple, Optional
+
+try:
+    import msgspec
+except ImportError:  # msgspec is an optional dependency, responses are decoded with the json module without it
+    msgspec = None
+
+
+_ZERO = Decimal(0)
+
+
+class ValidatorRecord(NamedTuple):
+    """Fields of a validator stored by chain_sight, with amounts and rates kept as exact integers and Decimals."""
+    operator_address: str
+    consensus_pubkey: str  # JSON encoded public key, as stored in the database
+    jailed: bool
+    status: str
+    tokens: int
+    delegator_shares: Decimal
+    moniker: str
+    identity: str
+    website: str
+    security_contact: str
+    details: str
+    commission_rate: Decimal
+    commission_max_rate: Decimal
+    commission_max_change_rate: Decimal
+    min_self_delegation: int
+
+
+class DelegationRecord(NamedTuple):
+    """One entry of the delegations of a validator."""
+    delegator_address: str
+    validator_address: str
+    shares: Decimal
+    amount: Decimal
+    denom: str
+
+
+class ProposalRecord(NamedTuple):
+    """A governance proposal of either gov API version, with parsed tallies and timestamps."""
+    proposal_id: str
+    proposal_type: Optional[str]  # '@type' of the first message (v1) or of the content (v1beta1)
+    status: Optional[str]
+    yes: int
+    abstain: int
+    no: int
+    no_with_veto: int
+    submit_time: Optional[datetime]
+    deposit_end_time: Optional[datetime]
+    voting_start_time: Optional[datetime]
+    voting_end_time: Optional[datetime]
+    total_deposit: list
+    metadata: Optional[str]
+    title: Optional[str]
+    summary: Optional[str]
+    proposer: Optional[str]
+
+
+class Page(NamedTuple):
+    """Records of one page of a paginated list response, the key of the next page and the total, if counted."""
+    items: list
+    next_key: Optional[str]
+    total: int = 0
+
+
+def parse_timestamp(value):
+    """
+    Parses an RFC 3339 timestamp, as returned by Cosmos SDK nodes, into an aware datetime.
+
+    Nodes return up to nine fractional digits; digits beyond microseconds are truncated.
+
+    Args:
+        value (str): Timestamp such as `2024-01-01T00:00:00.123456789Z`, or None.
+
+    Returns:
+        datetime: The timestamp, or None for a missing or empty value.
+
+    Raises:
+        ValueError: If the value is not an RFC 3339 timestamp.
+    """
+    if not value:
+        return None
+    if value[-1] in 'Zz':
+        value, offset = value[:-1], '+00:00'
+    elif len(value) > 6 and value[-6] in '+-':
+        value, offset = value[:-6], value[-6:]
+    else:
+        raise ValueError(f"Timestamp without UTC offset: {value}")
+    seconds, dot, fraction = value.partition('.')
+    if dot:
+        # datetime.fromisoformat() only accepts 3 or 6 fractional digits before Python 3.11
+        value = f"{seconds}.{fraction[:6].ljust(6, '0')}"
+    return datetime.fromisoformat(value[:10] + 'T' + value[11:] + offset)
+
+
+def validator_from_json(data):
+    """Builds a ValidatorRecord from a validator in its REST JSON form."""
+    description = data.get('description') or {}
+    rates = (data.get('commission') or {}).get('commission_rates') or {}
+    return ValidatorRecord(
+        operator_address=data.get('operator_address', ''),
+        consensus_pubkey=json.dumps(data.get('consensus_pubkey', {})),
+        jailed=data.get('jailed', False),
+        status=data.get('status', ''),
+        tokens=int(data.get('tokens', 0)),
+        delegator_shares=Decimal(data.get('delegator_shares', 0)),
+        moniker=description.get('moniker', ''),
+        identity=description.get('identity', ''),
+        website=description.get('website', ''),
+        security_contact=description.get('security_contact', ''),
+        details=description.get('details', ''),
+        commission_rate=Decimal(rates.get('rate', 0)),
+        commission_max_rate=Decimal(rates.get('max_rate', 0)),
+        commission_max_change_rate=Decimal(rates.get('max_change_rate', 0)),
+        min_self_delegation=int(data.get('min_self_delegation', 1)),
+    )
+
+
+def delegation_from_json(data):
+    """Builds a DelegationRecord from a `delegation_responses` entry in its REST JSON form."""
+    delegation = data['delegation']
+    balance = data.get('balance') or {}
+    return DelegationRecord(
+        delegator_address=delegation['delegator_address'],
+        validator_address=delegation.get('validator_address', ''),
+        shares=Decimal(delegation.get('shares', 0)),
+        amount=Decimal(balance.get('amount', 0)),
+        denom=balance.get('denom', ''),
+    )
+
+
+def proposal_from_json(data, version):
+    """
+    Builds a ProposalRecord from a proposal in its REST JSON form.
+
+    Args:
+        data (dict): Proposal returned by the API.
+        version (str): Gov API version the proposal was returned by ('v1' or 'v1beta1').
+
+    Returns:
+        ProposalRecord: The proposal.
+    """
+    tally = data.get('final_tally_result') or {}
+    if version == 'v1':
+        messages = data.get('messages') or [{}]
+        suffix = '_count'
+        proposal_id = data.get('id')
+        content = messages[0]
+        metadata, title, summary = data.get('metadata'), data.get('title'), data.get('summary')
+        proposer = data.get('proposer')
+    else:
+        suffix = ''
+        proposal_id = data.get('proposal_id')
+        content = data.get('content') or {}
+        metadata, title, summary = content.get('metadata'), content.get('title'), content.get('description')
+        proposer = data.get('proposer', '')
+    return ProposalRecord(
+        proposal_id=proposal_id,
+        proposal_type=content.get('@type'),
+        status=data.get('status'),
+        yes=int(tally.get('yes' + suffix) or 0),
+        abstain=int(tally.get('abstain' + suffix) or 0),
+        no=int(tally.get('no' + suffix) or 0),
+        no_with_veto=int(tally.get('no_with_veto' + suffix) or 0),
+        submit_time=parse_timestamp(data.get('submit_time')),
+        deposit_end_time=parse_timestamp(data.get('deposit_end_time')),
+        voting_start_time=parse_timestamp(data.get('voting_start_time')),
+        voting_end_time=parse_timestamp(data.get('voting_end_time')),
+        total_deposit=data.get('total_deposit') or [],
+        metadata=metadata,
+        title=title,
+        summary=summary,
+        proposer=proposer,
+    )
+
+
+class PageDecoder:
+    """
+    Decodes one page of a paginated list response into typed records.
+
+    With msgspec installed, response bodies are decoded straight into structs declaring only the
+    fields chain_sight stores, skipping the rest of the document; otherwise they are parsed with
+    the json module and converted from dicts. Both paths return the same records.
+    """
+
+    def __init__(self, field, from_json, wire_type=None, from_wire=None):
+        self.field = field
+        self.wire_type = wire_type
+        self._from_json = from_json
+        self._from_wire = from_wire
+        self._decoder = None
+        if msgspec is not None and wire_type is not None:
+            page_type = msgspec.defstruct(f'{field}_page', [
+                (field, List[wire_type], []),
+                ('pagination', Optional[_Pagination], None),
+            ])
+            self._decoder = msgspec.json.Decoder(page_type, strict=False)
+
+    def decode(self, body):
+        """
+        Decodes a response body.
+
+        Raises:
+            ValueError: If the body is not valid JSON or does not match the schema.
+        """
+        if self._decoder is None:
+            return self.convert(json.loads(body))
+        try:
+            page = self._decoder.decode(body)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+        items = [self._from_wire(item) for item in getattr(page, self.field)]
+        pagination = page.pagination
+        if pagination is None:
+            return Page(items, None)
+        return Page(items, pagination.next_key, pagination.total or 0)
+
+    def convert(self, data):
+        """Converts an already decoded response, such as one returned by the gRPC backend."""
+        pagination = data.get('pagination') or {}
+        return Page([self._from_json(item) for item in data.get(self.field) or []], pagination.get('next_key'),
+                    int(pagination.get('total') or 0))
+
+
+# Structs mirroring the REST responses, used to decode bodies with msgspec. Numbers sent as strings are
+# converted by the lax (strict=False) decoders, timestamps are parsed by parse_timestamp() on both paths.
+if msgspec is not None:
+    class _Pagination(msgspec.Struct):
+        next_key: Optional[str] = None
+        total: Optional[int] = None
+
+    class _Description(msgspec.Struct):
+        moniker: str = ''
+        identity: str = ''
+        website: str = ''
+        security_contact: str = ''
+        details: str = ''
+
+    class _CommissionRates(msgspec.Struct):
+        rate: Decimal = _ZERO
+        max_rate: Decimal = _ZERO
+        max_change_rate: Decimal = _ZERO
+
+    class _Commission(msgspec.Struct):
+        commission_rates: _CommissionRates = msgspec.field(default_factory=_CommissionRates)
+
+    class _Validator(msgspec.Struct):
+        operator_address: str = ''
+        consensus_pubkey: Dict[str, Any] = {}
+        jailed: bool = False
+        status: str = ''
+        tokens: int = 0
+        delegator_shares: Decimal = _ZERO
+        description: _Description = msgspec.field(default_factory=_Description)
+        commission: _Commission = msgspec.field(default_factory=_Commission)
+        min_self_delegation: int = 1
+
+    class _Delegation(msgspec.Struct):
+        delegator_address: str
+        validator_address: str = ''
+        shares: Decimal = _ZERO
+
+    class _Coin(msgspec.Struct):
+        denom: str = ''
+        amount: Decimal = _ZERO
+
+    class _DelegationResponse(msgspec.Struct):
+        delegation: _Delegation
+        balance: Optional[_Coin] = None
+
+    class _Any(msgspec.Struct, rename={'type': '@type'}):
+        type: Optional[str] = None
+        title: Optional[str] = None
+        description: Optional[str] = None
+        metadata: Optional[str] = None
+
+    class _TallyV1(msgspec.Struct):
+        yes_count: Optional[int] = None
+        abstain_count: Optional[int] = None
+        no_count: Optional[int] = None
+        no_with_veto_count: Optional[int] = None
+
+    class _TallyV1beta1(msgspec.Struct):
+        yes: Optional[int] = None
+        abstain: Optional[int] = None
+        no: Optional[int] = None
+        no_with_veto: Optional[int] = None
+
+    class _ProposalV1(msgspec.Struct):
+        id: Optional[str] = None
+        messages: List[_Any] = []
+        status: Optional[str] = None
+        final_tally_result: Optional[_TallyV1] = None
+        submit_time: Optional[str] = None
+        deposit_end_time: Optional[str] = None
+        voting_start_time: Optional[str] = None
+        voting_end_time: Optional[str] = None
+        total_deposit: List[Dict[str, Any]] = []
+        metadata: Optional[str] = None
+        title: Optional[str] = None
+        summary: Optional[str] = None
+        proposer: Optional[str] = None
+
+    class _ProposalV1beta1(msgspec.Struct):
+        proposal_id: Optional[str] = None
+        content: Optional[_Any] = None
+        status: Optional[str] = None
+        final_tally_result: Optional[_TallyV1beta1] = None
+        submit_time: Optional[str] = None
+        deposit_end_time: Optional[str] = None
+        voting_start_time: Optional[str] = None
+        voting_end_time: Optional[str] = None
+        total_deposit: List[Dict[str, Any]] = []
+        proposer: Optional[str] = ''
+else:
+    _Validator = _DelegationResponse = _ProposalV1 = _ProposalV1beta1 = None
+
+
+def _validator_from_wire(validator):
+    description = validator.description
+    rates = validator.commission.commission_rates
+    return ValidatorRecord(validator.operator_address, json.dumps(validator.consensus_pubkey), validator.jailed,
+                           validator.status, validator.tokens, validator.delegator_shares, description.moniker,
+                           description.identity, description.website, description.security_contact,
+                           description.details, rates.rate, rates.max_rate, rates.max_change_rate,
+                           validator.min_self_delegation)
+
+
+def _delegation_from_wire(entry):
+    delegation, balance = entry.delegation, entry.balance
+    if balance is None:
+        return DelegationRecord(delegation.delegator_address, delegation.validator_address, delegation.shares,
+                                _ZERO, '')
+    return DelegationRecord(delegation.delegator_address, delegation.validator_address, delegation.shares,
+                            balance.amount, balance.denom)
+
+
+def _proposal_from_wire(proposal, proposal_id, content, tally, metadata, title, summary):
+    return ProposalRecord(
+        proposal_id, content.type if content is not None else None, proposal.status,
+        tally[0] or 0, tally[1] or 0, tally[2] or 0, tally[3] or 0,
+        parse_timestamp(proposal.submit_time), parse_timestamp(proposal.deposit_end_time),
+        parse_timestamp(proposal.voting_start_time), parse_timestamp(proposal.voting_end_time),
+        proposal.total_deposit, metadata, title, summary, proposal.proposer)
+
+
+def _proposal_v1_from_wire(proposal):
+    tally = proposal.final_tally_result
+    return _proposal_from_wire(
+        proposal, proposal.id, proposal.messages[0] if proposal.messages else None,
+        (tally.yes_count, tally.abstain_count, tally.no_count, tally.no_with_veto_count) if tally else (0,) * 4,
+        proposal.metadata, proposal.title, proposal.summary)
+
+
+def _proposal_v1beta1_from_wire(proposal):
+    tally, content = proposal.final_tally_result, proposal.content
+    return _proposal_from_wire(
+        proposal, proposal.proposal_id, content,
+        (tally.yes, tally.abstain, tally.no, tally.no_with_veto) if tally else (0,) * 4,
+        *((content.metadata, content.title, content.description) if content is not None else (None,) * 3))
+
+
+VALIDATOR_PAGE = PageDecoder('validators', validator_from_json, _Validator, _validator_from_wire)
+DELEGATION_PAGE = PageDecoder('delegation_responses', delegation_from_json, _DelegationResponse,
+                              _delegation_from_wire)
+PROPOSAL_PAGES = {
+    'v1': PageDecoder('proposals', lambda data: proposal_from_json(data, 'v1'), _ProposalV1, _proposal_v1_from_wire),
+    'v1beta1': PageDecoder('proposals', lambda data: proposal_from_json(data, 'v1beta1'), _ProposalV1beta1,
+                           _proposal_v1beta1_from_wire),
+}
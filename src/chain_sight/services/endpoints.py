@@ -0,0 +1,327 @@
+import logging
+import threading
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from chain_sight.common import metrics
+from chain_sight.common.environment import env_number
+from chain_sight.services import transport
+from chain_sight.services.transport import FetchError
+
+
+logger = logging.getLogger(__name__)
+
+# Endpoint reporting the latest block height of a node, used to probe endpoints
+LATEST_BLOCK_PATH = '/cosmos/base/tendermint/v1beta1/blocks/latest'
+
+# Weight of the newest request in the moving average latency of an endpoint
+LATENCY_SMOOTHING = 0.2
+
+# Consecutive failures after which an endpoint is left out until the cooldown has passed
+FAILURE_THRESHOLD = 3
+FAILURE_COOLDOWN = 60.0
+
+_ENDPOINT_REQUESTS = metrics.counter('chain_sight_endpoint_requests_total',
+                                     'REST requests per configured endpoint, by chain, endpoint and outcome.',
+                                     ('chain', 'endpoint', 'outcome'))
+_HEDGED_REQUESTS = metrics.counter('chain_sight_hedged_requests_total',
+                                   'Hedged requests, by chain and the request that answered first.',
+                                   ('chain', 'winner'))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_hedge_after():
+    """Seconds after which a request is duplicated to a second endpoint, configured with CHAIN_SIGHT_HEDGE_AFTER."""
+    return env_number('CHAIN_SIGHT_HEDGE_AFTER', 0.0)
+
+
+def get_max_height_lag():
+    """Blocks an endpoint may lag behind the highest probed endpoint, configured with CHAIN_SIGHT_MAX_HEIGHT_LAG."""
+    return env_number('CHAIN_SIGHT_MAX_HEIGHT_LAG', 10, int)
+
+
+def get_probe_interval():
+    """Seconds between two probes of the endpoints of a chain, configured with CHAIN_SIGHT_ENDPOINT_PROBE_INTERVAL."""
+    return env_number('CHAIN_SIGHT_ENDPOINT_PROBE_INTERVAL', 300.0)
+
+
+def get_probe_timeout():
+    """Timeout in seconds of a single endpoint probe, configured with CHAIN_SIGHT_ENDPOINT_PROBE_TIMEOUT."""
+    return env_number('CHAIN_SIGHT_ENDPOINT_PROBE_TIMEOUT', 3.0)
+
+
+def chain_api_endpoints(chain_config):
+    """
+    Returns the REST endpoints of a chain: `api_endpoint` first, then the additional `api_endpoints`.
+
+    Args:
+        chain_config (ChainContext): Chain configuration object.
+
+    Returns:
+        list: Base URLs without trailing slash and without duplicates.
+    """
+    urls = []
+    for url in [chain_config.api_endpoint, *(getattr(chain_config, 'api_endpoints', None) or ())]:
+        url = url.rstrip('/') if url else url
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+
+class Endpoint:
+    """Health and latency statistics of one REST endpoint."""
+
+    def __init__(self, url):
+        self.url = url
+        self.label = urlsplit(url).netloc or url
+        self.latency = None
+        self.height = None
+        self.stale = False
+        self.failures = 0
+        self.down_until = 0.0
+        self.in_flight = 0
+
+    def is_healthy(self, now):
+        return not self.stale and self.down_until <= now
+
+    def score(self):
+        """Expected wait for a request to this endpoint: lower is better."""
+        # Unmeasured endpoints get tried before measured slow ones, but after measured fast ones
+        latency = self.latency if self.latency is not None else 1.0
+        return latency * (self.in_flight + 1)
+
+    def __repr__(self):
+        return (f"<Endpoint(url='{self.url}', latency={self.latency}, height={self.height}, stale={self.stale}, "
+                f"failures={self.failures})>")
+
+
+class EndpointPool:
+    """
+    Spreads the REST requests of a chain over its endpoints.
+
+    Endpoints are probed on first use and every `probe_interval` seconds: the latest block
+    endpoint is queried to measure latency and height, and endpoints lagging more than
+    `max_height_lag` blocks behind the highest one are left out. Every request goes to the
+    healthy endpoint with the lowest moving average latency weighted by its requests in flight,
+    so concurrent fetchers spread their pages over the endpoints and a fast node takes the most.
+    A request that fails after the transport's retries is retried on the next endpoint, and an
+    endpoint failing `FAILURE_THRESHOLD` times in a row is left out for `FAILURE_COOLDOWN` seconds.
+
+    With `hedge_after` set, a request still unanswered after that many seconds is duplicated to
+    the second best endpoint and the first answer is used, so a slow node no longer sets the
+    tail latency. The losing request is left to finish in the background.
+
+    Args:
+        urls (list): Base URLs of the endpoints, the configured primary endpoint first.
+        chain_id (str): Chain ID, used in logs and metrics.
+        hedge_after (float): Seconds after which a request is hedged. 0 or None disables hedging.
+        max_height_lag (int): Blocks an endpoint may lag behind the highest probed endpoint.
+        probe_interval (float): Seconds between two probes.
+    """
+
+    def __init__(self, urls, chain_id=None, hedge_after=None, max_height_lag=10, probe_interval=300.0):
+        if not urls:
+            raise ValueError("An endpoint pool needs at least one endpoint.")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.chain_id = chain_id
+        self.hedge_after = hedge_after or None
+        self.max_height_lag = max_height_lag
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._probed_at = None
+        self._executor = None
+
+    @property
+    def primary(self):
+        return self.endpoints[0]
+
+    def probe(self):
+        """Measures the latency and height of every endpoint and marks lagging endpoints as stale."""
+        with ThreadPoolExecutor(max_workers=len(self.endpoints), thread_name_prefix='endpoint-probe') as executor:
+            results = list(executor.map(self._probe_endpoint, self.endpoints))
+
+        heights = [height for height in results if height is not None]
+        highest = max(heights, default=None)
+        with self._lock:
+            for endpoint, height in zip(self.endpoints, results):
+                endpoint.height = height
+                endpoint.stale = height is None or highest - height > self.max_height_lag
+            self._probed_at = time.monotonic()
+        logger.info(f"Probed endpoints of {self.chain_id}: " + ', '.join(
+            f"{endpoint.label} ({'stale' if endpoint.stale else 'ok'}, height {endpoint.height}, "
+            f"{endpoint.latency * 1000:.0f} ms)" if endpoint.latency is not None else
+            f"{endpoint.label} (unreachable)" for endpoint in self.ranked()))
+
+    def _probe_endpoint(self, endpoint):
+        started = time.perf_counter()
+        try:
+            # The first probe holds every request of the sync: one short attempt, an unreachable endpoint is stale
+            data = transport.get_json(f"{endpoint.url}{LATEST_BLOCK_PATH}", timeout=get_probe_timeout(),
+                                      session=transport.get_probe_session())
+            height = int(data['block']['header']['height'])
+        except (FetchError, KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Probe of endpoint {endpoint.url} failed: {e}")
+            return None
+        self._record_latency(endpoint, time.perf_counter() - started)
+        return height
+
+    def _maybe_probe(self):
+        if self._probed_at is not None and time.monotonic() - self._probed_at < self.probe_interval:
+            return
+        # The first probe blocks every request, later probes only the thread that runs them
+        blocking = self._probed_at is None
+        if not self._probe_lock.acquire(blocking=blocking):
+            return
+        try:
+            if self._probed_at is None or time.monotonic() - self._probed_at >= self.probe_interval:
+                self.probe()
+        finally:
+            self._probe_lock.release()
+
+    def ranked(self):
+        """Returns the endpoints in the order they are tried: healthy endpoints first, by score."""
+        now = time.monotonic()
+        with self._lock:
+            return sorted(self.endpoints, key=lambda endpoint: (not endpoint.is_healthy(now), endpoint.stale,
+                                                                endpoint.score()))
+
+    def _record_latency(self, endpoint, seconds):
+        with self._lock:
+            if endpoint.latency is None:
+                endpoint.latency = seconds
+            else:
+                endpoint.latency += LATENCY_SMOOTHING * (seconds - endpoint.latency)
+
+    def _call(self, endpoint, path, fetch):
+        with self._lock:
+            endpoint.in_flight += 1
+        started = time.perf_counter()
+        try:
+            result = fetch(f"{endpoint.url}{path}")
+        except FetchError:
+            with self._lock:
+                endpoint.failures += 1
+                if endpoint.failures >= FAILURE_THRESHOLD:
+                    endpoint.down_until = time.monotonic() + FAILURE_COOLDOWN
+                    logger.warning(f"Endpoint {endpoint.url} failed {endpoint.failures} times in a row, "
+                                   f"leaving it out for {FAILURE_COOLDOWN:.0f}s.")
+            _ENDPOINT_REQUESTS.inc(chain=self.chain_id, endpoint=endpoint.label, outcome='error')
+            raise
+        finally:
+            with self._lock:
+                endpoint.in_flight -= 1
+        self._record_latency(endpoint, time.perf_counter() - started)
+        with self._lock:
+            endpoint.failures = 0
+            endpoint.down_until = 0.0
+        _ENDPOINT_REQUESTS.inc(chain=self.chain_id, endpoint=endpoint.label, outcome='ok')
+        return result
+
+    def request(self, path, fetch):
+        """
+        Performs a request on the best endpoint, failing over to the others.
+
+        Args:
+            path (str): Request path, appended to the base URL of the chosen endpoint.
+            fetch (callable): Performs the request given the full URL, such as a `get_json` call.
+
+        Returns:
+            The result of `fetch`.
+
+        Raises:
+            FetchError: If the request failed on every endpoint.
+        """
+        # A recording or replay must hit the same URLs every time, so it only uses the primary endpoint
+        if len(self.endpoints) == 1 or transport.get_archive() is not None:
+            return fetch(f"{self.primary.url}{path}")
+
+        self._maybe_probe()
+        candidates = self.ranked()
+        if self.hedge_after:
+            return self._hedged_request(path, fetch, candidates)
+
+        error = None
+        for endpoint in candidates:
+            try:
+                return self._call(endpoint, path, fetch)
+            except FetchError as e:
+                logger.warning(f"Request {path} failed on {endpoint.url}, trying the next endpoint: {e}")
+                error = e
+        raise error
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    workers = 2 * env_number('CHAIN_SIGHT_HTTP_POOL_SIZE', 16, int)
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hedged-request')
+        return self._executor
+
+    def _hedged_request(self, path, fetch, candidates):
+        executor = self._get_executor()
+        remaining = list(candidates)
+        pending = {executor.submit(self._call, remaining.pop(0), path, fetch): 'primary'}
+        hedged = False
+        done, _ = wait(pending, timeout=self.hedge_after)
+        if not done and remaining:
+            pending[executor.submit(self._call, remaining.pop(0), path, fetch)] = 'hedge'
+            hedged = True
+
+        error = None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind = pending.pop(future)
+                try:
+                    result = future.result()
+                except FetchError as e:
+                    logger.warning(f"Request {path} failed ({kind}): {e}")
+                    error = e
+                    continue
+                if hedged:
+                    _HEDGED_REQUESTS.inc(chain=self.chain_id, winner=kind)
+                return result
+            # Every request sent so far failed: fail over to the next endpoint
+            if not pending and remaining:
+                pending[executor.submit(self._call, remaining.pop(0), path, fetch)] = 'failover'
+        raise error
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def get_endpoint_pool(chain_config):
+    """
+    Returns the endpoint pool of a chain, creating it on first use.
+
+    Args:
+        chain_config (ChainContext): Chain configuration object.
+
+    Returns:
+        EndpointPool: The pool shared by every fetch of the chain in this process.
+    """
+    urls = chain_api_endpoints(chain_config)
+    key = (chain_config.chain_id, tuple(urls))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = EndpointPool(urls, chain_config.chain_id, get_hedge_after(),
+                                                  get_max_height_lag(), get_probe_interval())
+    return pool
+
+
+def reset_endpoint_pools():
+    """Drops the endpoint pools, e.g. in a worker process or after the chain configuration changed."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -0,0 +1,704 @@
+import base64
+import json
+import logging
+import re
+import threading
+import time
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlsplit
+
+from chain_sight.common import metrics, profiling
+from chain_sight.common.environment import env_number
+from chain_sight.services.decoding import DelegationRecord, Page, ProposalRecord, ValidatorRecord
+from chain_sight.services.transport import FetchError, get_timeout
+
+try:
+    import grpc
+except ImportError:  # grpcio is an optional dependency, only needed by the gRPC backend
+    grpc = None
+
+try:
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+    from google.protobuf.message import DecodeError
+except ImportError:  # protobuf is installed with the grpc extra; without it responses are decoded like REST JSON
+    descriptor_pb2 = descriptor_pool = message_factory = None
+    DecodeError = ValueError
+
+
+logger = logging.getLogger(__name__)
+
+# Default port of the Cosmos SDK gRPC server
+DEFAULT_GRPC_PORT = 9090
+
+# Maximum size of a response; pages of delegations with a large limit exceed the 4 MiB default
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+# gRPC status codes retried by the channel, the equivalent of the retried HTTP status codes
+RETRY_STATUS_CODES = ('UNAVAILABLE', 'RESOURCE_EXHAUSTED')
+
+_GRPC_REQUEST_SECONDS = metrics.histogram('chain_sight_grpc_request_duration_seconds',
+                                          'Latency of gRPC requests including retries, by method and status.',
+                                          ('method', 'status'))
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Number of decimal places of a Cosmos SDK Dec, which is sent over gRPC as an integer
+_DEC_PRECISION = 18
+
+_DEC_ZERO = Decimal(f'0E-{_DEC_PRECISION}')
+
+# Errors raised by malformed responses
+_DECODE_ERRORS = (IndexError, ValueError, UnicodeDecodeError, InvalidOperation, DecodeError)
+
+_channels = {}
+_channels_lock = threading.Lock()
+
+
+# Protobuf schemas of the queried messages: field number -> (JSON name, kind, nested schema or enum names, repeated).
+# Only the fields used by chain_sight are declared; other fields are skipped when decoding.
+
+def _field(name, kind, nested=None, repeated=False):
+    return name, kind, nested, repeated
+
+
+BOND_STATUS = ('BOND_STATUS_UNSPECIFIED', 'BOND_STATUS_UNBONDED', 'BOND_STATUS_UNBONDING', 'BOND_STATUS_BONDED')
+PROPOSAL_STATUS = ('PROPOSAL_STATUS_UNSPECIFIED', 'PROPOSAL_STATUS_DEPOSIT_PERIOD', 'PROPOSAL_STATUS_VOTING_PERIOD',
+                   'PROPOSAL_STATUS_PASSED', 'PROPOSAL_STATUS_REJECTED', 'PROPOSAL_STATUS_FAILED')
+
+PAGE_REQUEST = {1: _field('key', 'bytes'), 2: _field('offset', 'uint64'), 3: _field('limit', 'uint64'),
+                4: _field('count_total', 'bool'), 5: _field('reverse', 'bool')}
+PAGE_RESPONSE = {1: _field('next_key', 'bytes'), 2: _field('total', 'uint64')}
+COIN = {1: _field('denom', 'string'), 2: _field('amount', 'string')}
+PUB_KEY = {1: _field('key', 'bytes')}
+TIMESTAMP = {1: _field('seconds', 'int64'), 2: _field('nanos', 'int64')}
+ANY = {1: _field('type_url', 'string'), 2: _field('value', 'bytes')}
+
+DESCRIPTION = {1: _field('moniker', 'string'), 2: _field('identity', 'string'), 3: _field('website', 'string'),
+               4: _field('security_contact', 'string'), 5: _field('details', 'string')}
+COMMISSION_RATES = {1: _field('rate', 'dec'), 2: _field('max_rate', 'dec'), 3: _field('max_change_rate', 'dec')}
+COMMISSION = {1: _field('commission_rates', 'message', COMMISSION_RATES), 2: _field('update_time', 'timestamp')}
+VALIDATOR = {
+    1: _field('operator_address', 'string'),
+    2: _field('consensus_pubkey', 'any', {None: PUB_KEY}),
+    3: _field('jailed', 'bool'),
+    4: _field('status', 'enum', BOND_STATUS),
+    5: _field('tokens', 'string'),
+    6: _field('delegator_shares', 'dec'),
+    7: _field('description', 'message', DESCRIPTION),
+    8: _field('unbonding_height', 'int64'),
+    9: _field('unbonding_time', 'timestamp'),
+    10: _field('commission', 'message', COMMISSION),
+    11: _field('min_self_delegation', 'string'),
+}
+DELEGATION = {1: _field('delegator_address', 'string'), 2: _field('validator_address', 'string'),
+              3: _field('shares', 'dec')}
+DELEGATION_RESPONSE = {1: _field('delegation', 'message', DELEGATION), 2: _field('balance', 'message', COIN)}
+
+# Legacy proposal contents (TextProposal, SoftwareUpgradeProposal, ...) all start with a title and a description
+LEGACY_CONTENT = {1: _field('title', 'string'), 2: _field('description', 'string')}
+MSG_EXEC_LEGACY_CONTENT = {1: _field('content', 'any', {None: LEGACY_CONTENT}), 2: _field('authority', 'string')}
+TALLY_V1 = {1: _field('yes_count', 'string'), 2: _field('abstain_count', 'string'), 3: _field('no_count', 'string'),
+            4: _field('no_with_veto_count', 'string')}
+TALLY_V1BETA1 = {1: _field('yes', 'string'), 2: _field('abstain', 'string'), 3: _field('no', 'string'),
+                 4: _field('no_with_veto', 'string')}
+_PROPOSAL_PERIODS = {
+    5: _field('submit_time', 'timestamp'),
+    6: _field('deposit_end_time', 'timestamp'),
+    7: _field('total_deposit', 'message', COIN, repeated=True),
+    8: _field('voting_start_time', 'timestamp'),
+    9: _field('voting_end_time', 'timestamp'),
+}
+PROPOSAL_V1 = {
+    1: _field('id', 'uint64'),
+    2: _field('messages', 'any', {'/cosmos.gov.v1.MsgExecLegacyContent': MSG_EXEC_LEGACY_CONTENT}, repeated=True),
+    3: _field('status', 'enum', PROPOSAL_STATUS),
+    4: _field('final_tally_result', 'message', TALLY_V1),
+    **_PROPOSAL_PERIODS,
+    10: _field('metadata', 'string'),
+    11: _field('title', 'string'),
+    12: _field('summary', 'string'),
+    13: _field('proposer', 'string'),
+}
+PROPOSAL_V1BETA1 = {
+    1: _field('proposal_id', 'uint64'),
+    2: _field('content', 'any', {None: LEGACY_CONTENT}),
+    3: _field('status', 'enum', PROPOSAL_STATUS),
+    4: _field('final_tally_result', 'message', TALLY_V1BETA1),
+    **_PROPOSAL_PERIODS,
+}
+HEADER = {2: _field('chain_id', 'string'), 3: _field('height', 'int64')}
+BLOCK = {1: _field('header', 'message', HEADER)}
+
+QUERY_VALIDATORS_REQUEST = {1: _field('status', 'string'), 2: _field('pagination', 'message', PAGE_REQUEST)}
+QUERY_VALIDATORS_RESPONSE = {1: _field('validators', 'message', VALIDATOR, repeated=True),
+                             2: _field('pagination', 'message', PAGE_RESPONSE)}
+QUERY_VALIDATOR_DELEGATIONS_REQUEST = {1: _field('validator_addr', 'string'),
+                                       2: _field('pagination', 'message', PAGE_REQUEST)}
+QUERY_VALIDATOR_DELEGATIONS_RESPONSE = {1: _field('delegation_responses', 'message', DELEGATION_RESPONSE, repeated=True),
+                                        2: _field('pagination', 'message', PAGE_RESPONSE)}
+QUERY_PROPOSALS_REQUEST = {1: _field('proposal_status', 'enum', PROPOSAL_STATUS), 2: _field('voter', 'string'),
+                           3: _field('depositor', 'string'), 4: _field('pagination', 'message', PAGE_REQUEST)}
+QUERY_PROPOSAL_REQUEST = {1: _field('proposal_id', 'uint64')}
+GET_LATEST_BLOCK_REQUEST = {}
+GET_LATEST_BLOCK_RESPONSE = {2: _field('block', 'message', BLOCK)}
+
+
+def _proposals_response(proposal):
+    return {1: _field('proposals', 'message', proposal, repeated=True), 2: _field('pagination', 'message', PAGE_RESPONSE)}
+
+
+# REST paths served by the backend: (path pattern, gRPC method, request schema, response schema).
+# Named groups of the pattern are request fields.
+ROUTES = [
+    (re.compile(r'^/cosmos/staking/v1beta1/validators$'), '/cosmos.staking.v1beta1.Query/Validators',
+     QUERY_VALIDATORS_REQUEST, QUERY_VALIDATORS_RESPONSE),
+    (re.compile(r'^/cosmos/staking/v1beta1/validators/(?P<validator_addr>[^/]+)/delegations$'),
+     '/cosmos.staking.v1beta1.Query/ValidatorDelegations',
+     QUERY_VALIDATOR_DELEGATIONS_REQUEST, QUERY_VALIDATOR_DELEGATIONS_RESPONSE),
+    (re.compile(r'^/cosmos/gov/v1/proposals$'), '/cosmos.gov.v1.Query/Proposals',
+     QUERY_PROPOSALS_REQUEST, _proposals_response(PROPOSAL_V1)),
+    (re.compile(r'^/cosmos/gov/v1/proposals/(?P<proposal_id>\d+)$'), '/cosmos.gov.v1.Query/Proposal',
+     QUERY_PROPOSAL_REQUEST, {1: _field('proposal', 'message', PROPOSAL_V1)}),
+    (re.compile(r'^/cosmos/gov/v1beta1/proposals$'), '/cosmos.gov.v1beta1.Query/Proposals',
+     QUERY_PROPOSALS_REQUEST, _proposals_response(PROPOSAL_V1BETA1)),
+    (re.compile(r'^/cosmos/gov/v1beta1/proposals/(?P<proposal_id>\d+)$'), '/cosmos.gov.v1beta1.Query/Proposal',
+     QUERY_PROPOSAL_REQUEST, {1: _field('proposal', 'message', PROPOSAL_V1BETA1)}),
+    (re.compile(r'^/cosmos/base/tendermint/v1beta1/blocks/latest$'),
+     '/cosmos.base.tendermint.v1beta1.Service/GetLatestBlock', GET_LATEST_BLOCK_REQUEST, GET_LATEST_BLOCK_RESPONSE),
+]
+
+
+def find_route(path):
+    """Returns (gRPC method, request schema, response schema, path fields) of a REST path, or None."""
+    for pattern, method, request_schema, response_schema in ROUTES:
+        match = pattern.match(path)
+        if match:
+            return method, request_schema, response_schema, match.groupdict()
+    return None
+
+
+# Protobuf wire format
+
+def _encode_varint(value):
+    value &= (1 << 64) - 1
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _decode_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _signed(value):
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _dec_to_json(value):
+    """Renders a Dec sent as an integer ("50000000000000000") like the REST API ("0.050000000000000000")."""
+    sign, digits = ('-', value[1:]) if value.startswith('-') else ('', value)
+    digits = digits.rjust(_DEC_PRECISION + 1, '0')
+    return f"{sign}{digits[:-_DEC_PRECISION]}.{digits[-_DEC_PRECISION:]}"
+
+
+def _dec_from_json(value):
+    sign, digits = ('-', value[1:]) if value.startswith('-') else ('', value)
+    whole, _, fraction = digits.partition('.')
+    return sign + (str(int(whole + fraction.ljust(_DEC_PRECISION, '0')[:_DEC_PRECISION])))
+
+
+def _timestamp_to_json(seconds, nanos):
+    """Renders a Timestamp in RFC 3339 like the REST API, with trailing zeros of the fraction removed."""
+    moment = _EPOCH + timedelta(seconds=seconds)
+    fraction = f".{nanos:09d}".rstrip('0') if nanos else ''
+    return f"{moment.strftime('%Y-%m-%dT%H:%M:%S')}{fraction}Z"
+
+
+def _timestamp_from_json(value):
+    base, _, fraction = value.rstrip('Z').partition('.')
+    moment = datetime.strptime(base, '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc)
+    seconds = (moment - _EPOCH) // timedelta(seconds=1)
+    return seconds, int(fraction.ljust(9, '0')[:9]) if fraction else 0
+
+
+def _default(kind, nested, repeated):
+    """JSON value of an absent field, as rendered by the REST API."""
+    if repeated:
+        return []
+    if kind == 'string':
+        return ''
+    if kind in ('uint64', 'int64'):
+        return '0'
+    if kind == 'bool':
+        return False
+    if kind == 'enum':
+        return nested[0]
+    if kind == 'dec':
+        return _dec_to_json('0')
+    return None
+
+
+def decode_message(data, schema):
+    """
+    Decodes a protobuf message into the JSON form the REST API returns for it.
+
+    Args:
+        data (bytes): Serialized message.
+        schema (dict): Message schema, see the schemas in this module.
+
+    Returns:
+        dict: The decoded message. Absent fields get the REST API's default values.
+    """
+    message = {}
+    pos, end = 0, len(data)
+    while pos < end:
+        key, pos = _decode_varint(data, pos)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _decode_varint(data, pos)
+        elif wire_type == 2:
+            length, pos = _decode_varint(data, pos)
+            value = data[pos:pos + length]
+            pos += length
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 5:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+
+        field = schema.get(number)
+        if field is None:
+            continue
+        name, kind, nested, repeated = field
+        value = _decode_value(value, kind, nested)
+        if repeated:
+            message.setdefault(name, []).append(value)
+        else:
+            message[name] = value
+
+    for name, kind, nested, repeated in schema.values():
+        if name not in message:
+            message[name] = _default(kind, nested, repeated)
+    return message
+
+
+def _decode_value(value, kind, nested):
+    if kind == 'string':
+        return bytes(value).decode('utf-8')
+    if kind == 'bytes':
+        return base64.b64encode(value).decode() if value else None
+    if kind == 'uint64':
+        return str(value)
+    if kind == 'int64':
+        return str(_signed(value))
+    if kind == 'bool':
+        return bool(value)
+    if kind == 'enum':
+        return nested[value] if value < len(nested) else str(value)
+    if kind == 'dec':
+        return _dec_to_json(bytes(value).decode('utf-8') or '0')
+    if kind == 'timestamp':
+        timestamp = decode_message(value, TIMESTAMP)
+        return _timestamp_to_json(int(timestamp['seconds']), int(timestamp['nanos']))
+    if kind == 'any':
+        wrapped = decode_message(value, ANY)
+        raw = base64.b64decode(wrapped['value']) if wrapped['value'] else b''
+        return _any_to_json(wrapped['type_url'], raw, nested)
+    if kind == 'message':
+        return decode_message(value, nested)
+    raise ValueError(f"Unsupported field kind {kind}")
+
+
+def _any_to_json(type_url, value, nested):
+    """Renders a google.protobuf.Any like the REST API: its type and the fields of the wrapped message."""
+    value_schema = nested.get(type_url, nested.get(None))
+    if value_schema is None:
+        return {'@type': type_url, 'value': base64.b64encode(value).decode() if value else None}
+    return {'@type': type_url, **decode_message(value, value_schema)}
+
+
+def encode_message(message, schema):
+    """
+    Encodes the JSON form of a message, as returned by the REST API, into protobuf.
+
+    Args:
+        message (dict): Message in its REST JSON form.
+        schema (dict): Message schema, see the schemas in this module.
+
+    Returns:
+        bytes: Serialized message. Fields with default values are omitted, as in proto3.
+    """
+    out = bytearray()
+    for number, (name, kind, nested, repeated) in sorted(schema.items()):
+        value = message.get(name)
+        for item in (value or []) if repeated else [value]:
+            if item is None:
+                continue
+            out += _encode_value(number, item, kind, nested)
+    return bytes(out)
+
+
+def _encode_value(number, value, kind, nested):
+    if kind in ('uint64', 'int64', 'bool', 'enum'):
+        if kind == 'enum':
+            value = nested.index(value) if value in nested else int(value)
+        value = int(value)
+        return _encode_varint(number << 3) + _encode_varint(value) if value else b''
+
+    if kind == 'string':
+        payload = value.encode('utf-8')
+    elif kind == 'bytes':
+        payload = base64.b64decode(value)
+    elif kind == 'dec':
+        payload = _dec_from_json(value).encode() if value else b''
+    elif kind == 'timestamp':
+        seconds, nanos = _timestamp_from_json(value)
+        payload = encode_message({'seconds': seconds, 'nanos': nanos}, TIMESTAMP)
+        return _encode_varint(number << 3 | 2) + _encode_varint(len(payload)) + payload
+    elif kind == 'any':
+        type_url = value.get('@type', '')
+        value_schema = nested.get(type_url, nested.get(None))
+        if value_schema is None:
+            inner = base64.b64decode(value.get('value') or '')
+        else:
+            inner = encode_message(value, value_schema)
+        payload = encode_message({'type_url': type_url, 'value': base64.b64encode(inner).decode()}, ANY)
+        return _encode_varint(number << 3 | 2) + _encode_varint(len(payload)) + payload
+    elif kind == 'message':
+        payload = encode_message(value, nested)
+        return _encode_varint(number << 3 | 2) + _encode_varint(len(payload)) + payload
+    else:
+        raise ValueError(f"Unsupported field kind {kind}")
+
+    if not payload:
+        return b''
+    return _encode_varint(number << 3 | 2) + _encode_varint(len(payload)) + payload
+
+
+# Decoding of list responses straight into records with the protobuf runtime, without the REST JSON form.
+# Every list response holds its items in field 1 and its pagination in field 2.
+
+def _dec(value):
+    """Converts a Dec sent as an integer string into the Decimal the REST API's rendering parses to."""
+    return Decimal(f'{value}E-{_DEC_PRECISION}') if value else _DEC_ZERO
+
+
+def _enum(value, names):
+    return names[value] if value < len(names) else str(value)
+
+
+def _datetime(seconds, nanos):
+    """Datetime of a Timestamp, truncated to microseconds like `decoding.parse_timestamp`."""
+    return _EPOCH + timedelta(seconds=seconds, microseconds=nanos // 1000)
+
+
+def _timestamp_from_proto(message, name):
+    if not message.HasField(name):
+        return None
+    timestamp = getattr(message, name)
+    return _datetime(timestamp.seconds, timestamp.nanos)
+
+
+def _validator_from_proto(validator):
+    pubkey = None
+    if validator.HasField('consensus_pubkey'):
+        pubkey = _any_to_json(validator.consensus_pubkey.type_url, validator.consensus_pubkey.value, {None: PUB_KEY})
+    description = validator.description
+    rates = validator.commission.commission_rates
+    return ValidatorRecord(
+        validator.operator_address, json.dumps(pubkey), validator.jailed, _enum(validator.status, BOND_STATUS),
+        int(validator.tokens or 0), _dec(validator.delegator_shares), description.moniker, description.identity,
+        description.website, description.security_contact, description.details, _dec(rates.rate),
+        _dec(rates.max_rate), _dec(rates.max_change_rate), int(validator.min_self_delegation or 1))
+
+
+def _delegation_from_proto(entry):
+    delegation = entry.delegation
+    if entry.HasField('balance'):
+        balance = entry.balance
+        amount, denom = Decimal(balance.amount or 0), balance.denom
+    else:
+        amount, denom = Decimal(0), ''
+    return DelegationRecord(delegation.delegator_address, delegation.validator_address, _dec(delegation.shares),
+                            amount, denom)
+
+
+def _proposal_from_proto(proposal, proposal_id, proposal_type, tally, metadata, title, summary, proposer):
+    return ProposalRecord(
+        proposal_id, proposal_type, _enum(proposal.status, PROPOSAL_STATUS),
+        *(int(count or 0) for count in tally),
+        _timestamp_from_proto(proposal, 'submit_time'), _timestamp_from_proto(proposal, 'deposit_end_time'),
+        _timestamp_from_proto(proposal, 'voting_start_time'), _timestamp_from_proto(proposal, 'voting_end_time'),
+        [{'denom': coin.denom, 'amount': coin.amount} for coin in proposal.total_deposit],
+        metadata, title, summary, proposer)
+
+
+def _proposal_v1_from_proto(proposal):
+    proposal_type = proposal.messages[0].type_url if proposal.messages else None
+    tally = proposal.final_tally_result
+    return _proposal_from_proto(proposal, str(proposal.id), proposal_type,
+                                (tally.yes_count, tally.abstain_count, tally.no_count, tally.no_with_veto_count),
+                                proposal.metadata, proposal.title, proposal.summary, proposal.proposer)
+
+
+def _proposal_v1beta1_from_proto(proposal):
+    if proposal.HasField('content'):
+        content = proposal.content
+        legacy = _message_class(LEGACY_CONTENT).FromString(content.value)
+        proposal_type, title, description = content.type_url, legacy.title, legacy.description
+    else:
+        proposal_type = title = description = None
+    tally = proposal.final_tally_result
+    return _proposal_from_proto(proposal, str(proposal.proposal_id), proposal_type,
+                                (tally.yes, tally.abstain, tally.no, tally.no_with_veto), None, title, description, '')
+
+
+# Record builders of the list queries, by gRPC method
+PAGE_RECORDS = {
+    '/cosmos.staking.v1beta1.Query/Validators': _validator_from_proto,
+    '/cosmos.staking.v1beta1.Query/ValidatorDelegations': _delegation_from_proto,
+    '/cosmos.gov.v1.Query/Proposals': _proposal_v1_from_proto,
+    '/cosmos.gov.v1beta1.Query/Proposals': _proposal_v1beta1_from_proto,
+}
+
+_PROTOBUF_TYPES = {'string': 'TYPE_STRING', 'dec': 'TYPE_STRING', 'bytes': 'TYPE_BYTES', 'uint64': 'TYPE_UINT64',
+                   'int64': 'TYPE_INT64', 'bool': 'TYPE_BOOL', 'enum': 'TYPE_UINT64'}
+
+_message_classes = {}
+_message_classes_lock = threading.Lock()
+
+
+def _build_message_classes():
+    """Builds protobuf runtime classes of the list response schemas. Returns them by schema id."""
+    file = descriptor_pb2.FileDescriptorProto(name='chain_sight_grpc.proto', package='chain_sight', syntax='proto3')
+    names = {}
+
+    def add(schema):
+        if id(schema) not in names:
+            names[id(schema)] = name = f'Message{len(names)}'
+            message = file.message_type.add(name=name)
+            for number, (field_name, kind, nested, repeated) in sorted(schema.items()):
+                label = 'LABEL_REPEATED' if repeated else 'LABEL_OPTIONAL'
+                field = message.field.add(name=field_name, number=number,
+                                          label=descriptor_pb2.FieldDescriptorProto.Label.Value(label))
+                if kind in _PROTOBUF_TYPES:
+                    field.type = descriptor_pb2.FieldDescriptorProto.Type.Value(_PROTOBUF_TYPES[kind])
+                else:
+                    field.type = descriptor_pb2.FieldDescriptorProto.TYPE_MESSAGE
+                    field.type_name = f".chain_sight.{add({'timestamp': TIMESTAMP, 'any': ANY}.get(kind, nested))}"
+        return names[id(schema)]
+
+    schemas = [response_schema for _, method, _, response_schema in ROUTES if method in PAGE_RECORDS]
+    schemas.append(LEGACY_CONTENT)
+    for schema in schemas:
+        add(schema)
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(file)
+    return {id(schema): message_factory.GetMessageClass(pool.FindMessageTypeByName(f'chain_sight.{names[id(schema)]}'))
+            for schema in schemas}
+
+
+def _message_class(schema):
+    if not _message_classes:
+        with _message_classes_lock:
+            if not _message_classes:
+                _message_classes.update(_build_message_classes())
+    return _message_classes[id(schema)]
+
+
+def decode_page(response, method, response_schema):
+    """
+    Decodes a list response straight into a page of records with the protobuf runtime.
+
+    Args:
+        response (bytes): Serialized response.
+        method (str): gRPC method of the response, a key of PAGE_RECORDS.
+        response_schema (dict): Response schema of the method.
+
+    Returns:
+        Page: The same records a REST response of the query is decoded into.
+    """
+    page = _message_class(response_schema).FromString(response)
+    items = [PAGE_RECORDS[method](item) for item in getattr(page, response_schema[1][0])]
+    next_key, total = page.pagination.next_key, page.pagination.total
+    return Page(items, base64.b64encode(next_key).decode() if next_key else None, total)
+
+
+def build_request(path_fields, params=None):
+    """
+    Builds the JSON form of a gRPC query request from the path fields and query parameters of a REST request.
+
+    Args:
+        path_fields (dict): Request fields taken from the REST path, such as `validator_addr`.
+        params (dict): REST query parameters, such as `pagination.limit`.
+
+    Returns:
+        dict: The request message in its JSON form.
+    """
+    request = dict(path_fields)
+    pagination = {}
+    for key, value in (params or {}).items():
+        key = str(key)
+        if key.startswith('pagination.'):
+            name = key[len('pagination.'):]
+            pagination[name] = str(value).lower() == 'true' if name in ('count_total', 'reverse') else value
+        else:
+            request[key] = value
+    if pagination:
+        request['pagination'] = pagination
+    return request
+
+
+def _parse_target(endpoint):
+    """Returns (target, secure) of a gRPC endpoint given as a URL or as host:port."""
+    parsed = urlsplit(endpoint if '//' in endpoint else f'//{endpoint}')
+    secure = parsed.scheme in ('https', 'grpcs')
+    port = parsed.port or (443 if secure else DEFAULT_GRPC_PORT)
+    return f"{parsed.hostname}:{port}", secure
+
+
+def _build_channel(endpoint):
+    if grpc is None:
+        raise FetchError("The gRPC backend requires the grpcio package: pip install grpcio")
+
+    retries = env_number('CHAIN_SIGHT_HTTP_RETRIES', 5, int)
+    backoff = max(env_number('CHAIN_SIGHT_HTTP_BACKOFF', 0.5), 0.01)
+    service_config = {'methodConfig': [{
+        'name': [{}],
+        'retryPolicy': {
+            # gRPC caps the number of attempts at 5
+            'maxAttempts': min(max(retries + 1, 2), 5),
+            'initialBackoff': f'{backoff}s',
+            'maxBackoff': f'{backoff * 32}s',
+            'backoffMultiplier': 2,
+            'retryableStatusCodes': list(RETRY_STATUS_CODES),
+        },
+    }]}
+    options = [
+        ('grpc.max_receive_message_length', MAX_MESSAGE_SIZE),
+        ('grpc.enable_retries', 1 if retries > 0 else 0),
+        ('grpc.service_config', json.dumps(service_config)),
+    ]
+    target, secure = _parse_target(endpoint)
+    if secure:
+        channel = grpc.secure_channel(target, grpc.ssl_channel_credentials(), options=options)
+    else:
+        channel = grpc.insecure_channel(target, options=options)
+    logger.debug(f"gRPC channel to {target} created (secure={secure}, retries={retries}).")
+    return channel
+
+
+def get_channel(endpoint):
+    """Returns the shared channel to a gRPC endpoint, creating it on first use."""
+    channel = _channels.get(endpoint)
+    if channel is None:
+        with _channels_lock:
+            channel = _channels.get(endpoint)
+            if channel is None:
+                channel = _channels[endpoint] = _build_channel(endpoint)
+    return channel
+
+
+def reset_channels():
+    """Closes the shared gRPC channels so that the next request opens new ones."""
+    with _channels_lock:
+        for channel in _channels.values():
+            channel.close()
+        _channels.clear()
+
+
+def _call(endpoint, path, params, headers, timeout):
+    """Performs the gRPC query equivalent to a REST request. Returns its method, response schema and response."""
+    if not endpoint:
+        raise FetchError(f"No gRPC endpoint configured for {path}")
+    route = find_route(path)
+    if route is None:
+        raise FetchError(f"No gRPC query for {path}")
+    method, request_schema, response_schema, path_fields = route
+
+    request = encode_message(build_request(path_fields, params), request_schema)
+    call = get_channel(endpoint).unary_unary(method)
+    metadata = [(str(key).lower(), str(value)) for key, value in (headers or {}).items()] or None
+    started = time.perf_counter()
+    with profiling.stage('grpc_fetch'):
+        try:
+            response = call(request, timeout=timeout if timeout is not None else get_timeout(), metadata=metadata)
+        except grpc.RpcError as e:
+            _GRPC_REQUEST_SECONDS.observe(time.perf_counter() - started, method=method, status=e.code().name)
+            raise FetchError(f"gRPC request {method} to {endpoint} failed: {e.code().name}: {e.details()}") from e
+    _GRPC_REQUEST_SECONDS.observe(time.perf_counter() - started, method=method, status='OK')
+    return method, response_schema, response
+
+
+def get_json(endpoint, path, params=None, headers=None, timeout=None):
+    """
+    Performs the gRPC query equivalent to a REST request and returns the response in its REST JSON form.
+
+    Responses are decoded into the same JSON structure the REST API returns, so the fetchers and
+    normalization are shared between both backends. Unavailable and rate-limited calls are retried
+    by the channel with exponential backoff.
+
+    Args:
+        endpoint (str): gRPC endpoint, such as `https://grpc.example.com:443` or `host:9090`.
+        path (str): REST path of the query, such as `/cosmos/staking/v1beta1/validators`.
+        params (dict): REST query parameters; `pagination.*` parameters become the request pagination.
+        headers (dict): Additional request metadata.
+        timeout (float): Request timeout in seconds. Defaults to CHAIN_SIGHT_HTTP_TIMEOUT.
+
+    Returns:
+        dict: Decoded response.
+
+    Raises:
+        FetchError: If the path has no gRPC equivalent, or the call fails after all retries.
+    """
+    method, response_schema, response = _call(endpoint, path, params, headers, timeout)
+    try:
+        with profiling.stage('protobuf_decode'):
+            return decode_message(response, response_schema)
+    except _DECODE_ERRORS as e:
+        raise FetchError(f"Invalid response returned by {method} on {endpoint}: {e}") from e
+
+
+def get_page(endpoint, path, decoder, params=None, headers=None, timeout=None):
+    """
+    Performs the gRPC query equivalent to a REST list request and returns the response as a page of records.
+
+    List responses are decoded straight into the records of `decoder` with the protobuf runtime,
+    see `decode_page`. Other responses, and every response without protobuf installed, are
+    decoded into their REST JSON form and converted by the decoder.
+
+    Args:
+        endpoint (str): gRPC endpoint, such as `https://grpc.example.com:443` or `host:9090`.
+        path (str): REST path of the query, such as `/cosmos/staking/v1beta1/validators`.
+        decoder (PageDecoder): Decoder of the REST responses of the path.
+        params (dict): REST query parameters; `pagination.*` parameters become the request pagination.
+        headers (dict): Additional request metadata.
+        timeout (float): Request timeout in seconds. Defaults to CHAIN_SIGHT_HTTP_TIMEOUT.
+
+    Returns:
+        Page: Decoded response.
+
+    Raises:
+        FetchError: If the path has no gRPC equivalent, or the call fails after all retries.
+    """
+    method, response_schema, response = _call(endpoint, path, params, headers, timeout)
+    try:
+        with profiling.stage('protobuf_decode'):
+            if method in PAGE_RECORDS and message_factory is not None:
+                return decode_page(response, method, response_schema)
+            return decoder.convert(decode_message(response, response_schema))
+    except _DECODE_ERRORS as e:
+        raise FetchError(f"Invalid response returned by {method} on {endpoint}: {e}") from e
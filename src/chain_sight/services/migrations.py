@@ -0,0 +1,198 @@
+import logging
+
+from sqlalchemy import Column, Index, Integer, MetaData, Table, func, inspect, select, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+
+logger = logging.getLogger(__name__)
+
+# Single-row table recording the schema version a database was last brought up to
+_schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, nullable=False),
+)
+
+
+def _has_column(inspector, table_name, column_name):
+    return any(column['name'] == column_name for column in inspector.get_columns(table_name))
+
+
+def _has_unique_key(inspector, table_name, column_names):
+    """Checks for a unique constraint or unique index covering exactly the given columns."""
+    wanted = set(column_names)
+    unique_keys = [constraint['column_names'] for constraint in inspector.get_unique_constraints(table_name)]
+    unique_keys += [index['column_names'] for index in inspector.get_indexes(table_name) if index.get('unique')]
+    return any(set(columns) == wanted for columns in unique_keys)
+
+
+def _add_unique_key(connection, table_name, index_name, column_names):
+    """Removes duplicate rows, keeping the most recent (highest id), then creates a unique index."""
+    table = Table(table_name, MetaData(), autoload_with=connection)
+    columns = [table.c[name] for name in column_names]
+    latest_ids = select(func.max(table.c.id)).group_by(*columns)
+    removed = connection.execute(table.delete().where(table.c.id.not_in(latest_ids))).rowcount
+    if removed:
+        logger.warning(f"Removed {removed} duplicate rows from {table_name} before creating {index_name}.")
+    Index(index_name, *columns, unique=True).create(connection)
+
+
+def _migrate_validator_content_hash(connection, inspector):
+    if _has_column(inspector, 'validators', 'content_hash'):
+        return False
+    connection.execute(text("ALTER TABLE validators ADD COLUMN content_hash VARCHAR(64)"))
+    return True
+
+
+def _migrate_chain_config_api_endpoints(connection, inspector):
+    if _has_column(inspector, 'chain_config', 'api_endpoints'):
+        return False
+    connection.execute(text("ALTER TABLE chain_config ADD COLUMN api_endpoints JSON"))
+    return True
+
+
+def _migrate_chain_config_fetch_backend(connection, inspector):
+    if _has_column(inspector, 'chain_config', 'fetch_backend'):
+        return False
+    connection.execute(text("ALTER TABLE chain_config ADD COLUMN fetch_backend VARCHAR"))
+    return True
+
+
+def _migrate_validator_snapshot_height(connection, inspector):
+    if _has_column(inspector, 'validators', 'snapshot_height'):
+        return False
+    connection.execute(text("ALTER TABLE validators ADD COLUMN snapshot_height BIGINT"))
+    return True
+
+
+def _migrate_delegator_snapshot_height(connection, inspector):
+    if _has_column(inspector, 'delegators', 'snapshot_height'):
+        return False
+    connection.execute(text("ALTER TABLE delegators ADD COLUMN snapshot_height BIGINT"))
+    return True
+
+
+def _migrate_delegator_unique_key(connection, inspector):
+    columns = ['validator_chain_config_id', 'validator_address', 'delegator_address']
+    if _has_unique_key(inspector, 'delegators', columns):
+        return False
+    _add_unique_key(connection, 'delegators', 'uq_delegator_validator_chain', columns)
+    return True
+
+
+def _migrate_governance_proposal_unique_key(connection, inspector):
+    columns = ['chain_config_id', 'proposal_id']
+    if _has_unique_key(inspector, 'governance_proposals', columns):
+        return False
+    _add_unique_key(connection, 'governance_proposals', 'uq_governance_proposal_chain', columns)
+    return True
+
+
+def _migrate_delegator_chain_index(connection, inspector):
+    if any(index['name'] == 'ix_delegators_chain_delegator' for index in inspector.get_indexes('delegators')):
+        return False
+    table = Table('delegators', MetaData(), autoload_with=connection)
+    Index('ix_delegators_chain_delegator', table.c.validator_chain_config_id, table.c.delegator_address).create(
+        connection)
+    return True
+
+
+def _migrate_stake_summaries(connection, inspector):
+    """Creates the summary tables and fills them once from the validators and delegators already stored."""
+    # Imported here: the models import this module through database_config
+    from chain_sight.models.models import DelegatorSummary, ValidatorSummary
+    from chain_sight.services.summaries import rebuild_summaries
+
+    created = False
+    for table in (ValidatorSummary.__table__, DelegatorSummary.__table__):
+        if not inspector.has_table(table.name):
+            table.create(connection)
+            created = True
+    # Syncs refresh the summaries of every validator they write, so empty summaries next to stored
+    # validators only occur right after an upgrade
+    has_validators = connection.execute(text("SELECT 1 FROM validators LIMIT 1")).first() is not None
+    has_summaries = connection.execute(select(ValidatorSummary.__table__.c.operator_address).limit(1)).first()
+    if has_validators and has_summaries is None:
+        rebuild_summaries(connection)
+        return True
+    return created
+
+
+# Schema changes applied to databases created by earlier releases, in order
+MIGRATIONS = [
+    ('add validators.content_hash', _migrate_validator_content_hash),
+    ('add unique key uq_delegator_validator_chain', _migrate_delegator_unique_key),
+    ('add unique key uq_governance_proposal_chain', _migrate_governance_proposal_unique_key),
+    ('add chain_config.api_endpoints', _migrate_chain_config_api_endpoints),
+    ('add chain_config.fetch_backend', _migrate_chain_config_fetch_backend),
+    ('add validators.snapshot_height', _migrate_validator_snapshot_height),
+    ('add delegators.snapshot_height', _migrate_delegator_snapshot_height),
+    ('add index ix_delegators_chain_delegator', _migrate_delegator_chain_index),
+    ('build validator and delegator summaries', _migrate_stake_summaries),
+]
+
+# Version of the schema defined by the models. Every schema change, new tables included, comes with
+# a migration, so the number of migrations identifies the schema
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def run_migrations(engine):
+    """
+    Brings the schema of an existing database up to date with the models.
+
+    `create_all` only creates missing tables, so columns and unique keys added to existing tables
+    are applied here. Every migration checks the current schema first and is skipped when it has
+    already been applied, so running the migrations on every start is safe.
+
+    Args:
+        engine (Engine): The database engine.
+
+    Returns:
+        list: Names of the migrations applied.
+    """
+    applied = []
+    for name, migration in MIGRATIONS:
+        with engine.begin() as connection:
+            if migration(connection, inspect(connection)):
+                applied.append(name)
+                logger.info(f"Applied database migration: {name}")
+    return applied
+
+
+def get_schema_version(engine):
+    """Returns the schema version recorded in a database, or None if it has none."""
+    try:
+        with engine.connect() as connection:
+            return connection.execute(select(_schema_version.c.version)).scalar()
+    except (OperationalError, ProgrammingError):
+        # Databases created by releases without the schema_version table
+        return None
+
+
+def upgrade_schema(engine, metadata):
+    """
+    Creates the missing tables and applies the migrations, unless the database is already current.
+
+    The schema version recorded by the last upgrade is read first, so starting against an up to
+    date database costs a single query instead of inspecting every table.
+
+    Args:
+        engine (Engine): The database engine.
+        metadata (MetaData): Metadata of the models, with every model registered.
+
+    Returns:
+        list: Names of the migrations applied.
+    """
+    version = get_schema_version(engine)
+    if version is not None and version >= SCHEMA_VERSION:
+        if version > SCHEMA_VERSION:
+            logger.warning(f"Database schema version {version} is newer than this release ({SCHEMA_VERSION}).")
+        return []
+
+    metadata.create_all(engine)
+    applied = run_migrations(engine)
+    with engine.begin() as connection:
+        _schema_version.create(connection, checkfirst=True)
+        connection.execute(_schema_version.delete())
+        connection.execute(_schema_version.insert().values(version=SCHEMA_VERSION))
+    logger.info(f"Database schema upgraded from version {version} to {SCHEMA_VERSION}.")
+    return applied
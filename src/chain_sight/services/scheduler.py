@@ -0,0 +1,171 @@
+import logging
+import random
+import signal
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from chain_sight.services.blockchain import DEFAULT_CONCURRENCY, DEFAULT_QUEUE_DEPTH
+from chain_sight.services.commands import DEFAULT_WORKERS, run_chain
+from chain_sight.services.database import DEFAULT_BATCH_SIZE
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two syncs of a dataset of a chain, unless overridden with --interval
+DEFAULT_INTERVALS = {
+    'validators': 3600,
+    'governance': 900,
+}
+
+# Fraction of the interval by which every scheduled run is randomly shifted
+DEFAULT_JITTER = 0.1
+
+
+def build_intervals(chain_names, overrides=()):
+    """
+    Computes the sync interval of every (chain, dataset) job.
+
+    Args:
+        chain_names (list): Chain IDs to schedule.
+        overrides (list): (chain ID or None, dataset, seconds) tuples. Without a chain ID the
+            interval applies to the dataset of every chain; chain-specific intervals take precedence.
+
+    Returns:
+        dict: Interval in seconds per (chain ID, dataset). A zero interval disables the job.
+    """
+    defaults = dict(DEFAULT_INTERVALS)
+    for chain_name, dataset, seconds in overrides:
+        if chain_name is None:
+            defaults[dataset] = seconds
+
+    intervals = {(chain_name, dataset): seconds for chain_name in chain_names for dataset, seconds in defaults.items()}
+    for chain_name, dataset, seconds in overrides:
+        if chain_name is not None:
+            if chain_name not in chain_names:
+                logger.warning(f"Interval given for chain {chain_name}, which is not scheduled.")
+                continue
+            intervals[(chain_name, dataset)] = seconds
+
+    return {job: seconds for job, seconds in intervals.items() if seconds > 0}
+
+
+class Scheduler:
+    """
+    Runs validator and governance syncs of several chains on their own intervals, in one process.
+
+    Syncs run on a thread pool of `workers` threads and share the process-wide database engine
+    and HTTP session. Every run is shifted randomly by up to `jitter` times its interval, so that
+    chains started together do not keep hitting their nodes and the database at the same time.
+    A sync that is due while the previous sync of the same chain and dataset is still running is
+    skipped rather than started twice.
+
+    Args:
+        intervals (dict): Interval in seconds per (chain ID, dataset), see `build_intervals`.
+        jitter (float): Maximum random shift of a run, as a fraction of its interval.
+        workers (int): Maximum number of syncs running at the same time.
+        concurrency (int): Maximum number of validators whose delegations are fetched at once, per sync.
+        batch_size (int): Number of delegators written per database statement.
+        queue_depth (int): Maximum number of fetched pages waiting for the writer.
+    """
+
+    def __init__(self, intervals, jitter=DEFAULT_JITTER, workers=DEFAULT_WORKERS, concurrency=DEFAULT_CONCURRENCY,
+                 batch_size=DEFAULT_BATCH_SIZE, queue_depth=DEFAULT_QUEUE_DEPTH):
+        self.intervals = dict(intervals)
+        self.jitter = jitter
+        self.workers = workers
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.queue_depth = queue_depth
+        self.completed = 0
+        self.skipped = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._running = set()
+        # The first runs are spread over the jitter window instead of all starting at once
+        now = time.monotonic()
+        self._next_run = {job: now + random.uniform(0, interval * jitter) for job, interval in self.intervals.items()}
+
+    def stop(self):
+        """Stops scheduling new syncs. Running syncs are allowed to finish."""
+        self._stop.set()
+
+    def is_running(self, chain_name, dataset):
+        with self._lock:
+            return (chain_name, dataset) in self._running
+
+    def run(self):
+        """Runs the schedule until `stop` is called, then waits for the running syncs."""
+        if not self.intervals:
+            logger.warning("No syncs to schedule.")
+            return
+
+        logger.info(f"Scheduler started with {len(self.intervals)} jobs and {self.workers} workers.")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='chain-sync') as executor:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                for job, due in self._next_run.items():
+                    if due <= now:
+                        self._next_run[job] = now + self._next_delay(job)
+                        self._dispatch(executor, job)
+                self._stop.wait(max(0.0, min(self._next_run.values()) - time.monotonic()))
+
+            logger.info("Scheduler stopping, waiting for running syncs to finish.")
+        logger.info(f"Scheduler stopped after {self.completed} syncs ({self.skipped} skipped).")
+
+    def _next_delay(self, job):
+        interval = self.intervals[job]
+        return max(0.0, interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def _dispatch(self, executor, job):
+        with self._lock:
+            if job in self._running:
+                self.skipped += 1
+                logger.warning(f"Skipping {job[1]} sync of {job[0]}: the previous sync is still running.")
+                return
+            self._running.add(job)
+        executor.submit(self._run_job, job)
+
+    def _run_job(self, job):
+        chain_name, dataset = job
+        try:
+            summary = run_chain(chain_name, dataset, self.concurrency, self.batch_size, False, self.queue_depth)
+            logger.info(f"Scheduled {dataset} sync of {chain_name}: {summary['rows']} rows, {summary['errors']} errors "
+                        f"in {summary['duration']:.1f}s.")
+        except Exception as e:
+            logger.error(f"Scheduled {dataset} sync of {chain_name} failed: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(job)
+                self.completed += 1
+
+
+def run_daemon(chain_names, overrides=(), jitter=DEFAULT_JITTER, workers=DEFAULT_WORKERS,
+               concurrency=DEFAULT_CONCURRENCY, batch_size=DEFAULT_BATCH_SIZE, queue_depth=DEFAULT_QUEUE_DEPTH):
+    """
+    Runs the scheduler in the foreground until SIGTERM or SIGINT is received.
+
+    Args:
+        chain_names (list): Chain IDs to synchronize.
+        overrides (list): Interval overrides, see `build_intervals`.
+        jitter (float): Maximum random shift of a run, as a fraction of its interval.
+        workers (int): Maximum number of syncs running at the same time.
+        concurrency (int): Maximum number of validators whose delegations are fetched at once, per sync.
+        batch_size (int): Number of delegators written per database statement.
+        queue_depth (int): Maximum number of fetched pages waiting for the writer.
+    """
+    scheduler = Scheduler(build_intervals(chain_names, overrides), jitter, workers, concurrency, batch_size,
+                          queue_depth)
+
+    def handle_signal(signum, frame):
+        logger.info(f"Received {signal.Signals(signum).name}, shutting down.")
+        scheduler.stop()
+
+    previous_handlers = {signum: signal.signal(signum, handle_signal) for signum in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        scheduler.run()
+    finally:
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+    return scheduler
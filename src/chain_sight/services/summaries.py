@@ -0,0 +1,251 @@
+import datetime
+import logging
+
+from decimal import Decimal
+from itertools import islice
+
+from sqlalchemy import Select, and_, func, insert, literal, select
+
+from chain_sight.common.config import resolve_chain
+from chain_sight.models.models import Delegator, DelegatorSummary, Validator, ValidatorSummary
+from chain_sight.services.database_config import Session
+
+
+logger = logging.getLogger(__name__)
+
+# Validators whose voting power counts towards the stake distribution
+BONDED_STATUS = 'BOND_STATUS_BONDED'
+
+# Number of top delegators shown by a report, unless overridden with --top
+DEFAULT_TOP = 10
+
+# Addresses refreshed per statement, keeping IN lists within the bind parameter limits of every database
+_REFRESH_BATCH_SIZE = 500
+
+
+def _batches(addresses):
+    """Batches of a list of addresses; a SELECT of addresses staged in the database is one batch."""
+    if isinstance(addresses, Select):
+        yield addresses
+        return
+    addresses = iter(sorted(set(addresses)))
+    while True:
+        batch = list(islice(addresses, _REFRESH_BATCH_SIZE))
+        if not batch:
+            break
+        yield batch
+
+
+def refresh_validator_summaries(connection, chain_config_id, operator_addresses):
+    """
+    Recomputes the summaries of the given validators from their stored validator and delegator rows.
+
+    Each validator is aggregated over its own delegations only, a range of the delegators
+    unique key, so the cost follows the validators a sync changed rather than the chain size.
+    The addresses are either a list, refreshed in batches, or a SELECT of addresses staged in
+    the database. Runs in the caller's transaction.
+    """
+    summaries = ValidatorSummary.__table__
+    refreshed_at = literal(datetime.datetime.now(datetime.timezone.utc), summaries.c.refreshed_at.type)
+    for batch in _batches(operator_addresses):
+        connection.execute(summaries.delete().where(summaries.c.chain_config_id == chain_config_id,
+                                                    summaries.c.operator_address.in_(batch)))
+        delegations = (
+            select(Delegator.validator_address, func.count().label('delegator_count'),
+                   func.sum(Delegator.balance_amount).label('delegated_amount'))
+            .where(Delegator.validator_chain_config_id == chain_config_id, Delegator.validator_address.in_(batch))
+            .group_by(Delegator.validator_address)
+            .subquery()
+        )
+        connection.execute(insert(summaries).from_select(
+            ['chain_config_id', 'operator_address', 'moniker', 'status', 'jailed', 'tokens', 'delegator_count',
+             'delegated_amount', 'refreshed_at'],
+            select(Validator.chain_config_id, Validator.operator_address, Validator.moniker, Validator.status,
+                   Validator.jailed, Validator.tokens, func.coalesce(delegations.c.delegator_count, 0),
+                   func.coalesce(delegations.c.delegated_amount, 0), refreshed_at)
+            .outerjoin(delegations, delegations.c.validator_address == Validator.operator_address)
+            .where(Validator.chain_config_id == chain_config_id, Validator.operator_address.in_(batch))
+        ))
+
+
+def refresh_delegator_summaries(connection, chain_config_id, delegator_addresses):
+    """
+    Recomputes the summaries of the given delegators over all validators of the chain.
+
+    The addresses are either a list, refreshed in batches, or a SELECT of addresses staged in
+    the database, refreshed with one statement per table. Delegators without delegations left
+    lose their summary. Runs in the caller's transaction.
+    """
+    summaries = DelegatorSummary.__table__
+    refreshed_at = literal(datetime.datetime.now(datetime.timezone.utc), summaries.c.refreshed_at.type)
+    for batch in _batches(delegator_addresses):
+        connection.execute(summaries.delete().where(summaries.c.chain_config_id == chain_config_id,
+                                                    summaries.c.delegator_address.in_(batch)))
+        connection.execute(insert(summaries).from_select(
+            ['chain_config_id', 'delegator_address', 'validator_count', 'total_amount', 'refreshed_at'],
+            select(Delegator.validator_chain_config_id, Delegator.delegator_address, func.count(),
+                   func.sum(Delegator.balance_amount), refreshed_at)
+            .where(Delegator.validator_chain_config_id == chain_config_id, Delegator.delegator_address.in_(batch))
+            .group_by(Delegator.validator_chain_config_id, Delegator.delegator_address)
+        ))
+
+
+def rebuild_summaries(connection, chain_config_id=None):
+    """
+    Recomputes the summaries of every chain, or of one chain, with one aggregate scan of each table.
+
+    Used once for databases whose validators and delegators were stored before the summaries
+    existed, and by the first sync of a chain, which is cheaper to aggregate in one pass than
+    change by change; syncs keep them up to date afterwards. Runs in the caller's transaction.
+
+    Args:
+        connection (Connection): Connection of the caller's transaction.
+        chain_config_id (int): ID of the chain to rebuild. Defaults to every chain.
+    """
+    validator_summaries = ValidatorSummary.__table__
+    delegator_summaries = DelegatorSummary.__table__
+    refreshed_at = literal(datetime.datetime.now(datetime.timezone.utc), validator_summaries.c.refreshed_at.type)
+    validator_scope, delegator_scope = [], []
+    if chain_config_id is not None:
+        validator_scope = [Validator.chain_config_id == chain_config_id]
+        delegator_scope = [Delegator.validator_chain_config_id == chain_config_id]
+        connection.execute(validator_summaries.delete().where(validator_summaries.c.chain_config_id == chain_config_id))
+        connection.execute(delegator_summaries.delete().where(delegator_summaries.c.chain_config_id == chain_config_id))
+    else:
+        connection.execute(validator_summaries.delete())
+        connection.execute(delegator_summaries.delete())
+
+    delegations = (
+        select(Delegator.validator_chain_config_id, Delegator.validator_address,
+               func.count().label('delegator_count'), func.sum(Delegator.balance_amount).label('delegated_amount'))
+        .where(*delegator_scope)
+        .group_by(Delegator.validator_chain_config_id, Delegator.validator_address)
+        .subquery()
+    )
+    connection.execute(insert(validator_summaries).from_select(
+        ['chain_config_id', 'operator_address', 'moniker', 'status', 'jailed', 'tokens', 'delegator_count',
+         'delegated_amount', 'refreshed_at'],
+        select(Validator.chain_config_id, Validator.operator_address, Validator.moniker, Validator.status,
+               Validator.jailed, Validator.tokens, func.coalesce(delegations.c.delegator_count, 0),
+               func.coalesce(delegations.c.delegated_amount, 0), refreshed_at)
+        .outerjoin(delegations, and_(delegations.c.validator_chain_config_id == Validator.chain_config_id,
+                                     delegations.c.validator_address == Validator.operator_address))
+        .where(*validator_scope)
+    ))
+    connection.execute(insert(delegator_summaries).from_select(
+        ['chain_config_id', 'delegator_address', 'validator_count', 'total_amount', 'refreshed_at'],
+        select(Delegator.validator_chain_config_id, Delegator.delegator_address, func.count(),
+               func.sum(Delegator.balance_amount), refreshed_at)
+        .where(*delegator_scope)
+        .group_by(Delegator.validator_chain_config_id, Delegator.delegator_address)
+    ))
+
+
+def nakamoto_coefficient(voting_powers):
+    """
+    Returns the smallest number of validators that together hold more than a third of the voting power.
+
+    Args:
+        voting_powers (iterable): Voting power, e.g. bonded tokens, of every active validator.
+    """
+    voting_powers = sorted(voting_powers, reverse=True)
+    threshold = sum(voting_powers) / 3
+    cumulative = 0
+    for count, power in enumerate(voting_powers, 1):
+        cumulative += power
+        if cumulative > threshold:
+            return count
+    return 0
+
+
+def build_report(chain, top=DEFAULT_TOP):
+    """
+    Builds the stake distribution report of a chain from its summary tables.
+
+    Args:
+        chain (ChainContext or str): The chain context, or chain ID, of the blockchain.
+        top (int): Number of largest delegators listed.
+
+    Returns:
+        dict: Validators with their voting power share and delegator count, the Nakamoto
+        coefficient, the number of delegators and the `top` largest delegators, or None if the
+        chain is not configured.
+    """
+    chain_config = resolve_chain(chain)
+    if not chain_config:
+        logger.error(f"No chain configuration found for chain_id {chain}")
+        return None
+
+    with Session() as session:
+        validators = session.execute(
+            select(ValidatorSummary.operator_address, ValidatorSummary.moniker, ValidatorSummary.status,
+                   ValidatorSummary.tokens, ValidatorSummary.delegator_count, ValidatorSummary.delegated_amount,
+                   ValidatorSummary.refreshed_at)
+            .where(ValidatorSummary.chain_config_id == chain_config.id)
+            .order_by(ValidatorSummary.tokens.desc(), ValidatorSummary.operator_address)
+        ).all()
+        top_delegators = session.execute(
+            select(DelegatorSummary.delegator_address, DelegatorSummary.total_amount, DelegatorSummary.validator_count)
+            .where(DelegatorSummary.chain_config_id == chain_config.id)
+            .order_by(DelegatorSummary.total_amount.desc())
+            .limit(top)
+        ).all()
+        delegators = session.execute(
+            select(func.count()).select_from(DelegatorSummary).where(DelegatorSummary.chain_config_id == chain_config.id)
+        ).scalar()
+
+    bonded_tokens = sum((row.tokens or Decimal(0) for row in validators if row.status == BONDED_STATUS), Decimal(0))
+    return {
+        'chain_id': chain_config.chain_id,
+        'refreshed_at': max((row.refreshed_at for row in validators if row.refreshed_at), default=None),
+        'bonded_tokens': bonded_tokens,
+        'nakamoto_coefficient': nakamoto_coefficient(
+            row.tokens or Decimal(0) for row in validators if row.status == BONDED_STATUS),
+        'delegators': delegators,
+        'validators': [
+            {
+                'operator_address': row.operator_address,
+                'moniker': row.moniker,
+                'status': row.status,
+                'tokens': row.tokens,
+                'voting_power_share': (row.tokens / bonded_tokens if row.status == BONDED_STATUS and bonded_tokens
+                                       else Decimal(0)),
+                'delegator_count': row.delegator_count,
+                'delegated_amount': row.delegated_amount,
+            }
+            for row in validators
+        ],
+        'top_delegators': [
+            {'delegator_address': row.delegator_address, 'total_amount': row.total_amount,
+             'validator_count': row.validator_count}
+            for row in top_delegators
+        ],
+    }
+
+
+def print_report(report):
+    """
+    Prints a stake distribution report built by `build_report`.
+
+    Args:
+        report (dict): The report of one chain.
+    """
+    validators = report['validators']
+    lines = [
+        f"Chain {report['chain_id']}: {len(validators)} validators, {report['delegators']} delegators, "
+        f"Nakamoto coefficient {report['nakamoto_coefficient']}, summaries refreshed {report['refreshed_at'] or 'never'}",
+        '',
+    ]
+    header = f"{'validator':<52} {'moniker':<24} {'voting power':>12} {'tokens':>24} {'delegators':>10}"
+    lines += [header, '-' * len(header)]
+    for validator in validators:
+        lines.append(f"{validator['operator_address']:<52} {(validator['moniker'] or '')[:24]:<24} "
+                     f"{validator['voting_power_share']:>11.2%} {validator['tokens'] or 0:>24,.0f} "
+                     f"{validator['delegator_count']:>10}")
+
+    header = f"{'delegator':<52} {'amount':>24} {'validators':>10}"
+    lines += ['', header, '-' * len(header)]
+    for delegator in report['top_delegators']:
+        lines.append(f"{delegator['delegator_address']:<52} {delegator['total_amount']:>24,.0f} "
+                     f"{delegator['validator_count']:>10}")
+    print('\n'.join(lines))
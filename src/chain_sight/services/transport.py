@@ -0,0 +1,291 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import zipfile
+
+import requests
+
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from urllib3.util.retry import Retry
+
+from chain_sight.common import metrics, profiling
+from chain_sight.common.environment import env_number
+
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# HTTP status codes that are retried with exponential backoff
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Path segments replaced by placeholders in the endpoint label of request metrics
+_ID_SEGMENT = re.compile(r'^\d+$')
+_ADDRESS_SEGMENT = re.compile(r'^[a-z]+1[0-9a-z]{20,}$')
+
+_HTTP_REQUEST_SECONDS = metrics.histogram('chain_sight_http_request_duration_seconds',
+                                          'Latency of REST requests including retries, by endpoint and status.',
+                                          ('endpoint', 'status'))
+
+_session = None
+_probe_session = None
+_session_lock = threading.Lock()
+
+# Archive used to record or replay responses, see configure_archive()
+_archive = None
+
+
+class FetchError(Exception):
+    """Raised when a REST request still fails after all retries."""
+
+
+class HttpArchive:
+    """
+    Compressed on-disk store of HTTP responses, indexed by request key.
+
+    The archive is a ZIP file with one deflate-compressed JSON entry per request, named after
+    the SHA-256 of the canonical request (URL, query parameters and request headers). The ZIP
+    central directory serves as the index, so a response is found without reading the others.
+
+    In 'record' mode every response received from the network is added to the archive. In
+    'replay' mode responses are served from the archive only and no request leaves the host.
+    """
+
+    RECORD = 'record'
+    REPLAY = 'replay'
+
+    def __init__(self, path, mode):
+        if mode not in (self.RECORD, self.REPLAY):
+            raise ValueError(f"Invalid archive mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._zip = zipfile.ZipFile(path, 'a' if mode == self.RECORD else 'r',
+                                    compression=zipfile.ZIP_DEFLATED, compresslevel=9)
+        self._names = set(self._zip.namelist())
+        logger.info(f"HTTP archive {path} opened in {mode} mode with {len(self._names)} recorded responses.")
+
+    @staticmethod
+    def request_key(url, params=None, headers=None):
+        """Returns the key identifying a request, independent of parameter and header order."""
+        canonical = json.dumps({
+            'url': url,
+            'params': sorted((str(key), str(value)) for key, value in (params or {}).items()),
+            'headers': sorted((str(key).lower(), str(value)) for key, value in (headers or {}).items()),
+        }, sort_keys=True)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def record(self, url, params, headers, status_code, body):
+        """Stores a response. The first response recorded for a request key is kept."""
+        name = f"{self.request_key(url, params, headers)}.json"
+        entry = json.dumps({
+            'url': url,
+            'params': {str(key): str(value) for key, value in (params or {}).items()},
+            'headers': {str(key): str(value) for key, value in (headers or {}).items()},
+            'status': status_code,
+            'body': body.decode('utf-8', errors='replace'),
+        })
+        with self._lock:
+            if name in self._names:
+                return
+            self._zip.writestr(name, entry)
+            self._names.add(name)
+
+    def replay(self, url, params, headers):
+        """
+        Returns the recorded (status code, body) of a request, or None if it was not recorded.
+        """
+        name = f"{self.request_key(url, params, headers)}.json"
+        if name not in self._names:
+            return None
+        with self._lock:
+            entry = json.loads(self._zip.read(name))
+        return entry['status'], entry['body'].encode('utf-8')
+
+    def reopen(self):
+        """Reopens the archive file, e.g. in a forked worker process that must not share the file handle."""
+        with self._lock:
+            self._zip = zipfile.ZipFile(self.path, 'a' if self.mode == self.RECORD else 'r',
+                                        compression=zipfile.ZIP_DEFLATED, compresslevel=9)
+
+    def close(self):
+        """Closes the archive, writing the index of a recording."""
+        with self._lock:
+            self._zip.close()
+        logger.info(f"HTTP archive {self.path} closed with {len(self._names)} recorded responses.")
+
+
+def get_timeout():
+    """Per-request timeout in seconds, configured with CHAIN_SIGHT_HTTP_TIMEOUT."""
+    return env_number('CHAIN_SIGHT_HTTP_TIMEOUT', 30.0)
+
+
+def _build_session(retries=None):
+    if retries is None:
+        retries = env_number('CHAIN_SIGHT_HTTP_RETRIES', 5, int)
+    backoff = env_number('CHAIN_SIGHT_HTTP_BACKOFF', 0.5)
+    jitter = env_number('CHAIN_SIGHT_HTTP_BACKOFF_JITTER', 0.5)
+    pool_size = env_number('CHAIN_SIGHT_HTTP_POOL_SIZE', 16, int)
+
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET']),
+        backoff_factor=backoff,
+        backoff_jitter=jitter,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    # One connection pool per host, sized for the concurrent delegator fetchers
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
+        'Accept': 'application/json',
+        'Accept-Encoding': 'gzip, deflate',
+    })
+    logger.debug(f"HTTP transport created (retries={retries}, backoff={backoff}, jitter={jitter}, pool_size={pool_size}).")
+    return session
+
+
+def get_session():
+    """Returns the shared HTTP session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get_probe_session():
+    """Returns the HTTP session used for health probes, which never retries a request."""
+    global _probe_session
+    if _probe_session is None:
+        with _session_lock:
+            if _probe_session is None:
+                _probe_session = _build_session(retries=0)
+    return _probe_session
+
+
+def reset_session():
+    """Closes the shared HTTP sessions so that the next request builds new ones."""
+    global _session, _probe_session
+    with _session_lock:
+        for session in (_session, _probe_session):
+            if session is not None:
+                session.close()
+        _session = _probe_session = None
+
+
+def configure_archive(record_path=None, replay_path=None):
+    """
+    Enables recording of responses to, or replaying of responses from, an archive file.
+
+    Args:
+        record_path (str): Archive to add every received response to.
+        replay_path (str): Archive to serve responses from, without network access.
+
+    Returns:
+        HttpArchive: The active archive, or None when neither path is given.
+    """
+    global _archive
+    close_archive()
+    if record_path and replay_path:
+        raise ValueError("Recording and replaying cannot be enabled at the same time.")
+    if record_path:
+        _archive = HttpArchive(record_path, HttpArchive.RECORD)
+    elif replay_path:
+        _archive = HttpArchive(replay_path, HttpArchive.REPLAY)
+    return _archive
+
+
+def get_archive():
+    """Returns the active archive, or None."""
+    return _archive
+
+
+def close_archive():
+    """Closes the active archive, if any."""
+    global _archive
+    if _archive is not None:
+        _archive.close()
+        _archive = None
+
+
+def endpoint_label(url):
+    """Returns the path of a URL with IDs and addresses replaced, to label metrics by endpoint."""
+    segments = []
+    for segment in urlsplit(url).path.split('/'):
+        if _ID_SEGMENT.match(segment):
+            segment = '{id}'
+        elif _ADDRESS_SEGMENT.match(segment):
+            segment = '{address}'
+        segments.append(segment)
+    return '/'.join(segments)
+
+
+def get_json(url, params=None, headers=None, timeout=None, decoder=None, session=None):
+    """
+    Performs a GET request through the shared transport and decodes the JSON body.
+
+    Connection errors and retryable status codes are retried with exponential backoff and jitter.
+    When an archive is configured, responses are recorded to it or served from it instead of
+    the network.
+
+    Args:
+        url (str): Request URL.
+        params (dict): Query string parameters.
+        headers (dict): Additional request headers.
+        timeout (float): Request timeout in seconds. Defaults to CHAIN_SIGHT_HTTP_TIMEOUT.
+        decoder (callable): Decodes the response body instead of `json.loads`, such as the
+            `decode` method of a `decoding.PageDecoder`. Must raise ValueError on invalid bodies.
+        session (requests.Session): Session performing the request instead of the shared one,
+            such as the `get_probe_session` session.
+
+    Returns:
+        dict: Decoded JSON response, or the value returned by `decoder`.
+
+    Raises:
+        FetchError: If the request fails or does not return status 200 after all retries.
+    """
+    archive = _archive
+    with profiling.stage('http_fetch'):
+        if archive is not None and archive.mode == HttpArchive.REPLAY:
+            recorded = archive.replay(url, params, headers)
+            if recorded is None:
+                raise FetchError(f"No recorded response for {url} with parameters {params} in {archive.path}")
+            status_code, body = recorded
+        else:
+            started = time.perf_counter()
+            try:
+                response = (session or get_session()).get(url, params=params, headers=headers,
+                                                          timeout=timeout if timeout is not None else get_timeout())
+            except requests.RequestException as e:
+                _HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint_label(url),
+                                              status='error')
+                raise FetchError(f"Request to {url} failed: {e}") from e
+            status_code, body = response.status_code, response.content
+            _HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint_label(url),
+                                          status=status_code)
+            if archive is not None:
+                archive.record(url, params, headers, status_code, body)
+
+    if status_code != 200:
+        raise FetchError(f"Request to {url} failed. Status code: {status_code}")
+
+    try:
+        with profiling.stage('json_decode'):
+            return (decoder or json.loads)(body)
+    except ValueError as e:
+        raise FetchError(f"Invalid JSON returned by {url}: {e}") from e
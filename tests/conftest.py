@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy import create_engine
+
+from chain_sight.common.config import invalidate_chain_contexts
+from chain_sight.models.models import ChainConfig
+from chain_sight.services.database_config import Base, Session
+
+
+def delegation_entry(delegator_address, amount='100'):
+    """Returns a delegation as listed by the REST API, with its balance in `utest`."""
+    return {
+        'delegation': {'delegator_address': delegator_address, 'shares': f'{amount}.000000000000000000'},
+        'balance': {'denom': 'utest', 'amount': amount},
+    }
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """Binds the application Session to a fresh SQLite database for the duration of a test."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'chain_sight_test.db'}")
+    Base.metadata.create_all(engine)
+    previous_bind = Session.kw.get('bind')
+    Session.configure(bind=engine)
+    invalidate_chain_contexts()
+    yield engine
+    invalidate_chain_contexts()
+    Session.configure(bind=previous_bind)
+    engine.dispose()
+
+
+@pytest.fixture
+def chain_config(db_engine):
+    session = Session()
+    chain = ChainConfig(
+        name='TestChain',
+        chain_id='test-1',
+        prefix='test',
+        rpc_endpoint='http://rpc.test',
+        api_endpoint='http://api.test',
+        grpc_endpoint=None,
+    )
+    session.add(chain)
+    session.commit()
+    session.refresh(chain)
+    session.expunge(chain)
+    session.close()
+    return chain
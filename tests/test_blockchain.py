@@ -0,0 +1,178 @@
+import json
+import threading
+import time
+
+import pytest
+
+from benchmarks.mock_cosmos import CHAIN_ID, MockCosmosServer, delegator_address
+from chain_sight.common.config import ChainContext
+from chain_sight.common.metrics import REGISTRY
+from chain_sight.services import blockchain
+from tests.conftest import delegation_entry
+
+
+def _fake_pages(pages_per_validator, state=None, lock=None):
+    def fake_iter(validator_addr, config):
+        if validator_addr == 'broken':
+            yield [delegation_entry('partial')]
+            raise RuntimeError('boom')
+        for page in range(pages_per_validator):
+            if state is not None:
+                with lock:
+                    state['running'] += 1
+                    state['peak'] = max(state['peak'], state['running'])
+            time.sleep(0.01)
+            if state is not None:
+                with lock:
+                    state['running'] -= 1
+            yield [delegation_entry(f'{validator_addr}-{page}')]
+    return fake_iter
+
+
+def test_delegation_pipeline_limits_parallelism(monkeypatch, chain_config):
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0}
+    monkeypatch.setattr(blockchain, 'iter_delegation_pages', _fake_pages(3, state, lock))
+    validators = [f'valoper{i}' for i in range(12)]
+
+    with blockchain.DelegationPipeline(chain_config, concurrency=3, queue_depth=2) as pipeline:
+        pipeline.submit(validators)
+        events = list(pipeline.events())
+
+    pages = [event for event in events if event[0] == 'page']
+    assert len(pages) == 36
+    assert {event[1] for event in events if event[0] == 'done'} == set(validators)
+    assert 1 < state['peak'] <= 3
+
+
+def test_delegation_pipeline_reports_failed_validators(monkeypatch, chain_config):
+    monkeypatch.setattr(blockchain, 'iter_delegation_pages', _fake_pages(1))
+
+    with blockchain.DelegationPipeline(chain_config, concurrency=2) as pipeline:
+        pipeline.submit(['ok', 'broken'])
+        events = list(pipeline.events())
+
+    finished = {event[1]: event[0] for event in events if event[0] != 'page'}
+    assert finished == {'ok': 'done', 'broken': 'failed'}
+
+
+def test_delegation_pipeline_close_releases_blocked_fetchers(monkeypatch, chain_config):
+    monkeypatch.setattr(blockchain, 'iter_delegation_pages', _fake_pages(50))
+
+    with blockchain.DelegationPipeline(chain_config, concurrency=2, queue_depth=1) as pipeline:
+        pipeline.submit(['a', 'b'])
+        next(pipeline.events())
+    # Leaving the block must not hang on fetchers waiting for queue space
+
+
+def test_prefetch_pages_applies_backpressure_and_propagates_errors():
+    produced = []
+
+    def pages():
+        for i in range(10):
+            produced.append(i)
+            yield [i]
+        raise RuntimeError('page failed')
+
+    stream = blockchain.prefetch_pages(pages(), queue_depth=2)
+    assert next(stream) == [0]
+    time.sleep(0.05)
+    assert len(produced) <= 4
+
+    remaining = []
+    try:
+        for page in stream:
+            remaining.append(page)
+    except RuntimeError as e:
+        assert str(e) == 'page failed'
+    assert remaining == [[i] for i in range(1, 10)]
+
+
+def _v1_proposal(proposal_id, status='PROPOSAL_STATUS_PASSED'):
+    return {'id': str(proposal_id), 'status': status, 'messages': [], 'final_tally_result': {}}
+
+
+def test_incremental_governance_fetch_stops_at_known_proposals(monkeypatch, chain_config):
+    pages = {
+        None: {'proposals': [_v1_proposal(12, 'PROPOSAL_STATUS_VOTING_PERIOD'), _v1_proposal(11)],
+               'pagination': {'next_key': 'page2'}},
+        'page2': {'proposals': [_v1_proposal(10), _v1_proposal(9)], 'pagination': {'next_key': 'page3'}},
+    }
+    requested = []
+
+    def fake_get_json(url, params=None, headers=None, timeout=None, decoder=None):
+        requested.append((url, params))
+        if url.endswith('/proposals'):
+            if params.get('pagination.limit') == 1:
+                return {'proposals': []}
+            assert params['pagination.reverse'] == 'true'
+            return decoder(json.dumps(pages[params.get('pagination.key')]).encode())
+        return {'proposal': _v1_proposal(int(url.rsplit('/', 1)[1]), 'PROPOSAL_STATUS_PASSED')}
+
+    monkeypatch.setattr(blockchain, 'get_json', fake_get_json)
+
+    proposals = blockchain.fetch_governance_proposals(chain_config, known_max_id=10, open_ids=[7, 12])
+
+    assert [p.proposal_id for p in proposals] == ['12', '11', '7']
+    assert not any(params and params.get('pagination.key') == 'page3' for _, params in requested)
+    assert requested[-1][0].endswith('/cosmos/gov/v1/proposals/7')
+
+
+@pytest.fixture
+def offset_pagination(monkeypatch):
+    monkeypatch.setenv('CHAIN_SIGHT_HTTP_RETRIES', '0')
+    monkeypatch.setattr(blockchain, '_node_page_limits', {})
+    blockchain.configure_pagination('offset')
+    yield
+    blockchain.configure_pagination(None)
+
+
+def test_offset_pagination_fans_out_with_the_node_page_limit(offset_pagination):
+    REGISTRY.reset()
+    with MockCosmosServer(validators=2, delegators_per_validator=1000, proposals=5, max_page_limit=150) as mock:
+        chain = ChainContext(1, 'Mock', CHAIN_ID, 'mock', mock.url, mock.url, None)
+        address = mock.validators[1]['operator_address']
+        requests = mock.requests
+        delegations = blockchain.fetch_delegators(address, chain)
+
+        # One counting page of 100, then pages of the node's 150 items once the first full-size page is cut short
+        assert mock.requests - requests < 10
+        assert blockchain._node_page_limits == {CHAIN_ID: 150}
+        assert len(blockchain.fetch_governance_proposals(chain)) == 5
+
+        blockchain.configure_pagination('key')
+        assert sorted(delegations) == sorted(blockchain.fetch_delegators(address, chain))
+    assert REGISTRY.get('chain_sight_pagination_fallbacks_total').value(
+        chain=CHAIN_ID, dataset='delegations', reason='inconsistent') == 0
+
+
+def test_offset_pagination_falls_back_to_keys(offset_pagination):
+    REGISTRY.reset()
+    with MockCosmosServer(validators=1, delegators_per_validator=350, offsets=False) as mock:
+        chain = ChainContext(1, 'Mock', CHAIN_ID, 'mock', mock.url, mock.url, None)
+        address = mock.validators[0]['operator_address']
+
+        delegations = blockchain.fetch_delegators(address, chain)
+
+    assert sorted(entry.delegator_address for entry in delegations) == [
+        delegator_address(0, index) for index in range(350)]
+    assert REGISTRY.get('chain_sight_pagination_fallbacks_total').value(
+        chain=CHAIN_ID, dataset='delegations', reason='no_count') == 1
+
+
+def test_offset_pagination_refetches_inconsistent_lists(offset_pagination, monkeypatch):
+    REGISTRY.reset()
+    with MockCosmosServer(validators=1, delegators_per_validator=350) as mock:
+        chain = ChainContext(1, 'Mock', CHAIN_ID, 'mock', mock.url, mock.url, None)
+        address = mock.validators[0]['operator_address']
+        # The node starts ignoring offsets after counting the list
+        paginate = mock._paginate
+        monkeypatch.setattr(mock, '_paginate', lambda items, query, field: paginate(
+            items, {key: value for key, value in query.items() if key != 'pagination.offset'}, field))
+
+        delegations = blockchain.fetch_delegators(address, chain)
+
+    assert len(delegations) == 350
+    assert len({entry.delegator_address for entry in delegations}) == 350
+    assert REGISTRY.get('chain_sight_pagination_fallbacks_total').value(
+        chain=CHAIN_ID, dataset='delegations', reason='inconsistent') == 1
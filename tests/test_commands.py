@@ -0,0 +1,81 @@
+from chain_sight.models.models import ChainConfig
+from chain_sight.services import commands
+from chain_sight.services.database_config import Session
+from chain_sight.services.decoding import validator_from_json
+from tests.conftest import delegation_entry
+
+
+def _add_chain(chain_id):
+    session = Session()
+    session.add(ChainConfig(name=chain_id.title(), chain_id=chain_id, prefix='x', rpc_endpoint='http://rpc',
+                            api_endpoint='http://api'))
+    session.commit()
+    session.close()
+
+
+def test_resolve_chain_names(chain_config):
+    _add_chain('other-1')
+
+    assert sorted(commands.resolve_chain_names('all')) == ['other-1', 'test-1']
+    assert commands.resolve_chain_names('a-1, b-2,') == ['a-1', 'b-2']
+    assert commands.resolve_chain_names('test-1') == ['test-1']
+
+
+def _fake_fetch_validators(chain_name, concurrency, batch_size, queue_depth):
+    if chain_name == 'broken-1':
+        raise RuntimeError('node unavailable')
+    if chain_name == 'missing-1':
+        return None
+    return {'rows': 13, 'validators': 2, 'delegators': 10, 'delegators_removed': 1, 'errors': 0}
+
+
+def test_run_chains_summarizes_each_chain(monkeypatch, capsys):
+    monkeypatch.setattr(commands, 'fetch_and_store_validators', _fake_fetch_validators)
+
+    summaries = commands.run_chains(['good-1', 'broken-1', 'missing-1'], 'validators', workers=2)
+
+    assert [s['chain'] for s in summaries] == ['good-1', 'broken-1', 'missing-1']
+    assert summaries[0]['rows'] == 13 and summaries[0]['errors'] == 0
+    assert summaries[1]['errors'] == 1 and summaries[1]['error'] == 'node unavailable'
+    assert summaries[2]['error'] == 'No configuration found'
+
+    commands.print_chain_summaries(summaries)
+    output = capsys.readouterr().out
+    assert 'good-1' in output and 'node unavailable' in output
+
+
+def test_fetch_and_store_validators_streams_pages_into_database(monkeypatch, chain_config):
+    from chain_sight.models.models import Delegator, Validator
+    from chain_sight.services import blockchain, database
+
+    validator_pages = [[validator_from_json({'operator_address': address}) for address in page]
+                       for page in (['valoper1'], ['valoper2', 'broken'])]
+    delegations = {
+        'valoper1': [[delegation_entry('a'), delegation_entry('b')], [delegation_entry('c')]],
+        'valoper2': [[delegation_entry('a')]],
+    }
+
+    def fake_delegation_pages(validator_addr, config):
+        if validator_addr == 'broken':
+            raise RuntimeError('node unavailable')
+        yield from delegations[validator_addr]
+
+    monkeypatch.setattr(commands, 'iter_validator_pages', lambda config: iter(validator_pages))
+    monkeypatch.setattr(blockchain, 'iter_delegation_pages', fake_delegation_pages)
+
+    # A stale delegator of valoper1 is removed, one of the failed validator is kept
+    database.upsert_validators([{'operator_address': 'broken'}, {'operator_address': 'valoper1'}], chain_config)
+    database.insert_delegators([delegation_entry('stale')], 'valoper1', chain_config)
+    database.insert_delegators([delegation_entry('kept')], 'broken', chain_config)
+
+    result = commands.fetch_and_store_validators(chain_config.chain_id, concurrency=2, batch_size=2, queue_depth=1)
+
+    assert result['validators'] == 3
+    assert result['delegators'] == 4
+    assert result['delegators_removed'] == 1
+    assert result['errors'] == 1
+    session = Session()
+    assert session.query(Validator).count() == 3
+    assert sorted(session.query(Delegator.validator_address, Delegator.delegator_address).all()) == [
+        ('broken', 'kept'), ('valoper1', 'a'), ('valoper1', 'b'), ('valoper1', 'c'), ('valoper2', 'a')]
+    session.close()
@@ -0,0 +1,200 @@
+from decimal import Decimal
+
+from chain_sight.models.models import Delegator, Validator
+from chain_sight.services import database
+from chain_sight.services.database_config import Session
+from chain_sight.services.decoding import proposal_from_json
+from tests.conftest import delegation_entry
+
+
+def _add_validator(chain_config, operator_address='valoper1'):
+    session = Session()
+    session.add(Validator(operator_address=operator_address, chain_config_id=chain_config.id))
+    session.commit()
+    session.close()
+
+
+def _delegators(session):
+    return {d.delegator_address: d for d in session.query(Delegator).all()}
+
+
+def test_insert_delegators_upserts_in_batches(chain_config, caplog):
+    _add_validator(chain_config)
+    entries = [delegation_entry(f'addr{i}', str(100 + i)) for i in range(25)]
+
+    with caplog.at_level('INFO'):
+        written = database.insert_delegators(entries, 'valoper1', chain_config.chain_id, batch_size=10)
+
+    assert written == 25
+    assert 'batch size 10' in caplog.text
+
+    database.insert_delegators([delegation_entry('addr0', '999'), delegation_entry('new', '5')], 'valoper1',
+                               chain_config.chain_id, batch_size=10)
+
+    session = Session()
+    delegators = _delegators(session)
+    session.close()
+    assert len(delegators) == 26
+    assert delegators['addr0'].balance_amount == Decimal('999')
+    assert delegators['addr1'].balance_amount == Decimal('101')
+    assert delegators['new'].balance_denom == 'utest'
+
+
+def test_insert_delegators_executemany_fallback(chain_config, monkeypatch):
+    _add_validator(chain_config)
+    monkeypatch.setattr(database, '_UPSERT_DIALECTS', {})
+
+    database.insert_delegators([delegation_entry('addr0'), delegation_entry('addr1')], 'valoper1', chain_config.chain_id)
+    database.insert_delegators([delegation_entry('addr0', '7'), delegation_entry('addr2')], 'valoper1', chain_config.chain_id)
+
+    session = Session()
+    delegators = _delegators(session)
+    session.close()
+    assert sorted(delegators) == ['addr0', 'addr1', 'addr2']
+    assert delegators['addr0'].balance_amount == Decimal('7')
+
+
+def test_cleanup_delegators_removes_only_stale_rows_of_validator_and_chain(chain_config):
+    _add_validator(chain_config)
+    _add_validator(chain_config, 'valoper2')
+    entries = [delegation_entry(f'addr{i}') for i in range(5)]
+    database.insert_delegators(entries, 'valoper1', chain_config.chain_id)
+    database.insert_delegators(entries, 'valoper2', chain_config.chain_id)
+
+    removed = database.cleanup_delegators(iter(['addr0', 'addr3', 'addr3']), 'valoper1', chain_config.chain_id,
+                                          batch_size=1)
+
+    assert removed == 3
+    session = Session()
+    remaining = session.query(Delegator.validator_address, Delegator.delegator_address).all()
+    session.close()
+    assert sorted(a for v, a in remaining if v == 'valoper1') == ['addr0', 'addr3']
+    assert len([a for v, a in remaining if v == 'valoper2']) == 5
+
+    # The staging table is dropped, so a second cleanup on the same pooled connection works
+    assert database.cleanup_delegators([], 'valoper2', chain_config.chain_id) == 5
+
+
+def test_change_events_without_upsert_or_delete_returning(chain_config, db_engine, monkeypatch):
+    from chain_sight.services.changefeed import ChangeFeed
+
+    class ListSink(list):
+        def write(self, events):
+            self.extend(events)
+
+    _add_validator(chain_config)
+    monkeypatch.setattr(database, '_UPSERT_DIALECTS', {})
+    monkeypatch.setattr(db_engine.dialect, 'delete_returning', False)
+    sink = ListSink()
+    feed = ChangeFeed(sink, chain_config, run_id='run-1')
+
+    database.insert_delegators([delegation_entry('addr0'), delegation_entry('addr1')], 'valoper1', chain_config, feed=feed)
+    database.insert_delegators([delegation_entry('addr0', '7'), delegation_entry('addr1')], 'valoper1', chain_config, feed=feed)
+    database.cleanup_delegators(['addr0'], 'valoper1', chain_config, feed=feed)
+
+    assert [(event['change'], event['delegator_address']) for event in sink] == [
+        ('insert', 'addr0'), ('insert', 'addr1'), ('update', 'addr0'), ('delete', 'addr1')]
+    assert sink[2]['old'] == {'shares': '100', 'amount': '100', 'denom': 'utest'}
+    assert sink[2]['new'] == {'shares': '7', 'amount': '7', 'denom': 'utest'}
+    assert sink[3]['new'] is None and sink[3]['old']['amount'] == '100'
+    assert {event['run_id'] for event in sink} == {'run-1'} and feed.emitted == 4
+
+
+def test_get_governance_sync_state(chain_config):
+    from chain_sight.models.models import GovernanceProposal
+
+    session = Session()
+    for proposal_id, status in [('9', 'PROPOSAL_STATUS_PASSED'), ('10', 'PROPOSAL_STATUS_VOTING_PERIOD'),
+                                ('2', 'PROPOSAL_STATUS_DEPOSIT_PERIOD')]:
+        session.add(GovernanceProposal(proposal_id=proposal_id, chain_id=chain_config.chain_id,
+                                       chain_config_id=chain_config.id, status=status))
+    session.commit()
+    session.close()
+
+    max_id, open_ids = database.get_governance_sync_state(
+        chain_config.chain_id, ('PROPOSAL_STATUS_DEPOSIT_PERIOD', 'PROPOSAL_STATUS_VOTING_PERIOD'))
+
+    assert max_id == 10
+    assert sorted(open_ids) == [2, 10]
+    assert database.get_governance_sync_state('unknown', ()) == (None, [])
+
+
+def _validator_payload(operator_address, tokens='1000', moniker='node'):
+    return {
+        'operator_address': operator_address,
+        'consensus_pubkey': {'@type': '/cosmos.crypto.ed25519.PubKey', 'key': 'abc'},
+        'jailed': False,
+        'status': 'BOND_STATUS_BONDED',
+        'tokens': tokens,
+        'delegator_shares': f'{tokens}.000000000000000000',
+        'description': {'moniker': moniker},
+        'commission': {'commission_rates': {'rate': '0.05', 'max_rate': '0.2', 'max_change_rate': '0.01'}},
+        'min_self_delegation': '1',
+    }
+
+
+def test_upsert_validators_writes_only_changes(chain_config):
+    payloads = [_validator_payload('valoper1'), _validator_payload('valoper2')]
+
+    assert database.upsert_validators(payloads, chain_config.chain_id) == {
+        'inserted': 2, 'updated': 0, 'unchanged': 0}
+
+    payloads[1] = _validator_payload('valoper2', tokens='2000', moniker='renamed')
+    payloads.append(_validator_payload('valoper3'))
+    assert database.upsert_validators(payloads, chain_config.chain_id) == {
+        'inserted': 1, 'updated': 1, 'unchanged': 1}
+
+    session = Session()
+    validator = session.get(Validator, ('valoper2', chain_config.id))
+    assert validator.moniker == 'renamed'
+    assert validator.tokens == 2000
+    session.close()
+
+
+def test_writers_do_not_query_chain_config_per_call(chain_config, db_engine):
+    from sqlalchemy import event
+
+    from chain_sight.common.config import get_chain_context, invalidate_chain_contexts
+
+    _add_validator(chain_config)
+    statements = []
+    event.listen(db_engine, 'before_cursor_execute', lambda conn, cursor, statement, *args: statements.append(statement))
+
+    chain = get_chain_context(chain_config.chain_id)
+    for i in range(5):
+        database.insert_delegator(delegation_entry(f'addr{i}'), 'valoper1', chain_config.chain_id)
+    database.insert_delegators([delegation_entry('addr9')], 'valoper1', chain)
+
+    assert len([s for s in statements if 'FROM chain_config' in s]) == 1
+    assert get_chain_context(chain_config.chain_id) is chain
+
+    invalidate_chain_contexts(chain_config.chain_id)
+    assert get_chain_context(chain_config.chain_id) is not chain
+
+
+def _proposal(proposal_id, status='PROPOSAL_STATUS_VOTING_PERIOD', yes='10'):
+    return proposal_from_json({
+        'proposal_id': proposal_id, 'status': status,
+        'content': {'@type': '/cosmos.gov.v1beta1.TextProposal', 'title': f'Proposal {proposal_id}',
+                    'description': 'summary'},
+        'final_tally_result': {'yes': yes, 'abstain': '0', 'no': '1', 'no_with_veto': '0'},
+        'submit_time': '2024-01-01T00:00:00Z', 'deposit_end_time': '2024-01-03T00:00:00Z',
+        'voting_start_time': '2024-01-02T00:00:00Z', 'voting_end_time': '2024-01-09T00:00:00Z',
+        'total_deposit': [{'denom': 'utest', 'amount': '10'}],
+    }, 'v1beta1')
+
+
+def test_governance_proposal_upsert_updates_in_place(chain_config):
+    from chain_sight.models.models import GovernanceProposal
+
+    assert database.insert_or_update_governance_proposal(_proposal('1'), chain_config.chain_id)
+    assert database.insert_or_update_governance_proposal(_proposal('2'), chain_config.chain_id)
+    assert database.insert_or_update_governance_proposal(
+        _proposal('1', status='PROPOSAL_STATUS_PASSED', yes='99'), chain_config.chain_id)
+
+    session = Session()
+    proposals = {p.proposal_id: p for p in session.query(GovernanceProposal).all()}
+    assert sorted(proposals) == ['1', '2']
+    assert proposals['1'].status == 'PROPOSAL_STATUS_PASSED'
+    assert proposals['1'].yes_votes == 99
+    session.close()
@@ -0,0 +1,51 @@
+from sqlalchemy import text
+
+from chain_sight.services.database_config import create_database_engine, engine_options, profile_settings
+
+
+def test_profiles_split_into_engine_options_per_database(monkeypatch):
+    monkeypatch.delenv('CHAIN_SIGHT_DB_PROFILE', raising=False)
+
+    options, pragmas = engine_options('sqlite:///chain_sight.db')
+    assert pragmas['journal_mode'] == 'WAL' and pragmas['synchronous'] == 'NORMAL'
+    # SQLite keeps the pool SQLAlchemy picks for the file
+    assert 'pool_size' not in options and 'executemany_mode' not in options
+
+    options, pragmas = engine_options('postgresql://localhost/chain_sight', 'bulk')
+    assert pragmas == {}
+    assert options['pool_size'] == 10 and options['pool_pre_ping'] is True
+    assert options['executemany_mode'] == 'values_plus_batch'
+    assert options['insertmanyvalues_page_size'] == 5000
+
+    assert engine_options('postgresql+psycopg://localhost/chain_sight', 'legacy') == ({}, {})
+
+
+def test_environment_overrides_profile_settings(monkeypatch):
+    monkeypatch.setenv('CHAIN_SIGHT_DB_PROFILE', 'durable')
+    monkeypatch.setenv('CHAIN_SIGHT_DB_POOL_SIZE', '3')
+    monkeypatch.setenv('CHAIN_SIGHT_DB_POOL_PRE_PING', 'false')
+    monkeypatch.setenv('CHAIN_SIGHT_DB_SYNCHRONOUS', 'NORMAL; DROP TABLE validators')
+
+    settings = profile_settings()
+    assert settings['synchronous'] == 'FULL'
+    assert settings['pool_size'] == 3 and settings['pool_pre_ping'] is False
+    assert profile_settings('missing')['journal_mode'] == 'WAL'
+
+
+def test_sqlite_pragmas_are_set_on_every_connection(tmp_path, monkeypatch):
+    monkeypatch.setenv('CHAIN_SIGHT_DB_BUSY_TIMEOUT', '1234')
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'profile.db'}", 'balanced')
+    try:
+        with engine.connect() as connection:
+            assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert connection.execute(text('PRAGMA synchronous')).scalar() == 1
+            assert connection.execute(text('PRAGMA busy_timeout')).scalar() == 1234
+    finally:
+        engine.dispose()
+
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'legacy.db'}", 'legacy')
+    try:
+        with engine.connect() as connection:
+            assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'delete'
+    finally:
+        engine.dispose()
@@ -0,0 +1,65 @@
+import json
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from benchmarks import mock_cosmos
+from chain_sight.services import decoding
+from chain_sight.services.decoding import (DELEGATION_PAGE, PROPOSAL_PAGES, VALIDATOR_PAGE, PageDecoder,
+                                           parse_timestamp, validator_from_json)
+
+
+def test_parse_timestamp_handles_cosmos_formats():
+    assert parse_timestamp('2024-01-01T00:00:00.123456789Z') == datetime(2024, 1, 1, 0, 0, 0, 123456, timezone.utc)
+    assert parse_timestamp('2024-01-01T00:00:00Z') == datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert parse_timestamp('2024-01-01T02:00:00.5+02:00') == datetime(2024, 1, 1, 0, 0, 0, 500000, timezone.utc)
+    assert parse_timestamp('2024-01-01T02:00:00+02:00').utcoffset() == timedelta(hours=2)
+    assert parse_timestamp(None) is None and parse_timestamp('') is None
+    with pytest.raises(ValueError):
+        parse_timestamp('2024-01-01T00:00:00')
+
+
+def _pages():
+    validators = [mock_cosmos._validator(index) for index in range(3)]
+    validators[0]['commission']['commission_rates']['rate'] = '0.123456789012345678'
+    delegations = [mock_cosmos._delegation(0, index, validators[0]['operator_address']) for index in range(3)]
+    proposals = [mock_cosmos._proposal(proposal_id) for proposal_id in (1, 10)]
+    yield VALIDATOR_PAGE, {'validators': validators, 'pagination': {'next_key': 'next', 'total': '0'}}
+    yield DELEGATION_PAGE, {'delegation_responses': delegations, 'pagination': {'next_key': None}}
+    for version, decoder in PROPOSAL_PAGES.items():
+        yield decoder, {'proposals': [mock_cosmos._render_proposal(proposal, version) for proposal in proposals]}
+
+
+@pytest.mark.parametrize('with_msgspec', [True, False])
+def test_body_and_dict_decoding_return_the_same_records(monkeypatch, with_msgspec):
+    if with_msgspec:
+        pytest.importorskip('msgspec')
+    else:
+        monkeypatch.setattr(decoding, 'msgspec', None)
+
+    for decoder, data in _pages():
+        # Decoders pick their path when created
+        decoder = PageDecoder(decoder.field, decoder._from_json, decoder.wire_type, decoder._from_wire)
+        page = decoder.decode(json.dumps(data).encode())
+        assert page == decoder.convert(data)
+        assert page.next_key == (data.get('pagination') or {}).get('next_key')
+
+    with pytest.raises(ValueError):
+        decoder.decode(b'{"proposals": [')
+
+
+def test_records_keep_exact_amounts():
+    validator = validator_from_json({'operator_address': 'valoper1', 'delegator_shares': '1.000000000000000001',
+                                     'commission': {'commission_rates': {'rate': '0.050000000000000000'}}})
+    assert validator.delegator_shares == Decimal('1.000000000000000001')
+    assert validator.commission_rate == Decimal('0.05')
+    assert validator.min_self_delegation == 1 and validator.consensus_pubkey == '{}'
+
+    page = PROPOSAL_PAGES['v1'].decode(json.dumps({'proposals': [mock_cosmos._render_proposal(
+        mock_cosmos._proposal(4), 'v1')]}).encode())
+    proposal = page.items[0]
+    assert (proposal.proposal_id, proposal.yes) == ('4', 4000)
+    assert proposal.proposal_type == '/cosmos.gov.v1.MsgExecLegacyContent'
+    assert proposal.submit_time.microsecond == 123456
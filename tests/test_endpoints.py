@@ -0,0 +1,104 @@
+import json
+import time
+
+import pytest
+
+from benchmarks.mock_cosmos import MockCosmosServer
+from chain_sight.common.config import get_chain_context
+from chain_sight.common.metrics import REGISTRY
+from chain_sight.models.models import ChainConfig
+from chain_sight.services import commands, transport
+from chain_sight.services.endpoints import EndpointPool, chain_api_endpoints
+from chain_sight.services.transport import FetchError
+
+
+@pytest.fixture(autouse=True)
+def fast_transport(monkeypatch):
+    monkeypatch.setenv('CHAIN_SIGHT_HTTP_RETRIES', '0')
+    transport.reset_session()
+    yield
+    transport.reset_session()
+
+
+def test_probe_ranks_fresh_endpoints_by_latency():
+    with MockCosmosServer(latency=0.1) as slow, MockCosmosServer() as fast, MockCosmosServer(height=900) as lagging:
+        pool = EndpointPool([slow.url, lagging.url, fast.url], 'mock-1', max_height_lag=10)
+        pool.probe()
+
+        assert [endpoint.url for endpoint in pool.ranked()] == [fast.url, slow.url, lagging.url]
+        assert [endpoint.stale for endpoint in pool.ranked()] == [False, False, True]
+        assert pool.ranked()[0].height == 1000
+
+
+def test_probe_is_sent_once_with_a_short_timeout(monkeypatch):
+    monkeypatch.setenv('CHAIN_SIGHT_HTTP_RETRIES', '5')
+    monkeypatch.setenv('CHAIN_SIGHT_ENDPOINT_PROBE_TIMEOUT', '0.2')
+    with MockCosmosServer(error_rate=1.0) as broken, MockCosmosServer(latency=2.0) as hanging, \
+            MockCosmosServer() as healthy:
+        pool = EndpointPool([broken.url, hanging.url, healthy.url], 'mock-1')
+        started = time.perf_counter()
+        pool.probe()
+
+        assert time.perf_counter() - started < 1.0
+        assert broken.requests == 1
+        assert [endpoint.url for endpoint in pool.ranked() if not endpoint.stale] == [healthy.url]
+
+
+def test_request_fails_over_to_healthy_endpoint():
+    REGISTRY.reset()
+    with MockCosmosServer(error_rate=1.0) as broken, MockCosmosServer() as healthy:
+        pool = EndpointPool([broken.url, healthy.url], 'mock-1')
+        for _ in range(3):
+            data = pool.request('/cosmos/staking/v1beta1/validators',
+                                lambda url: transport.get_json(url, params={'pagination.limit': 1}))
+            assert len(data['validators']) == 1
+
+        # Failing probes mark the broken endpoint as stale, so it is only tried last
+        assert pool.ranked()[-1].url == broken.url
+        assert healthy.requests > 3
+        with pytest.raises(FetchError):
+            EndpointPool([broken.url], 'mock-1').request('/cosmos/staking/v1beta1/validators', transport.get_json)
+        assert REGISTRY.get('chain_sight_endpoint_requests_total').value(
+            chain='mock-1', endpoint=healthy.url.split('//')[1], outcome='ok') == 3
+
+
+def test_slow_request_is_hedged_to_second_endpoint():
+    REGISTRY.reset()
+    with MockCosmosServer() as first, MockCosmosServer() as second:
+        pool = EndpointPool([first.url, second.url], 'mock-1', hedge_after=0.05)
+        pool.probe()
+        best = pool.ranked()[0].url
+
+        def fetch(url):
+            if url.startswith(best):
+                time.sleep(1.0)
+            return url
+
+        started = time.perf_counter()
+        url = pool.request('/cosmos/staking/v1beta1/validators', fetch)
+
+        assert time.perf_counter() - started < 0.5
+        assert not url.startswith(best)
+        assert REGISTRY.get('chain_sight_hedged_requests_total').value(chain='mock-1', winner='hedge') == 1
+        pool.close()
+
+
+def test_config_import_accepts_endpoint_lists(db_engine, tmp_path):
+    config_path = tmp_path / 'chains.json'
+    config_path.write_text(json.dumps({'chains': [{
+        'name': 'Multi', 'chain_id': 'multi-1', 'prefix': 'multi', 'rpc_endpoint': 'http://rpc',
+        'api_endpoints': ['http://api-a', 'http://api-b', 'http://api-a'],
+    }]}))
+
+    commands.config_import(str(config_path))
+
+    context = get_chain_context('multi-1')
+    assert context.api_endpoint == 'http://api-a'
+    assert context.api_endpoints == ('http://api-b',)
+    assert chain_api_endpoints(context) == ['http://api-a', 'http://api-b']
+
+
+def test_single_endpoint_chain_keeps_api_endpoint():
+    chain = ChainConfig(chain_id='single-1', api_endpoint='http://api/')
+
+    assert chain_api_endpoints(chain) == ['http://api']
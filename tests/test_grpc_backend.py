@@ -0,0 +1,128 @@
+import pytest
+
+from benchmarks import mock_cosmos
+from benchmarks.mock_cosmos import CHAIN_ID, MockCosmosServer
+from chain_sight.common.config import ChainContext
+from chain_sight.services import blockchain, grpc_backend
+from chain_sight.services.decoding import DELEGATION_PAGE, PROPOSAL_PAGES, VALIDATOR_PAGE
+from chain_sight.services.grpc_backend import (PROPOSAL_V1, PROPOSAL_V1BETA1, VALIDATOR, build_request,
+                                               decode_message, decode_page, encode_message, find_route)
+
+
+def test_codec_round_trips_rest_json():
+    validator = mock_cosmos._validator(3)
+    validator['jailed'] = True
+    validator['commission']['update_time'] = '2024-01-01T00:00:00.5Z'
+    proposal = mock_cosmos._proposal(7)
+
+    assert decode_message(encode_message(validator, VALIDATOR), VALIDATOR) == validator
+    for version, schema in (('v1', PROPOSAL_V1), ('v1beta1', PROPOSAL_V1BETA1)):
+        rendered = mock_cosmos._render_proposal(proposal, version)
+        decoded = decode_message(encode_message(rendered, schema), schema)
+        assert {key: decoded[key] for key in rendered} == rendered
+
+
+def test_codec_renders_decs_and_defaults_like_rest():
+    encoded = encode_message({'delegation': {'delegator_address': 'a', 'shares': '0.050000000000000000'}},
+                             grpc_backend.DELEGATION_RESPONSE)
+
+    # Decs travel as integers scaled by 10^18
+    assert b'50000000000000000' in encoded
+    assert decode_message(encoded, grpc_backend.DELEGATION_RESPONSE) == {
+        'delegation': {'delegator_address': 'a', 'validator_address': '', 'shares': '0.050000000000000000'},
+        'balance': None,
+    }
+
+
+def test_list_responses_decode_into_the_records_of_rest():
+    pytest.importorskip('google.protobuf')
+
+    validators = [mock_cosmos._validator(index) for index in range(3)]
+    validators[0]['jailed'] = True
+    validators[0]['commission']['commission_rates']['rate'] = '0.123456789012345678'
+    delegations = [mock_cosmos._delegation(0, index, validators[0]['operator_address']) for index in range(3)]
+    delegations.append({'delegation': {'delegator_address': 'a', 'shares': '1.500000000000000000'}, 'balance': None})
+    proposals = [mock_cosmos._proposal(proposal_id) for proposal_id in (1, 10)]
+    pages = [('/cosmos/staking/v1beta1/validators', VALIDATOR_PAGE, {'validators': validators}),
+             ('/cosmos/staking/v1beta1/validators/v/delegations', DELEGATION_PAGE,
+              {'delegation_responses': delegations, 'pagination': {'next_key': 'bmV4dA==', 'total': '9'}})]
+    for version, decoder in PROPOSAL_PAGES.items():
+        pages.append((f'/cosmos/gov/{version}/proposals', decoder,
+                      {'proposals': [mock_cosmos._render_proposal(proposal, version) for proposal in proposals]}))
+
+    for path, decoder, data in pages:
+        method, _, response_schema, _ = find_route(path)
+        page = decode_page(encode_message(data, response_schema), method, response_schema)
+        assert page == decoder.convert(data)
+        assert page == decoder.convert(decode_message(encode_message(data, response_schema), response_schema))
+
+    with pytest.raises(grpc_backend._DECODE_ERRORS):
+        decode_page(b'\x0a\x05ab', method, response_schema)
+
+
+def test_build_request_translates_rest_pagination():
+    assert build_request({'validator_addr': 'v'}, {'pagination.limit': 100, 'pagination.key': 'MTA=',
+                                                   'pagination.reverse': 'true'}) == {
+        'validator_addr': 'v', 'pagination': {'limit': 100, 'key': 'MTA=', 'reverse': True}}
+
+
+def test_grpc_backend_returns_the_same_records_as_rest(monkeypatch):
+    pytest.importorskip('grpc')
+    from benchmarks.mock_cosmos_grpc import MockCosmosGrpcServer
+
+    monkeypatch.setenv('CHAIN_SIGHT_HTTP_BACKOFF', '0.01')
+    with MockCosmosServer(validators=3, delegators_per_validator=250, proposals=12) as mock, \
+            MockCosmosGrpcServer(mock) as grpc_server:
+        rest = ChainContext(1, 'Mock', CHAIN_ID, 'mock', mock.url, mock.url, grpc_server.endpoint)
+        grpc_chain = rest._replace(fetch_backend='grpc')
+        try:
+            validators = blockchain.fetch_validators(grpc_chain)
+            assert validators == blockchain.fetch_validators(rest)
+            address = validators[1].operator_address
+            assert blockchain.fetch_delegators(address, grpc_chain) == blockchain.fetch_delegators(address, rest)
+            assert blockchain.fetch_governance_proposals(grpc_chain) == blockchain.fetch_governance_proposals(rest)
+            assert blockchain.fetch_governance_proposals(grpc_chain, known_max_id=8, open_ids=[5]) == \
+                blockchain.fetch_governance_proposals(rest, known_max_id=8, open_ids=[5])
+
+            # The flag overrides the backend configured per chain
+            blockchain.configure_backend('grpc')
+            requests = mock.requests
+            assert len(blockchain.fetch_validators(rest)) == 3
+            assert mock.requests == requests + 1
+        finally:
+            blockchain.configure_backend(None)
+            grpc_backend.reset_channels()
+
+
+def test_grpc_errors_raise_fetch_error(monkeypatch):
+    pytest.importorskip('grpc')
+    from benchmarks.mock_cosmos_grpc import MockCosmosGrpcServer
+
+    monkeypatch.setenv('CHAIN_SIGHT_HTTP_RETRIES', '0')
+    with MockCosmosServer(error_rate=1.0) as mock, MockCosmosGrpcServer(mock) as grpc_server:
+        try:
+            with pytest.raises(grpc_backend.FetchError, match='UNAVAILABLE'):
+                grpc_backend.get_json(grpc_server.endpoint, '/cosmos/staking/v1beta1/validators')
+            with pytest.raises(grpc_backend.FetchError, match='No gRPC query'):
+                grpc_backend.get_json(grpc_server.endpoint, '/cosmos/bank/v1beta1/balances/x')
+        finally:
+            grpc_backend.reset_channels()
+
+
+def test_pinned_height_is_sent_as_metadata():
+    pytest.importorskip('grpc')
+    from benchmarks.mock_cosmos_grpc import MockCosmosGrpcServer
+
+    with MockCosmosServer(validators=2, height=1234) as mock, MockCosmosGrpcServer(mock) as grpc_server:
+        chain = ChainContext(1, 'Mock', CHAIN_ID, 'mock', mock.url, mock.url, grpc_server.endpoint,
+                             fetch_backend='grpc')
+        try:
+            pinned = blockchain.pin_block_height(chain)
+            assert pinned.block_height == 1234
+            assert len(blockchain.fetch_validators(pinned)) == 2
+            assert mock.pinned_heights == {1234}
+
+            with pytest.raises(grpc_backend.FetchError, match='INVALID_ARGUMENT'):
+                blockchain.fetch_validators(pinned._replace(block_height=2000))
+        finally:
+            grpc_backend.reset_channels()
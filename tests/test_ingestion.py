@@ -0,0 +1,152 @@
+import pytest
+
+from benchmarks.mock_cosmos import CHAIN_ID, MockCosmosServer
+from chain_sight.models.models import ChainConfig, Delegator, GovernanceProposal, Validator
+from chain_sight.services import commands, transport
+from chain_sight.services.database_config import Session
+
+
+@pytest.fixture
+def mock_chain(db_engine, monkeypatch):
+    monkeypatch.setenv('CHAIN_SIGHT_HTTP_BACKOFF', '0')
+    monkeypatch.setenv('CHAIN_SIGHT_HTTP_BACKOFF_JITTER', '0')
+    transport.reset_session()
+    with MockCosmosServer(validators=5, delegators_per_validator=130, proposals=25, error_rate=0.3) as server:
+        session = Session()
+        session.add(ChainConfig(name='MockChain', chain_id=CHAIN_ID, prefix='mock', rpc_endpoint=server.url,
+                                api_endpoint=server.url))
+        session.commit()
+        session.close()
+        yield server
+    transport.reset_session()
+
+
+def test_ingestion_against_mock_server(mock_chain):
+    from chain_sight.common.metrics import REGISTRY
+
+    REGISTRY.reset()
+    result = commands.fetch_and_store_validators(CHAIN_ID, concurrency=2, batch_size=50)
+
+    assert result['validators'] == 5
+    assert result['delegators'] == 5 * 130
+    assert result['errors'] == 0
+
+    result = commands.fetch_and_store_governance_proposals(CHAIN_ID)
+
+    assert result['proposals'] == 25
+    session = Session()
+    assert session.query(Validator).count() == 5
+    assert session.query(Delegator).count() == 5 * 130
+    assert session.query(GovernanceProposal).count() == 25
+    session.close()
+    assert mock_chain.errors > 0
+
+    assert REGISTRY.get('chain_sight_rows_total').value(table='delegators', operation='upserted') == 5 * 130
+    assert REGISTRY.get('chain_sight_pages_fetched_total').value(chain=CHAIN_ID, dataset='delegations') == 10
+    assert REGISTRY.get('chain_sight_http_request_duration_seconds').count(
+        endpoint='/cosmos/staking/v1beta1/validators/{address}/delegations', status='200') == 10
+    assert REGISTRY.get('chain_sight_db_commit_duration_seconds').count(writer='delegators') > 0
+
+
+def test_validator_sync_appends_delegation_snapshot(mock_chain, tmp_path):
+    from chain_sight.services.snapshots import SnapshotReader, configure_snapshot_store
+
+    store = configure_snapshot_store(str(tmp_path))
+    try:
+        commands.fetch_and_store_validators(CHAIN_ID)
+    finally:
+        configure_snapshot_store(None)
+
+    [path] = store.snapshot_paths(CHAIN_ID)
+    with SnapshotReader(path) as reader:
+        assert reader.row_count == 5 * 130
+        assert len(reader.validators) == 5
+        assert reader.header['metadata']['block_height'] is None
+
+
+def test_snapshot_mode_pins_requests_and_stores_the_height(mock_chain):
+    from chain_sight.services.blockchain import configure_snapshot_mode
+
+    def stored_heights():
+        session = Session()
+        heights = {height for (height,) in session.query(Validator.snapshot_height)} | \
+            {height for (height,) in session.query(Delegator.snapshot_height)}
+        session.close()
+        return heights
+
+    configure_snapshot_mode(True)
+    try:
+        result = commands.fetch_and_store_validators(CHAIN_ID, concurrency=3)
+        assert result['block_height'] == 1000 and result['errors'] == 0
+        assert mock_chain.pinned_heights == {1000}
+        assert stored_heights() == {1000}
+
+        # Unchanged rows read at a new height carry that height
+        mock_chain.height = 1005
+        result = commands.fetch_and_store_validators(CHAIN_ID)
+        assert result['validators_unchanged'] == 5
+        assert stored_heights() == {1005}
+    finally:
+        configure_snapshot_mode(False)
+
+    # Unpinned syncs leave the height of unchanged rows alone
+    result = commands.fetch_and_store_validators(CHAIN_ID)
+    assert result['block_height'] is None
+    assert stored_heights() == {1005}
+
+
+def test_change_feed_records_what_each_sync_changed(mock_chain, tmp_path, monkeypatch):
+    import json
+
+    from benchmarks import mock_cosmos
+    from chain_sight.services.changefeed import configure_change_feed
+
+    path = tmp_path / 'changes.jsonl'
+
+    def read_events(run_id):
+        with open(path) as file:
+            return [event for event in map(json.loads, file) if event['run_id'] == run_id]
+
+    configure_change_feed(str(path))
+    try:
+        first = commands.fetch_and_store_validators(CHAIN_ID, batch_size=100)
+        events = read_events(first['run_id'])
+        assert first['changes'] == len(events) == 5 + 5 * 130
+        assert {(event['dataset'], event['change']) for event in events} == {('validators', 'insert'),
+                                                                            ('delegations', 'insert')}
+
+        # Two delegations per validator end, one balance and one validator change
+        mock_chain.delegators_per_validator = 128
+        mock_chain.validators[0]['tokens'] = '999'
+        delegation = mock_cosmos._delegation
+
+        def changed_delegation(validator_index, delegator_index, operator_address):
+            entry = delegation(validator_index, delegator_index, operator_address)
+            if (validator_index, delegator_index) == (1, 3):
+                entry['balance']['amount'] = '5'
+            return entry
+
+        monkeypatch.setattr(mock_cosmos, '_delegation', changed_delegation)
+        second = commands.fetch_and_store_validators(CHAIN_ID, batch_size=100)
+        events = read_events(second['run_id'])
+        assert second['run_id'] != first['run_id'] and second['changes'] == len(events) == 1 + 10 + 1
+
+        [validator] = [event for event in events if event['dataset'] == 'validators']
+        assert validator['change'] == 'update' and validator['chain_id'] == CHAIN_ID
+        assert (validator['old']['tokens'], validator['new']['tokens']) == ('1000000000', '999')
+        [update] = [event for event in events if event['change'] == 'update' and event['dataset'] == 'delegations']
+        assert update['delegator_address'] == mock_cosmos.delegator_address(1, 3)
+        assert (update['old']['amount'], update['new']['amount']) == ('1046', '5')
+        assert update['old']['shares'] == update['new']['shares'] == '1046'
+        removed = [event for event in events if event['change'] == 'delete']
+        assert {event['delegator_address'] for event in removed} == {
+            mock_cosmos.delegator_address(validator, delegator) for validator in range(5) for delegator in (128, 129)}
+        assert all(event['new'] is None and event['old']['denom'] == mock_cosmos.DENOM for event in removed)
+
+        # Nothing changed, nothing is written
+        third = commands.fetch_and_store_validators(CHAIN_ID, batch_size=100)
+        assert third['changes'] == 0 and read_events(third['run_id']) == []
+    finally:
+        configure_change_feed(None)
+
+    assert commands.fetch_and_store_validators(CHAIN_ID)['run_id'] is None
@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+
+def test_config_commands_start_without_the_fetch_pipeline(tmp_path):
+    code = (
+        "import sys\n"
+        "from chain_sight.__main__ import main\n"
+        "sys.argv = ['chain_sight', '--config', 'display']\n"
+        "main()\n"
+        "print(sorted(name for name in ('requests', 'grpc', 'chain_sight.services.commands', "
+        "'chain_sight.services.blockchain') if name in sys.modules))\n"
+    )
+    environment = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'main.db'}", PYTHONPATH=os.pathsep.join(sys.path))
+
+    for _ in range(2):
+        result = subprocess.run([sys.executable, '-c', code], env=environment, cwd=tmp_path, capture_output=True,
+                                text=True, check=True)
+        assert result.stdout.splitlines()[-1] == '[]'
+    assert '"chains": []' in result.stdout
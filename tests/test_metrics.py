@@ -0,0 +1,52 @@
+import json
+import urllib.request
+
+from chain_sight.common.metrics import Registry, start_metrics_server, write_metrics_file
+
+
+def _registry():
+    registry = Registry()
+    registry.counter('test_rows_total', 'Rows.', ('table',)).inc(3, table='delegators')
+    registry.gauge('test_queue_depth', 'Depth.', ('queue',)).set(2, queue='pages')
+    latency = registry.histogram('test_latency_seconds', 'Latency.', ('endpoint',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, endpoint='/a/"b"')
+    return registry
+
+
+def test_render_prometheus_text():
+    text = _registry().render()
+
+    assert '# TYPE test_rows_total counter\ntest_rows_total{table="delegators"} 3\n' in text
+    assert 'test_queue_depth{queue="pages"} 2' in text
+    assert 'test_latency_seconds_bucket{endpoint="/a/\\"b\\"",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{endpoint="/a/\\"b\\"",le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{endpoint="/a/\\"b\\"",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{endpoint="/a/\\"b\\""} 3' in text
+
+
+def test_merge_adds_worker_metrics():
+    registry = _registry()
+    registry.merge(_registry().dump())
+
+    assert registry.get('test_rows_total').value(table='delegators') == 6
+    assert registry.get('test_queue_depth').value(queue='pages') == 2
+    assert registry.get('test_latency_seconds').count(endpoint='/a/"b"') == 6
+
+
+def test_metrics_file_and_endpoint(tmp_path):
+    registry = _registry()
+    write_metrics_file(str(tmp_path / 'metrics.json'), registry)
+    write_metrics_file(str(tmp_path / 'metrics.prom'), registry)
+
+    assert json.loads((tmp_path / 'metrics.json').read_text())['test_rows_total']['samples'] == [
+        {'labels': {'table': 'delegators'}, 'value': 3}]
+    assert (tmp_path / 'metrics.prom').read_text() == registry.render()
+
+    server = start_metrics_server(0, '127.0.0.1', registry)
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.server_address[1]}/metrics') as response:
+            assert response.read().decode() == registry.render()
+    finally:
+        server.shutdown()
+        server.server_close()
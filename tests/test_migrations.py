@@ -0,0 +1,84 @@
+from sqlalchemy import create_engine, inspect, text
+
+from chain_sight.models.models import ChainConfig  # noqa: F401  registers the models on Base
+from chain_sight.services.database_config import Base
+from chain_sight.services import migrations
+from chain_sight.services.migrations import SCHEMA_VERSION, get_schema_version, run_migrations, upgrade_schema
+
+
+def _legacy_database(tmp_path):
+    """Creates the schema of a release without the migrated columns, unique keys and summaries, with duplicate rows."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE chain_config (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, "
+                                "chain_id VARCHAR NOT NULL, prefix VARCHAR NOT NULL, rpc_endpoint VARCHAR NOT NULL, "
+                                "api_endpoint VARCHAR NOT NULL, grpc_endpoint VARCHAR)"))
+        connection.execute(text("CREATE TABLE validators (operator_address VARCHAR NOT NULL, "
+                                "chain_config_id INTEGER NOT NULL, jailed BOOLEAN, status VARCHAR, tokens NUMERIC, "
+                                "moniker VARCHAR, PRIMARY KEY (operator_address, chain_config_id))"))
+        connection.execute(text("INSERT INTO validators (operator_address, chain_config_id, status, tokens) "
+                                "VALUES ('v', 1, 'BOND_STATUS_BONDED', 5)"))
+        connection.execute(text("CREATE TABLE delegators (id INTEGER PRIMARY KEY, delegator_address VARCHAR, "
+                                "validator_address VARCHAR NOT NULL, validator_chain_config_id INTEGER NOT NULL, "
+                                "shares NUMERIC, balance_amount NUMERIC, balance_denom VARCHAR)"))
+        connection.execute(text("CREATE TABLE governance_proposals (id INTEGER PRIMARY KEY, "
+                                "proposal_id VARCHAR NOT NULL, chain_id VARCHAR NOT NULL, "
+                                "chain_config_id INTEGER NOT NULL, status VARCHAR)"))
+        connection.execute(text("INSERT INTO delegators (id, delegator_address, validator_address, "
+                                "validator_chain_config_id, balance_amount) VALUES "
+                                "(1, 'a', 'v', 1, 1), (2, 'a', 'v', 1, 2), (3, 'b', 'v', 1, 3)"))
+        connection.execute(text("INSERT INTO governance_proposals (id, proposal_id, chain_id, chain_config_id, status) "
+                                "VALUES (1, '5', 'c', 1, 'old'), (2, '5', 'c', 1, 'new'), (3, '5', 'd', 2, 'x')"))
+    return engine
+
+
+def test_migrations_upgrade_legacy_schema(tmp_path):
+    engine = _legacy_database(tmp_path)
+
+    applied = run_migrations(engine)
+
+    assert len(applied) == 9
+    inspector = inspect(engine)
+    assert {'api_endpoints', 'fetch_backend'} <= {column['name'] for column in inspector.get_columns('chain_config')}
+    assert {'content_hash', 'snapshot_height'} <= {column['name'] for column in inspector.get_columns('validators')}
+    assert 'snapshot_height' in [column['name'] for column in inspector.get_columns('delegators')]
+    assert {index['name'] for index in inspector.get_indexes('delegators') if index['unique']} == {
+        'uq_delegator_validator_chain'}
+    assert 'ix_delegators_chain_delegator' in {index['name'] for index in inspector.get_indexes('delegators')}
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT id, balance_amount FROM delegators ORDER BY id")).all() == [
+            (2, 2), (3, 3)]
+        assert connection.execute(text("SELECT id, status FROM governance_proposals ORDER BY id")).all() == [
+            (2, 'new'), (3, 'x')]
+        # The summaries are built from the rows left after removing duplicates
+        assert connection.execute(text("SELECT operator_address, delegator_count, delegated_amount "
+                                       "FROM validator_summaries")).all() == [('v', 2, 5)]
+        assert connection.execute(text("SELECT delegator_address, total_amount FROM delegator_summaries "
+                                       "ORDER BY delegator_address")).all() == [('a', 2), ('b', 3)]
+
+    assert run_migrations(engine) == []
+    engine.dispose()
+
+
+def test_migrations_skip_current_schema(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'current.db'}")
+    Base.metadata.create_all(engine)
+
+    assert run_migrations(engine) == []
+    engine.dispose()
+
+
+def test_schema_version_skips_the_migrations_of_a_current_database(tmp_path, monkeypatch):
+    engine = _legacy_database(tmp_path)
+    assert get_schema_version(engine) is None
+
+    assert len(upgrade_schema(engine, Base.metadata)) == 9
+    assert get_schema_version(engine) == SCHEMA_VERSION
+    assert 'validator_summaries' in inspect(engine).get_table_names()
+
+    def fail(engine):
+        raise AssertionError("migrations ran against a current database")
+
+    monkeypatch.setattr(migrations, 'run_migrations', fail)
+    assert upgrade_schema(engine, Base.metadata) == []
+    engine.dispose()
@@ -0,0 +1,76 @@
+import json
+import threading
+import tracemalloc
+
+import pytest
+
+from chain_sight.common import profiling
+
+
+def test_stage_is_a_no_op_without_profiler():
+    assert not profiling.is_profiling()
+    with profiling.stage('http_fetch'):
+        pass
+
+
+def test_profile_reports(tmp_path):
+    profiling.start_profiling(str(tmp_path))
+    try:
+        def fetch():
+            with profiling.stage('http_fetch'):
+                sum(range(10000))
+
+        thread = threading.Thread(target=fetch)
+        thread.start()
+        thread.join()
+        with profiling.stage('db_write'):
+            data = [str(i) for i in range(1000)]
+    finally:
+        paths = profiling.stop_profiling()
+
+    assert not profiling.is_profiling()
+    assert {path.rsplit('/', 1)[-1] for path in paths} == {'stages.txt', 'cpu.pstats', 'cpu.txt', 'allocations.txt'}
+    report = json.loads((tmp_path / 'stages.json').read_text())
+    assert report['stages']['http_fetch']['calls'] == 1
+    assert report['stages']['db_write']['calls'] == 1
+    assert report['stages']['cleanup']['calls'] == 0
+    assert 'fetch' in (tmp_path / 'cpu.txt').read_text()
+    assert 'Peak traced memory' in (tmp_path / 'allocations.txt').read_text()
+    assert len(data) == 1000
+
+
+def test_profiler_sees_worker_threads(tmp_path):
+    profiler = profiling.Profiler(str(tmp_path))
+    profiler.start()
+    try:
+        def worker_task():
+            profiler.record('http_fetch', 0.0, 0.0)
+            return sum(range(10000))
+
+        thread = threading.Thread(target=worker_task)
+        thread.start()
+        thread.join()
+    finally:
+        profiler.stop()
+
+    assert profiler.stages['http_fetch']['calls'] == 1
+    assert 'worker_task' in (tmp_path / 'cpu.txt').read_text()
+    assert not tracemalloc.is_tracing()
+
+
+def test_failed_start_undoes_its_setup(tmp_path, monkeypatch):
+    class ActiveProfiler:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+        def disable(self):
+            pass
+
+    monkeypatch.setattr(profiling.Profiler, '_new_profile', lambda self: ActiveProfiler())
+
+    with pytest.raises(ValueError, match='already active'):
+        profiling.start_profiling(str(tmp_path))
+
+    assert not profiling.is_profiling()
+    assert not tracemalloc.is_tracing()
+    assert threading.getprofile() is None
@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+from chain_sight.common.cli import parse_interval
+from chain_sight.services import scheduler
+
+
+def test_build_intervals_applies_overrides():
+    intervals = scheduler.build_intervals(['a-1', 'b-1'], [(None, 'governance', 60), ('b-1', 'governance', 30),
+                                                           ('a-1', 'validators', 0)])
+
+    assert intervals == {('a-1', 'governance'): 60, ('b-1', 'validators'): 3600, ('b-1', 'governance'): 30}
+
+
+def test_parse_interval():
+    assert parse_interval('governance=600') == (None, 'governance', 600.0)
+    assert parse_interval('mantle-1:validators=1.5') == ('mantle-1', 'validators', 1.5)
+    with pytest.raises(Exception):
+        parse_interval('votes=10')
+
+
+def test_scheduler_never_overlaps_a_job_and_stops_gracefully(monkeypatch):
+    active = {}
+    overlaps = []
+    calls = []
+    lock = threading.Lock()
+
+    def fake_run_chain(chain_name, fetch, concurrency, batch_size, full_sync, queue_depth):
+        job = (chain_name, fetch)
+        with lock:
+            if active.get(job):
+                overlaps.append(job)
+            active[job] = True
+            calls.append(job)
+        time.sleep(0.05 if fetch == 'validators' else 0.001)
+        with lock:
+            active[job] = False
+        return {'rows': 1, 'errors': 0, 'duration': 0.0}
+
+    monkeypatch.setattr(scheduler, 'run_chain', fake_run_chain)
+    # Validators take longer than their interval, governance runs are short
+    sched = scheduler.Scheduler({('a-1', 'validators'): 0.01, ('a-1', 'governance'): 0.02}, jitter=0.5, workers=4)
+    thread = threading.Thread(target=sched.run)
+    thread.start()
+    time.sleep(0.3)
+    sched.stop()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert overlaps == []
+    assert sched.skipped > 0
+    assert calls.count(('a-1', 'governance')) > 3
+    assert not sched.is_running('a-1', 'validators')
+    assert sched.completed == len(calls)
@@ -0,0 +1,95 @@
+import datetime
+
+from chain_sight.services import database
+from chain_sight.services.snapshots import SnapshotReader, SnapshotStore, SnapshotWriter, decode_deltas, \
+    encode_deltas, snapshot_delegations
+
+
+def _taken_at(day, hour=0):
+    return datetime.datetime(2024, 5, day, hour, tzinfo=datetime.timezone.utc)
+
+
+def test_delta_encoding_round_trip():
+    values = [0, 5, 3, 10 ** 30, 7, -2, 2 ** 64 + 1]
+
+    assert decode_deltas(encode_deltas(values), len(values)) == values
+
+
+def test_snapshot_round_trip(tmp_path):
+    writer = SnapshotWriter('test-1', taken_at=_taken_at(1), metadata={'errors': 0})
+    writer.add_validator('val1', [('a', 300, 'utest'), ('b', 10 ** 24, 'utest'), ('c', '5', 'utest')])
+    writer.add_validator('val2', [('a', 7, 'utest')])
+    writer.add_validator('val3', [])
+    path = writer.write(str(tmp_path / 'snapshot.snap'))
+
+    with SnapshotReader(path) as reader:
+        assert reader.chain_id == 'test-1'
+        assert reader.taken_at == _taken_at(1)
+        assert reader.row_count == 4
+        assert reader.delegator_counts() == {'val1': 3, 'val2': 1, 'val3': 0}
+        assert reader.stake_by_validator() == {'val1': 10 ** 24 + 305, 'val2': 7, 'val3': 0}
+        assert list(reader.delegations('val1')) == [('val1', 'c', 5), ('val1', 'a', 300), ('val1', 'b', 10 ** 24)]
+        assert reader.header['metadata'] == {'errors': 0}
+
+
+def test_balances_are_fixed_width_until_one_exceeds_int128(tmp_path):
+    writer = SnapshotWriter('test-1', taken_at=_taken_at(1))
+    writer.add_validator('val1', [('a', 300, 'utest'), ('b', -5, 'utest')])
+    with SnapshotReader(writer.write(str(tmp_path / 'small.snap'))) as reader:
+        assert isinstance(reader.balances(), memoryview)
+        assert reader.stake_by_validator() == {'val1': 295}
+
+    writer.add_validator('val2', [('a', 2 ** 63, 'utest'), ('c', 1, 'utest')])
+    with SnapshotReader(writer.write(str(tmp_path / 'wide.snap'))) as reader:
+        assert 'balances_high' in reader.header['columns']
+        assert list(reader.balances()) == [-5, 300, 1, 2 ** 63]
+        assert reader.total_stake() == 2 ** 63 + 296
+
+    writer.add_validator('val3', [('d', 2 ** 127, 'utest')])
+    with SnapshotReader(writer.write(str(tmp_path / 'large.snap'))) as reader:
+        assert 'balance_deltas' in reader.header['columns']
+        assert list(reader.balances()) == [-5, 300, 1, 2 ** 63, 2 ** 127]
+
+
+def test_18_decimal_balances_are_summed_from_the_map(tmp_path):
+    stake = 1234567 * 10 ** 18
+    writer = SnapshotWriter('evmos_9001-2', taken_at=_taken_at(1))
+    writer.add_validator('val1', [('a', stake, 'aevmos'), ('b', 10 ** 18, 'aevmos'), ('c', -stake, 'aevmos')])
+    writer.add_validator('val2', [('a', 5 * 10 ** 24, 'aevmos')])
+
+    with SnapshotReader(writer.write(str(tmp_path / 'evmos.snap'))) as reader:
+        assert 'balance_deltas' not in reader.header['columns']
+        balances = reader.balances()
+        assert isinstance(balances.high, memoryview) and isinstance(balances.low, memoryview)
+        assert list(balances) == [-stake, 10 ** 18, stake, 5 * 10 ** 24]
+        assert reader.stake_by_validator() == {'val1': 10 ** 18, 'val2': 5 * 10 ** 24}
+        assert reader.total_stake() == 10 ** 18 + 5 * 10 ** 24
+
+
+def test_store_partitions_and_aggregates(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    for day, delegations in [(1, [('a', 10), ('b', 20)]), (2, [('a', 15), ('c', 5)]), (3, [('c', 5)])]:
+        writer = SnapshotWriter('test-1', taken_at=_taken_at(day))
+        writer.add_validator('val1', [(address, amount, 'utest') for address, amount in delegations])
+        store.append(writer)
+
+    assert (tmp_path / 'chain=test-1' / 'date=2024-05-02').is_dir()
+    assert store.stake_over_time('test-1') == [(_taken_at(1), 30), (_taken_at(2), 20), (_taken_at(3), 5)]
+    assert store.stake_over_time('test-1', 'val1', start=datetime.date(2024, 5, 2)) == [
+        (_taken_at(2), 20), (_taken_at(3), 5)]
+    assert store.delegator_churn('test-1') == [(_taken_at(2), 1, 1), (_taken_at(3), 0, 1)]
+    assert store.snapshot_paths('other-1') == []
+
+
+def test_snapshot_delegations_from_database(chain_config, tmp_path):
+    database.upsert_validators([{'operator_address': 'val1'}, {'operator_address': 'val2'}], chain_config)
+    for validator, entries in [('val1', [('a', '100'), ('b', '50')]), ('val2', [('a', '7')])]:
+        database.insert_delegators([{'delegation': {'delegator_address': address, 'shares': amount},
+                                     'balance': {'denom': 'utest', 'amount': amount}}
+                                    for address, amount in entries], validator, chain_config)
+
+    path = snapshot_delegations(chain_config.chain_id, SnapshotStore(str(tmp_path)))
+
+    with SnapshotReader(path) as reader:
+        assert reader.stake_by_validator() == {'val1': 150, 'val2': 7}
+        assert reader.delegation_keys() == {('val1', 'a'), ('val1', 'b'), ('val2', 'a')}
@@ -0,0 +1,139 @@
+from decimal import Decimal
+
+from sqlalchemy import func, select
+
+from benchmarks import mock_cosmos
+from chain_sight.models.models import Delegator, DelegatorSummary, ValidatorSummary
+from chain_sight.services import database
+from chain_sight.services.database_config import Session
+from chain_sight.services.summaries import build_report, nakamoto_coefficient, rebuild_summaries
+
+
+def _sync(chain_config, validators, delegations):
+    """Writes validators and their delegations like a validator sync."""
+    database.upsert_validators(validators, chain_config)
+    with database.DelegatorSync(chain_config, batch_size=7) as sync:
+        for validator in validators:
+            sync.write_page(validator['operator_address'], delegations.get(validator['operator_address'], []))
+            sync.finish_validator(validator['operator_address'])
+
+
+def _summaries():
+    with Session() as session:
+        validators = {row.operator_address: (row.delegator_count, row.delegated_amount, row.tokens, row.refreshed_at)
+                      for row in session.query(ValidatorSummary)}
+        delegators = {row.delegator_address: (row.validator_count, row.total_amount)
+                      for row in session.query(DelegatorSummary)}
+    return validators, delegators
+
+
+def _full_aggregates():
+    with Session() as session:
+        validators = {address: (count, amount) for address, count, amount in session.execute(
+            select(Delegator.validator_address, func.count(), func.sum(Delegator.balance_amount))
+            .group_by(Delegator.validator_address))}
+        delegators = {address: (count, amount) for address, count, amount in session.execute(
+            select(Delegator.delegator_address, func.count(), func.sum(Delegator.balance_amount))
+            .group_by(Delegator.delegator_address))}
+    return validators, delegators
+
+
+def test_nakamoto_coefficient():
+    assert nakamoto_coefficient([10, 10, 10]) == 2
+    assert nakamoto_coefficient([50, 10, 10, 10]) == 1
+    assert nakamoto_coefficient([Decimal(1)] * 9) == 4
+    assert nakamoto_coefficient([]) == 0
+
+
+def test_syncs_refresh_only_changed_summaries(chain_config):
+    validators = [mock_cosmos._validator(index) for index in range(3)]
+    delegations = {validator['operator_address']: [mock_cosmos._delegation(index, delegator,
+                                                                           validator['operator_address'])
+                                                   for delegator in range(10)]
+                   for index, validator in enumerate(validators)}
+    # A delegator staking with two validators
+    delegations[validators[1]['operator_address']].append(
+        mock_cosmos._delegation(0, 0, validators[1]['operator_address']))
+    _sync(chain_config, validators, delegations)
+
+    validator_summaries, delegator_summaries = _summaries()
+    aggregates, delegator_aggregates = _full_aggregates()
+    assert {address: summary[:2] for address, summary in validator_summaries.items()} == aggregates
+    assert delegator_summaries == delegator_aggregates
+    assert delegator_summaries[mock_cosmos.delegator_address(0, 0)] == (2, Decimal(2000))
+
+    # One balance changes and one delegation ends; the first validator is left alone
+    delegations[validators[1]['operator_address']][0]['balance']['amount'] = '5'
+    removed = delegations[validators[2]['operator_address']].pop()
+    _sync(chain_config, validators, delegations)
+
+    new_validator_summaries, new_delegator_summaries = _summaries()
+    aggregates, delegator_aggregates = _full_aggregates()
+    assert {address: summary[:2] for address, summary in new_validator_summaries.items()} == aggregates
+    assert new_delegator_summaries == delegator_aggregates
+    assert removed['delegation']['delegator_address'] not in new_delegator_summaries
+    refreshed = {address for address, summary in new_validator_summaries.items()
+                 if summary[3] != validator_summaries[address][3]}
+    assert refreshed == {validators[1]['operator_address'], validators[2]['operator_address']}
+
+    # Rebuilding from scratch gives the same summaries
+    with Session() as session:
+        rebuild_summaries(session.connection())
+        session.commit()
+    rebuilt_validators, rebuilt_delegators = _summaries()
+    assert {address: summary[:3] for address, summary in rebuilt_validators.items()} == \
+        {address: summary[:3] for address, summary in new_validator_summaries.items()}
+    assert rebuilt_delegators == new_delegator_summaries
+
+
+def test_first_sync_rebuilds_and_later_syncs_stage_changes(chain_config):
+    validators = [mock_cosmos._validator(index) for index in range(2)]
+    delegations = {validator['operator_address']: [mock_cosmos._delegation(index, delegator,
+                                                                           validator['operator_address'])
+                                                   for delegator in range(5)]
+                   for index, validator in enumerate(validators)}
+    with database.DelegatorSync(chain_config, batch_size=3) as sync:
+        assert sync._rebuild
+        database.upsert_validators(validators, chain_config, sync=sync)
+        for validator in validators:
+            sync.write_page(validator['operator_address'], delegations[validator['operator_address']])
+            sync.finish_validator(validator['operator_address'])
+        # Nothing is tracked or refreshed before the sync is closed
+        assert _summaries() == ({}, {})
+
+    validator_summaries, delegator_summaries = _summaries()
+    aggregates, delegator_aggregates = _full_aggregates()
+    assert {address: summary[:2] for address, summary in validator_summaries.items()} == aggregates
+    assert delegator_summaries == delegator_aggregates
+
+    validators[0]['tokens'] = '7'
+    with database.DelegatorSync(chain_config, batch_size=3) as sync:
+        assert not sync._rebuild
+        database.upsert_validators(validators, chain_config, sync=sync)
+        assert _summaries()[0][validators[0]['operator_address']][2] != Decimal(7)
+    assert _summaries()[0][validators[0]['operator_address']][2] == Decimal(7)
+
+
+def test_report_from_summaries(chain_config):
+    validators = [mock_cosmos._validator(index) for index in range(4)]
+    validators[3]['status'] = 'BOND_STATUS_UNBONDED'
+    delegations = {validator['operator_address']: [mock_cosmos._delegation(index, delegator,
+                                                                           validator['operator_address'])
+                                                   for delegator in range(index + 1)]
+                   for index, validator in enumerate(validators)}
+    _sync(chain_config, validators, delegations)
+
+    report = build_report(chain_config.chain_id, top=2)
+
+    # Bonded tokens 1, 2 and 3 billion: the largest validator alone holds more than a third
+    assert report['bonded_tokens'] == Decimal(6_000_000_000)
+    assert report['nakamoto_coefficient'] == 1
+    assert [validator['operator_address'] for validator in report['validators']] == [
+        mock_cosmos.validator_address(index) for index in (3, 2, 1, 0)]
+    assert [validator['voting_power_share'] for validator in report['validators']] == [
+        0, Decimal(3) / 6, Decimal(2) / 6, Decimal(1) / 6]
+    assert [validator['delegator_count'] for validator in report['validators']] == [4, 3, 2, 1]
+    assert report['delegators'] == 10
+    assert [delegator['delegator_address'] for delegator in report['top_delegators']] == [
+        mock_cosmos.delegator_address(3, 3), mock_cosmos.delegator_address(3, 2)]
+    assert build_report('missing-1') is None
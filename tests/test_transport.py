@@ -0,0 +1,93 @@
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from chain_sight.services import transport
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    failures = {}
+    calls = []
+
+    def do_GET(self):
+        self.calls.append((self.path, self.headers.get('Accept-Encoding')))
+        remaining = self.failures.get(self.path.split('?')[0], 0)
+        if remaining:
+            self.failures[self.path.split('?')[0]] = remaining - 1
+            self.send_response(502)
+            self.end_headers()
+            return
+        body = json.dumps({'ok': True}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv('CHAIN_SIGHT_HTTP_RETRIES', '2')
+    monkeypatch.setenv('CHAIN_SIGHT_HTTP_BACKOFF', '0')
+    monkeypatch.setenv('CHAIN_SIGHT_HTTP_BACKOFF_JITTER', '0')
+    transport.reset_session()
+    _FlakyHandler.failures = {}
+    _FlakyHandler.calls = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _FlakyHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+    transport.reset_session()
+
+
+def test_get_json_retries_transient_errors(server):
+    _FlakyHandler.failures = {'/flaky': 2}
+
+    assert transport.get_json(f'{server}/flaky', params={'pagination.limit': 1}) == {'ok': True}
+    assert len(_FlakyHandler.calls) == 3
+    assert 'gzip' in _FlakyHandler.calls[0][1]
+
+
+def test_get_json_raises_after_retries_are_exhausted(server):
+    _FlakyHandler.failures = {'/down': 10}
+
+    with pytest.raises(transport.FetchError, match='502'):
+        transport.get_json(f'{server}/down')
+    assert len(_FlakyHandler.calls) == 3
+
+
+def test_session_is_shared(server):
+    assert transport.get_session() is transport.get_session()
+
+
+def test_record_and_replay_archive(server, tmp_path):
+    archive_path = str(tmp_path / 'responses.zip')
+    _FlakyHandler.failures = {'/missing': 10}
+
+    transport.configure_archive(record_path=archive_path)
+    try:
+        assert transport.get_json(f'{server}/ok', params={'b': 2, 'a': 1}) == {'ok': True}
+        with pytest.raises(transport.FetchError):
+            transport.get_json(f'{server}/missing')
+    finally:
+        transport.close_archive()
+    calls = len(_FlakyHandler.calls)
+
+    transport.configure_archive(replay_path=archive_path)
+    try:
+        assert transport.get_json(f'{server}/ok', params={'a': 1, 'b': 2}) == {'ok': True}
+        with pytest.raises(transport.FetchError, match='502'):
+            transport.get_json(f'{server}/missing')
+        with pytest.raises(transport.FetchError, match='No recorded response'):
+            transport.get_json(f'{server}/ok', params={'a': 2})
+    finally:
+        transport.close_archive()
+    assert len(_FlakyHandler.calls) == calls